@@ -1,11 +1,19 @@
 import sys
 import os
-import pyodbc
+import re
+import sqlite3
 import logging
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+import gzip
+import shutil
 import bcrypt
 from cryptography.fernet import Fernet
 import datetime
 import time
+import threading
+from abc import ABC, abstractmethod
+import queue
+from contextlib import contextmanager
 import qrcode
 from PIL import Image
 from PyQt5.QtWidgets import (
@@ -14,35 +22,152 @@ from PyQt5.QtWidgets import (
     QMessageBox, QTabWidget, QFileDialog, QMenuBar, QAction, QDockWidget,
     QToolBar, QSystemTrayIcon, QMenu, QTextEdit, QFormLayout, QSpinBox,
     QProgressBar, QShortcut, QListWidget, QSizePolicy, QFontComboBox, QInputDialog, QColorDialog, QHeaderView,
-    QUndoCommand, QUndoStack
+    QUndoCommand, QUndoStack, QCheckBox, QListWidgetItem
 )
-from PyQt5.QtCore import QTimer, QDate, Qt, QEvent, QAbstractTableModel, QUrl
-from PyQt5.QtGui import QIcon, QColor, QPalette, QKeySequence, QFont, QTextCursor, QTextListFormat, QTextCharFormat, QTextImageFormat
+from PyQt5.QtCore import QTimer, QDate, Qt, QEvent, QObject, pyqtSignal, QAbstractTableModel, QModelIndex, QUrl
+from PyQt5.QtGui import QIcon, QColor, QPalette, QPixmap, QKeySequence, QFont, QTextCursor, QTextListFormat, QTextCharFormat, QTextImageFormat, QStandardItemModel, QStandardItem
 from PyQt5.QtPrintSupport import QPrinter, QPrintDialog
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
-from reportlab.platypus import SimpleDocTemplate, Table, Image as ReportImage
+from reportlab.platypus import Table, TableStyle
 from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
 import openpyxl
 from openpyxl.drawing.image import Image as XLImage
-from jinja2 import Template
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+from jinja2 import Environment, ChoiceLoader, DictLoader, FileSystemLoader, FileSystemBytecodeCache
 import csv
-import matplotlib.pyplot as plt
-from io import BytesIO
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from io import BytesIO, StringIO
 import base64
-from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import multiprocessing
+from collections import OrderedDict
 import json
+import hashlib
+import bisect
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
-
-# Настройка логирования
-logging.basicConfig(filename='app.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from email.mime.text import MIMEText
+
+try:
+    import pyodbc
+except ImportError:  # Драйвер ODBC нужен только для SQL Server
+    pyodbc = None
+
+# Настройка логирования: app.log ротируется по размеру, старые части сжимаются.
+# Файл открывает только главный процесс (setup_logging в __main__): процессы пакетного экспорта
+# передают записи ему через очередь, поэтому ротацией занимается один владелец файла
+LOG_FILE = 'app.log'
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 10
+
+def rotate_gzip(source, dest):
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+def setup_logging(filename=LOG_FILE, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT):
+    handler = RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+    handler.namer = lambda name: name + '.gz'  # app.log.1.gz, app.log.2.gz, ...
+    handler.rotator = rotate_gzip
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logging.basicConfig(level=logging.INFO, handlers=[handler])
+
+def worker_logging(log_queue):
+    """Инициализатор процесса пакетного экспорта: записи журнала уходят в очередь главного процесса"""
+    root = logging.getLogger()
+    root.handlers[:] = [QueueHandler(log_queue)]
+    root.setLevel(logging.INFO)
 
 # Ключ шифрования для AES-256
 ENCRYPTION_KEY_FILE = 'secret.key'
 
+# Настройки хранилища: 'sqlserver' (по умолчанию) или встроенный 'sqlite'
+DB_BACKEND = os.environ.get('INVENTORY_DB_BACKEND', 'sqlserver')
+SQLSERVER_HOST = os.environ.get('INVENTORY_DB_SERVER', 'H9ISE')
+SQLSERVER_DATABASE = os.environ.get('INVENTORY_DB_NAME', 'inventoryyyyyyyy')
+SQLITE_PATH = os.environ.get('INVENTORY_SQLITE_PATH', 'inventory.db')
+
+# Настройки пула соединений (время в секундах)
+POOL_SIZE = int(os.environ.get('INVENTORY_POOL_SIZE', '5'))
+POOL_IDLE_TIMEOUT = 300
+POOL_HEALTH_CHECK_INTERVAL = 30
+POOL_CHECKOUT_TIMEOUT = 30
+
+# Журнал действий пишется в фоне пачками
+AUDIT_BATCH_SIZE = 100
+AUDIT_FLUSH_INTERVAL_MS = 500
+AUDIT_QUEUE_SIZE = 10000
+AUDIT_PUT_TIMEOUT = 2  # секунд ожидания места в очереди, прежде чем запись будет пропущена
+AUDIT_RETRIES = 3  # попыток записать пачку, прежде чем она будет пропущена
+AUDIT_RETRY_DELAY = 0.5  # секунд до второй попытки, дальше пауза удваивается
+
+# Хранение журналов: записи старше срока переносятся в сжатый архив
+LOG_RETENTION_DAYS = int(os.environ.get('INVENTORY_LOG_RETENTION_DAYS', '90'))
+# Архив общий для всех клиентов (сетевая папка); переносит записи только задача --archive-logs на одном сервере
+ARCHIVE_DIR = os.environ.get('INVENTORY_ARCHIVE_DIR', 'log_archive')
+ARCHIVE_BATCH_SIZE = 5000
+ARCHIVE_SEARCH_LIMIT = 1000
+
+# Столбцы инвентаря для списков: без фото, которое грузится отдельно через Database.get_photo
+INVENTORY_COLUMNS = 'id, name, category, quantity, condition, purchase_date, service_life'
+# Столбцы таблицы бронирований; выражения сортировки без NULL, чтобы keyset-пагинация не теряла строки
+BOOKING_COLUMNS = "b.id, COALESCE(i.name, ''), b.booking_date, COALESCE(b.class, ''), b.inventory_id"
+BOOKING_SORT_COLUMNS = ('b.id', "COALESCE(i.name, '')", 'b.booking_date', "COALESCE(b.class, '')")
+INVENTORY_HEADERS = ['ID', 'Название', 'Категория', 'Количество', 'Состояние', 'Дата покупки', 'Срок службы']
+PHOTO_CACHE_BYTES = 32 * 1024 * 1024
+INVENTORY_CACHE_TTL = 5  # секунд без проверки версии инвентаря
+SEARCH_LIMIT = 200
+LOG_TAIL_INTERVAL_MS = 5000  # период догрузки новых записей в журнале действий
+BOOKING_INDEX_TTL = 30  # секунд, после которых даты бронирований предмета перечитываются
+SEARCH_DEBOUNCE_MS = 300
+SEARCH_CACHE_SIZE = 64
+SEARCH_CACHE_TTL = 30  # секунд
+THUMBNAIL_SIZE = (160, 160)
+IMPORT_BATCH_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+REPORT_FETCH_SIZE = 1000
+PDF_ROW_HEIGHT = 18
+PDF_HEADER_PADDING = 16
+REPORT_TEMPLATES_DIR = os.environ.get('INVENTORY_REPORT_TEMPLATES', 'report_templates')
+JINJA_CACHE_DIR = os.environ.get('INVENTORY_JINJA_CACHE', '.jinja_cache')
+CHART_SIZE = (6.4, 4.8)  # дюймы
+CHART_DPI = 100
+CHART_CACHE_SIZE = 32
+CHART_MAX_BARS = 40
+CHART_MAX_SLICES = 12
+CHART_MAX_POINTS = 1000
+# Группировка и агрегаты в конфигурации отчёта: 'group_by': [...], 'aggregates': [{'func': 'SUM', 'field': 'quantity'}]
+REPORT_GROUP_BY = ('category', 'condition', 'purchase_year')
+REPORT_AGGREGATES = ('SUM', 'COUNT', 'AVG')
+REPORT_AGGREGATE_FIELDS = ('*', 'id', 'quantity', 'service_life')
+REPORT_QUERY_CACHE_SIZE = 128
+BATCH_EXPORT_WORKERS = int(os.environ.get('INVENTORY_EXPORT_WORKERS', str(os.cpu_count() or 2)))
+
+# Отправка отчётов по расписанию
+SMTP_HOST = os.environ.get('INVENTORY_SMTP_HOST', 'localhost')
+SMTP_PORT = int(os.environ.get('INVENTORY_SMTP_PORT', '25'))
+SMTP_USER = os.environ.get('INVENTORY_SMTP_USER', '')
+SMTP_PASSWORD = os.environ.get('INVENTORY_SMTP_PASSWORD', '')
+SMTP_STARTTLS = os.environ.get('INVENTORY_SMTP_STARTTLS', '0') == '1'
+SMTP_SENDER = os.environ.get('INVENTORY_SMTP_SENDER', 'reports@school.local')
+# Планировщик запускается только там, где он явно включён, и только в окне администратора
+SCHEDULER_ENABLED = os.environ.get('INVENTORY_SCHEDULER', '0') == '1'
+SCHEDULE_RELOAD_INTERVAL = 60  # секунд
+SCHEDULE_OUTPUT_DIR = 'scheduled_reports'
+
+# Ошибки драйверов, которые обрабатываются одинаково для всех хранилищ
+DB_ERRORS = (sqlite3.Error,) + ((pyodbc.Error,) if pyodbc else ())
+
 def generate_key():
     """Генерация ключа шифрования AES-256"""
     key = Fernet.generate_key()
@@ -58,6 +183,11 @@ def load_key():
 KEY = load_key()
 cipher = Fernet(KEY)
 
+# Фоновые потоки для чтения из базы, чтобы не блокировать интерфейс
+background_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix='background')
+# Записи выполняются строго по очереди в одном потоке со своим соединением
+write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+
 def encrypt_data(data):
     """Шифрование данных"""
     return cipher.encrypt(data.encode())
@@ -66,32 +196,94 @@ def decrypt_data(encrypted_data):
     """Расшифровка данных"""
     return cipher.decrypt(encrypted_data).decode()
 
+class AsyncDatabase(QObject):
+    """Асинхронный доступ к базе для интерфейса: чтения в фоновых потоках, записи по очереди в одном потоке.
+    Результаты и ошибки возвращаются в поток интерфейса через сигнал"""
+    busy_changed = pyqtSignal(bool)
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(object, object, bool)
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.active = 0
+        self.finished.connect(self.dispatch)
+
+    def run(self, fn, *args, on_done=None, on_error=None, write=False, busy=True):
+        """Выполняет fn(*args) в фоне и возвращает future; on_done/on_error вызываются в потоке интерфейса"""
+        executor = write_executor if write else background_executor
+        if busy:
+            self.set_active(1)
+        future = executor.submit(self.call, fn, args)
+        future.add_done_callback(lambda f: self.notify(f, (on_done, on_error), busy))
+        return future
+
+    def call(self, fn, args):
+        try:
+            return fn(*args)
+        finally:
+            self.db.close()  # соединение рабочего потока возвращается в пул после каждой операции
+
+    def notify(self, future, handlers, busy):
+        try:
+            self.finished.emit(future, handlers, busy)
+        except RuntimeError:
+            pass  # окно уже закрыто
+
+    def dispatch(self, future, handlers, busy):
+        if busy:
+            self.set_active(-1)
+        if future.cancelled():
+            return
+        on_done, on_error = handlers
+        error = future.exception()
+        if error is not None:
+            logging.error(f"Ошибка фоновой операции с базой данных: {error}")
+            if on_error:
+                on_error(error)
+            return
+        if on_done:
+            on_done(future.result())
+
+    def report_progress(self, done, total):
+        """Прогресс длительной операции; можно вызывать из фонового потока"""
+        try:
+            self.progress.emit(done, total)
+        except RuntimeError:
+            pass
+
+    def set_active(self, delta):
+        was_busy = self.active > 0
+        self.active += delta
+        if (self.active > 0) != was_busy:
+            self.busy_changed.emit(self.active > 0)
+
 class ReportTableModel(QAbstractTableModel):
     """Модель таблицы для списка отчётов"""
-    def __init__(self, db, user_id):
+    def __init__(self, async_db, user_id):
         super().__init__()
-        self.db = db
+        self.async_db = async_db
+        self.db = async_db.db
         self.user_id = user_id
-        self.data = self.load_reports()
+        self.rows = []
+        self.refresh()
 
     def load_reports(self):
-        cursor = self.db.conn.cursor()
-        cursor.execute("SELECT id, config, type, created_at FROM report_templates WHERE user_id = ? ORDER BY created_at DESC", (self.user_id,))
         reports = []
-        for row in cursor.fetchall():
+        for row in self.db.get_report_templates(self.user_id):
             config = json.loads(row[1])
             reports.append((row[0], config.get('name', 'Без названия'), row[3], row[2]))
         return reports
 
     def rowCount(self, parent=None):
-        return len(self.data)
+        return len(self.rows)
 
     def columnCount(self, parent=None):
         return 3  # Название, Дата создания, Тип
 
     def data(self, index, role=Qt.DisplayRole):
         if role == Qt.DisplayRole:
-            return str(self.data[index.row()][index.column() + 1])
+            return str(self.rows[index.row()][index.column() + 1])
         return None
 
     def headerData(self, section, orientation, role=Qt.DisplayRole):
@@ -101,30 +293,34 @@ class ReportTableModel(QAbstractTableModel):
         return None
 
     def refresh(self):
-        self.data = self.load_reports()
-        self.layoutChanged.emit()
+        self.async_db.run(self.load_reports, on_done=self.set_rows)
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
 
 class UserTableModel(QAbstractTableModel):
     """Модель таблицы для списка пользователей"""
-    def __init__(self, db):
+    def __init__(self, async_db):
         super().__init__()
-        self.db = db
-        self.data = self.load_users()
+        self.async_db = async_db
+        self.db = async_db.db
+        self.rows = []
+        self.refresh()
 
     def load_users(self):
-        cursor = self.db.conn.cursor()
-        cursor.execute("SELECT id, username, role FROM users")
-        return cursor.fetchall()
+        return self.db.get_users()
 
     def rowCount(self, parent=None):
-        return len(self.data)
+        return len(self.rows)
 
     def columnCount(self, parent=None):
         return 3  # ID, Username, Role
 
     def data(self, index, role=Qt.DisplayRole):
         if role == Qt.DisplayRole:
-            return str(self.data[index.row()][index.column()])
+            return str(self.rows[index.row()][index.column()])
         return None
 
     def headerData(self, section, orientation, role=Qt.DisplayRole):
@@ -134,60 +330,515 @@ class UserTableModel(QAbstractTableModel):
         return None
 
     def refresh(self):
-        self.data = self.load_users()
-        self.layoutChanged.emit()
+        self.async_db.run(self.load_users, on_done=self.set_rows)
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
+
+# Типы столбцов отчёта в Excel: (преобразование значения, формат числа, ширина столбца)
+EXCEL_COLUMN_FORMATS = {
+    'id': (int, '0', 8),
+    'quantity': (int, '0', 12),
+    'service_life': (int, '0', 14),
+    'purchase_date': ('date', 'yyyy-mm-dd', 14),
+}
+EXCEL_TEXT_WIDTH = 24
+
+def excel_value(value, kind):
+    """Приводит значение к типу столбца; строки с датами из SQLite превращаются в даты Excel"""
+    if value is None or value == '':
+        return None
+    try:
+        if kind == 'date':
+            if isinstance(value, datetime.datetime):
+                return value.date()
+            if isinstance(value, datetime.date):
+                return value
+            return datetime.date.fromisoformat(str(value)[:10])
+        if kind is int:
+            return int(value)
+    except (TypeError, ValueError):
+        pass
+    return value
+
+def write_excel(filename, headers, rows, write_only=True, image=None):
+    """Записывает строки в XLSX. В режиме write_only каждая строка сразу уходит во временный XML-файл листа
+    и не хранится в памяти; иначе собирается обычная книга"""
+    formats = [EXCEL_COLUMN_FORMATS.get(str(h).lower(), (None, None, EXCEL_TEXT_WIDTH)) for h in headers]
+    if not write_only:
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.append(headers)
+        for row in rows:
+            ws.append(list(row))
+        if image:
+            ws.add_image(XLImage(image), 'A10')
+        wb.save(filename)
+        return
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Отчёт')
+    # Ширины и закрепление заголовка задаются до первой строки — потом лист уже пишется в файл
+    for i, (_, _, width) in enumerate(formats, start=1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+    ws.freeze_panes = 'A2'
+    header_font = Font(bold=True)
+    header = []
+    for title in headers:
+        cell = WriteOnlyCell(ws, value=title)
+        cell.font = header_font
+        header.append(cell)
+    ws.append(header)
+    for row in rows:
+        values = []
+        for value, (kind, number_format, _) in zip(row, formats):
+            value = excel_value(value, kind) if kind else value
+            if number_format and value is not None:
+                # Ячейка создаётся на каждое значение: ws.append сохраняет ссылку на неё до записи строки
+                value = WriteOnlyCell(ws, value=value)
+                value.number_format = number_format
+            values.append(value)
+        ws.append(values)
+    if image:
+        ws.add_image(XLImage(image), 'A10')
+    wb.save(filename)
+
+def benchmark_rows(count):
+    """Синтетические строки инвентаря для замеров"""
+    start = datetime.date(2015, 1, 1)
+    for i in range(1, count + 1):
+        yield (i, f'Предмет {i}', f'Категория {i % 20}', i % 50, 'Хороший',
+               (start + datetime.timedelta(days=i % 3000)).isoformat(), i % 10)
+
+def benchmark_excel_run(count, mode):
+    """Один замер в отдельном процессе: время записи и пиковая память процесса"""
+    import resource
+    import tempfile
+    headers = INVENTORY_COLUMNS.split(', ')
+    filename = os.path.join(tempfile.gettempdir(), f'benchmark_{mode}_{count}.xlsx')
+    started = time.perf_counter()
+    write_excel(filename, headers, benchmark_rows(count), write_only=(mode == 'write_only'))
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(filename)
+    os.remove(filename)
+    # ru_maxrss в Linux в килобайтах, в macOS в байтах
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    print(json.dumps({'rows': count, 'mode': mode, 'seconds': round(elapsed, 2),
+                      'peak_rss_mb': round(peak_mb, 1), 'file_mb': round(size / (1024 * 1024), 1)}))
+
+def benchmark_excel(sizes=(10000, 100000, 1000000)):
+    """Сравнение обычной книги и write_only по времени и пиковой памяти; каждый замер в новом процессе"""
+    import subprocess
+    print(f"{'Строк':>10} {'Режим':>12} {'Время, с':>10} {'Пик RSS, МБ':>12} {'Файл, МБ':>10}")
+    for count in sizes:
+        for mode in ('workbook', 'write_only'):
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--benchmark-excel-run', str(count), mode],
+                                    capture_output=True, text=True)
+            if output.returncode != 0:
+                print(f'{count:>10} {mode:>12} ошибка: {output.stderr.strip().splitlines()[-1:]}')
+                continue
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            print(f"{count:>10} {mode:>12} {result['seconds']:>10} {result['peak_rss_mb']:>12} {result['file_mb']:>10}")
+
+# Шаблон HTML-отчёта по умолчанию. Свои шаблоны (*.html) кладутся в REPORT_TEMPLATES_DIR и получают те же
+# переменные: logo, title, font, font_size, header_color, bg_color, headers, data (итератор строк), chart (PNG в base64)
+DEFAULT_HTML_TEMPLATE = """<html>
+<head>
+    <style>
+        table { border-collapse: collapse; width: 100%; font-family: {{font}}; font-size: {{font_size}}px; }
+        th, td { border: 1px solid black; padding: 8px; text-align: center; }
+        th { background-color: {{header_color}}; color: white; }
+        body { background-color: {{bg_color}}; }
+    </style>
+</head>
+<body>
+    {% if logo %}
+    <img src="{{logo}}">
+    {% endif %}
+    <h1>{{title}}</h1>
+    <table>
+        <tr>{% for header in headers %}<th>{{header}}</th>{% endfor %}</tr>
+        {% for row in data %}
+        <tr>{% for col in row %}<td>{{col}}</td>{% endfor %}</tr>
+        {% endfor %}
+    </table>
+    {% if chart %}
+    <img src="data:image/png;base64,{{chart}}">
+    {% endif %}
+</body>
+</html>
+"""
+
+_report_environment = None
+_report_environment_lock = threading.Lock()
+
+def get_report_environment():
+    """Общее окружение Jinja2: шаблоны компилируются один раз, байткод сохраняется на диск между запусками"""
+    global _report_environment
+    with _report_environment_lock:
+        if _report_environment is None:
+            os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+            _report_environment = Environment(
+                loader=ChoiceLoader([
+                    FileSystemLoader(REPORT_TEMPLATES_DIR),
+                    DictLoader({'report.html': DEFAULT_HTML_TEMPLATE}),
+                ]),
+                bytecode_cache=FileSystemBytecodeCache(JINJA_CACHE_DIR),
+                auto_reload=True,  # изменённый пользователем файл шаблона перечитывается по времени изменения
+            )
+        return _report_environment
+
+def report_template(name=None):
+    return get_report_environment().get_template(name or 'report.html')
+
+def list_report_templates():
+    """Имена доступных шаблонов HTML-отчётов, включая стандартный"""
+    return get_report_environment().list_templates(extensions=['html'])
+
+class ChartRenderer:
+    """Графики отчётов на Agg без pyplot: фигура переиспользуется в каждом потоке, PNG кэшируются по
+    (хэш данных, тип, размер), слишком длинные ряды агрегируются до читаемого числа столбцов и долей"""
+    def __init__(self, cache_size=CHART_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def series(points):
+        """Ключи, подписи и значения для графика и хэш набора данных, за один проход по точкам (ключ, подпись, значение)"""
+        digest = hashlib.blake2b(digest_size=16)
+        keys, labels, values = [], [], []
+        for key, label, value in points:
+            digest.update(repr((key, label, value)).encode())
+            keys.append(key)
+            labels.append(label)
+            values.append(value or 0)
+        return keys, labels, values, digest.hexdigest()
+
+    @staticmethod
+    def top(labels, values, limit):
+        """Одинаковые подписи суммируются; остаются limit - 1 наибольших значений и сумма остальных как «Прочие»"""
+        totals = {}
+        for label, value in zip(labels, values):
+            label = str(label)
+            totals[label] = totals.get(label, 0) + value
+        labels, values = list(totals), list(totals.values())
+        if len(values) <= limit:
+            return labels, values
+        order = sorted(range(len(values)), key=values.__getitem__, reverse=True)
+        kept = sorted(order[:limit - 1])
+        rest = sum(values[i] for i in order[limit - 1:])
+        return [labels[i] for i in kept] + ['Прочие'], [values[i] for i in kept] + [rest]
+
+    @staticmethod
+    def downsample(keys, values, limit):
+        """Среднее по равным интервалам, чтобы линия строилась не больше чем по limit точкам"""
+        if len(values) <= limit:
+            return keys, values
+        step = len(values) / limit
+        sampled_keys, sampled_values = [], []
+        for i in range(limit):
+            start, end = int(i * step), max(int((i + 1) * step), int(i * step) + 1)
+            chunk = values[start:end]
+            sampled_keys.append(keys[start])
+            sampled_values.append(sum(chunk) / len(chunk))
+        return sampled_keys, sampled_values
+
+    def figure(self, size):
+        fig = getattr(self.local, 'figure', None)
+        if fig is None:
+            fig = self.local.figure = Figure(dpi=CHART_DPI)
+            FigureCanvasAgg(fig)
+        fig.clear()
+        fig.set_size_inches(*size)
+        return fig
+
+    def render(self, points, axis_labels, viz_type, size=CHART_SIZE):
+        """PNG-байты графика по точкам (ключ, подпись, значение); axis_labels — подписи осей X и Y"""
+        keys, labels, values, data_hash = self.series(points)
+        x_label, y_label = axis_labels
+        cache_key = (data_hash, tuple(axis_labels), viz_type, tuple(size))
+        with self.lock:
+            if cache_key in self.cache:
+                self.cache.move_to_end(cache_key)
+                self.hits += 1
+                return self.cache[cache_key]
+            self.misses += 1
+        fig = self.figure(size)
+        ax = fig.add_subplot()
+        if viz_type == 'bar':
+            bar_labels, bar_values = self.top(keys, values, CHART_MAX_BARS)
+            ax.bar(bar_labels, bar_values)
+            ax.tick_params(axis='x', labelrotation=90 if len(bar_labels) > 10 else 0)
+            ax.set_xlabel(x_label)
+            ax.set_ylabel(y_label)
+        elif viz_type == 'pie':
+            pie_labels, pie_values = self.top(labels, values, CHART_MAX_SLICES)
+            ax.pie(pie_values, labels=pie_labels, autopct='%1.1f%%')
+        elif viz_type == 'line':
+            line_keys, line_values = self.downsample(keys, values, CHART_MAX_POINTS)
+            ax.plot(line_keys, line_values)
+            ax.set_xlabel(x_label)
+            ax.set_ylabel(y_label)
+        fig.tight_layout()
+        buf = BytesIO()
+        fig.savefig(buf, format='png')
+        png = buf.getvalue()
+        fig.clear()
+        with self.lock:
+            self.cache[cache_key] = png
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return png
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+chart_renderer = ChartRenderer()
+
+# Шрифты семейств, которые предлагает QFontComboBox, среди встроенных шрифтов ReportLab
+PDF_FONT_ALIASES = {
+    'arial': 'Helvetica', 'helvetica': 'Helvetica', 'sans': 'Helvetica', 'sans serif': 'Helvetica',
+    'dejavu sans': 'Helvetica', 'liberation sans': 'Helvetica', 'verdana': 'Helvetica', 'tahoma': 'Helvetica',
+    'times': 'Times-Roman', 'times new roman': 'Times-Roman', 'serif': 'Times-Roman',
+    'dejavu serif': 'Times-Roman', 'liberation serif': 'Times-Roman', 'georgia': 'Times-Roman',
+    'courier': 'Courier', 'courier new': 'Courier', 'monospace': 'Courier',
+    'dejavu sans mono': 'Courier', 'liberation mono': 'Courier', 'consolas': 'Courier',
+}
+
+def pdf_font(name):
+    """Имя шрифта из настроек отчёта, пригодное для ReportLab: зарегистрированный шрифт, близкий встроенный или Helvetica"""
+    if name in pdfmetrics.getRegisteredFontNames() or name in pdfmetrics.standardFonts:
+        return name
+    return PDF_FONT_ALIASES.get(str(name or '').strip().lower(), 'Helvetica')
+
+class ReportQueryBuilder:
+    """Сборка SQL отчёта из конфигурации: только разрешённые столбцы, типизированные фильтры и кэш
+    скомпилированного текста запроса по форме конфигурации — одинаковый текст повторно использует
+    подготовленный план (cached_statements в SQLite, кэш выражений драйвера и сервера в SQL Server)"""
+    # Столбцы inventory, доступные в отчётах, и тип значения фильтра
+    columns = {
+        'id': int,
+        'name': str,
+        'category': str,
+        'quantity': int,
+        'condition': str,
+        'purchase_date': 'date',
+        'service_life': int,
+    }
+    # Подписи полей из редактора отчётов (в нижнем регистре) -> столбцы
+    labels = {header.lower(): column for header, column in zip(INVENTORY_HEADERS, INVENTORY_COLUMNS.split(', '))}
+    operators = ('=', '!=', '<', '<=', '>', '>=', 'IN', 'BETWEEN', 'LIKE')
+    legacy_filter = re.compile(r'^\s*(<=|>=|!=|<>|=|<|>)\s*(.+?)\s*$')
+    default_fields = ['id', 'name', 'category', 'quantity', 'condition']
+
+    def __init__(self, cache_size=REPORT_QUERY_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def column(self, name):
+        name = str(name).strip()
+        column = self.labels.get(name.lower(), name.lower())
+        if column not in self.columns:
+            raise ValueError(f"Неизвестное поле отчёта: {name}")
+        return column
+
+    def coerce(self, column, value):
+        kind = self.columns[column]
+        try:
+            if kind is int:
+                return int(value)
+            if kind == 'date':
+                if isinstance(value, (datetime.date, datetime.datetime)):
+                    return value.isoformat()[:10]
+                return datetime.date.fromisoformat(str(value).strip()).isoformat()
+        except (TypeError, ValueError):
+            raise ValueError(f"Недопустимое значение фильтра {column}: {value!r}")
+        return str(value)
+
+    def parse_filter(self, column, spec):
+        """(оператор, значения) фильтра. Поддерживаются {'op': ..., 'value': ...}, строки вида '< 10',
+        списки для IN и простые значения для равенства"""
+        if isinstance(spec, dict):
+            op, value = str(spec.get('op', '=')).upper(), spec.get('value')
+        elif isinstance(spec, (list, tuple)):
+            op, value = 'IN', list(spec)
+        else:
+            match = self.legacy_filter.match(str(spec)) if isinstance(spec, str) else None
+            if match:
+                op, value = match.group(1), match.group(2)
+            else:
+                op, value = '=', spec
+        op = '!=' if op == '<>' else op
+        if op not in self.operators:
+            raise ValueError(f"Неподдерживаемый оператор фильтра {column}: {op}")
+        if op == 'LIKE':
+            if self.columns[column] is not str:
+                raise ValueError(f"LIKE применим только к текстовым полям, а не к {column}")
+            return op, [str(value)]
+        if op == 'IN':
+            values = value if isinstance(value, (list, tuple)) else [v for v in str(value).split(',') if v.strip()]
+            if not values:
+                raise ValueError(f"Пустой список IN для {column}")
+            return op, [self.coerce(column, v) for v in values]
+        if op == 'BETWEEN':
+            if not isinstance(value, (list, tuple)) or len(value) != 2:
+                raise ValueError(f"BETWEEN для {column} требует два значения")
+            return op, [self.coerce(column, v) for v in value]
+        return op, [self.coerce(column, value)]
+
+    def filters(self, config):
+        """[(столбец, оператор, значения)] из config['filters'], включая прежние ключи date_from/date_to"""
+        result = []
+        for key, spec in (config.get('filters') or {}).items():
+            if spec is None or spec == '' or spec == []:
+                continue
+            if key == 'date_from':
+                result.append(('purchase_date', '>=', [self.coerce('purchase_date', spec)]))
+            elif key == 'date_to':
+                result.append(('purchase_date', '<=', [self.coerce('purchase_date', spec)]))
+            else:
+                column = self.column(key)
+                result.append((column,) + self.parse_filter(column, spec))
+        return result
+
+    def dimension(self, name, backend):
+        """SQL-выражение для поля группировки"""
+        if name not in REPORT_GROUP_BY:
+            raise ValueError(f"Группировка по полю {name} не поддерживается")
+        if name == 'purchase_year':
+            return backend.year('purchase_date')
+        return name
+
+    def aggregates(self, config):
+        specs = []
+        for spec in config.get('aggregates') or [{'func': 'COUNT', 'field': '*'}]:
+            func, field = str(spec['func']).upper(), spec.get('field', '*')
+            if func not in REPORT_AGGREGATES or field not in REPORT_AGGREGATE_FIELDS or (field == '*' and func != 'COUNT'):
+                raise ValueError(f"Агрегат {func}({field}) не поддерживается")
+            specs.append((func, field))
+        return specs
+
+    def compile(self, config, backend):
+        """(SQL, параметры, заголовки, поля группировки) для конфигурации отчёта"""
+        group_by = list(config.get('group_by') or [])
+        filters = self.filters(config)
+        if group_by:
+            shape = ('group', tuple(group_by), tuple(self.aggregates(config)))
+        else:
+            shape = ('rows', tuple(self.column(f) for f in config.get('fields') or self.default_fields))
+        # Форма запроса не зависит от значений фильтров, только от столбцов, операторов и числа значений
+        key = (backend.name, shape, tuple((column, op, len(values)) for column, op, values in filters))
+        with self.lock:
+            compiled = self.cache.get(key)
+            if compiled:
+                self.cache.move_to_end(key)
+                self.hits += 1
+        if not compiled:
+            compiled = self.build(shape, filters, backend)
+            with self.lock:
+                self.misses += 1
+                self.cache[key] = compiled
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        query, headers = compiled
+        params = [value for _, _, values in filters for value in values]
+        return query, params, list(headers), group_by
+
+    def build(self, shape, filters, backend):
+        if shape[0] == 'group':
+            _, group_by, aggregates = shape
+            columns = [f"{self.dimension(name, backend)} AS {name}" for name in group_by]
+            headers = list(group_by)
+            for func, field in aggregates:
+                alias = func.lower() if field == '*' else f"{func.lower()}_{field}"
+                # AVG по целому столбцу в SQL Server отбрасывает дробную часть
+                expression = f"AVG(CAST({field} AS FLOAT))" if func == 'AVG' else f"{func}({field})"
+                columns.append(f"{expression} AS {alias}")
+                headers.append(alias)
+        else:
+            columns = headers = list(shape[1])
+        query = f"SELECT {', '.join(columns)} FROM inventory WHERE 1=1"
+        for column, op, values in filters:
+            if op == 'IN':
+                query += f" AND {column} IN ({', '.join('?' for _ in values)})"
+            elif op == 'BETWEEN':
+                query += f" AND {column} BETWEEN ? AND ?"
+            else:
+                query += f" AND {column} {op} ?"
+        if shape[0] == 'group':
+            dimensions = [self.dimension(name, backend) for name in shape[1]]
+            query += f" GROUP BY {', '.join(dimensions)} ORDER BY {', '.join(dimensions)}"
+        return query, tuple(headers)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+report_queries = ReportQueryBuilder()
 
 class ReportGenerator:
-    """Генератор отчётов в различных форматах"""
-    def __init__(self, db, config, format='pdf', logo_path=None):
+    """Генератор отчётов в различных форматах; строки читаются из курсора порциями и сразу передаются в файл"""
+    def __init__(self, db, config, format='pdf', logo_path=None, fetch_size=REPORT_FETCH_SIZE, data=None):
         self.db = db
         self.config = config
         self.format = format
         self.logo_path = logo_path
-        self.data, self.headers = self.fetch_data()
-
-    def fetch_data(self):
-        cursor = self.db.conn.cursor()
-        fields = self.config.get('fields', ['id', 'name', 'category', 'quantity', 'condition'])
-        query = f"SELECT {', '.join(fields)} FROM inventory WHERE 1=1"
-        params = []
-        filters = self.config.get('filters', {})
-        if filters.get('category'):
-            query += " AND category = ?"
-            params.append(filters['category'])
-        if filters.get('condition'):
-            query += " AND condition = ?"
-            params.append(filters['condition'])
-        if filters.get('date_from'):
-            query += " AND purchase_date >= ?"
-            params.append(filters['date_from'])
-        if filters.get('date_to'):
-            query += " AND purchase_date <= ?"
-            params.append(filters['date_to'])
-        cursor.execute(query, params)
-        return cursor.fetchall(), fields
+        self.fetch_size = fetch_size
+        self.data = data  # уже загруженные строки, например для предпросмотра; тогда запрос не выполняется
+        self.query, self.params, self.headers = self.build_query()
+
+    def data_key(self):
+        """Ключ набора данных: меняется только при изменении полей или фильтров, но не оформления"""
+        return self.query, tuple(self.params)
+
+    def build_query(self):
+        query, params, headers, self.group_by = report_queries.compile(self.config, self.db.backend)
+        return query, params, headers
+
+    def rows(self):
+        """Строки отчёта по одной; в памяти держится не больше fetch_size строк.
+        Каждый вызов заново выполняет запрос, соединение занято до конца обхода"""
+        if self.data is not None:
+            yield from self.data
+            return
+        with self.db.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.query, self.params)
+            while True:
+                batch = cursor.fetchmany(self.fetch_size)
+                if not batch:
+                    break
+                yield from batch
 
-    def add_visualization(self, viz_type='table'):
+    def add_visualization(self, viz_type='table', size=CHART_SIZE):
         if viz_type == 'table':
             return None
-        fig, ax = plt.subplots()
-        data = list(self.data)
+        return BytesIO(chart_renderer.render(self.chart_points(), self.axis_labels(), viz_type, size))
+
+    def chart_points(self):
+        """(ключ, подпись, значение) для графика. У сгруппированного отчёта подпись — значения группировки,
+        а значение — первый агрегат; иначе берутся id, название и количество, как в исходных строках"""
+        groups = len(self.group_by)
+        for row in self.rows():
+            if groups:
+                label = ' / '.join(str(v) for v in row[:groups])
+                yield label, label, row[groups] if len(row) > groups else 0
+            else:
+                yield row[0], row[1] if len(row) > 1 else row[0], row[3] if len(row) > 3 else 0
+
+    def axis_labels(self):
         headers = self.headers
-        if viz_type == 'bar':
-            ax.bar([row[0] for row in data], [row[3] if len(row) > 3 else 0 for row in data])
-            ax.set_xlabel(headers[0])
-            ax.set_ylabel(headers[3] if len(headers) > 3 else 'Количество')
-        elif viz_type == 'pie':
-            ax.pie([row[3] if len(row) > 3 else 0 for row in data], labels=[row[1] for row in data], autopct='%1.1f%%')
-        elif viz_type == 'line':
-            ax.plot([row[0] for row in data], [row[3] if len(row) > 3 else 0 for row in data])
-            ax.set_xlabel(headers[0])
-            ax.set_ylabel(headers[3] if len(headers) > 3 else 'Количество')
-        buf = BytesIO()
-        fig.savefig(buf, format='png')
-        buf.seek(0)
-        plt.close(fig)
-        return buf
+        if self.group_by:
+            return ' / '.join(headers[:len(self.group_by)]), headers[len(self.group_by)] if len(headers) > len(self.group_by) else 'Количество'
+        return headers[0], headers[3] if len(headers) > 3 else 'Количество'
 
     def export(self, filename):
         if self.format == 'pdf':
@@ -197,92 +848,404 @@ class ReportGenerator:
         elif self.format == 'html':
             self.generate_html(filename)
 
+    def pdf_column_widths(self, total_width):
+        """Ширины столбцов PDF пропорционально типу поля, без измерения каждой ячейки"""
+        weights = [EXCEL_COLUMN_FORMATS.get(str(h).lower(), (None, None, EXCEL_TEXT_WIDTH))[2] for h in self.headers]
+        scale = total_width / sum(weights)
+        return [w * scale for w in weights]
+
+    def pdf_chunks(self, col_widths, first_rows, rows_per_table, style):
+        """Таблицы по странице строк, каждая со своим заголовком; строки берутся из потока по мере вывода.
+        На первой странице помещается first_rows строк — над таблицей может быть логотип"""
+        header_height = self.config.get('font_size', 12) + PDF_HEADER_PADDING
+        chunk = []
+        limit = first_rows
+        empty = True
+        for row in self.rows():
+            chunk.append(row)
+            if len(chunk) >= limit:
+                yield self.pdf_table(chunk, col_widths, header_height, style)
+                chunk = []
+                limit = rows_per_table
+                empty = False
+        if chunk or empty:
+            yield self.pdf_table(chunk, col_widths, header_height, style)
+
+    def pdf_table(self, rows, col_widths, header_height, style):
+        table = Table([self.headers] + rows, colWidths=col_widths,
+                      rowHeights=[header_height] + [PDF_ROW_HEIGHT] * len(rows), repeatRows=1)
+        table.setStyle(style)
+        return table
+
     def generate_pdf(self, filename):
-        doc = SimpleDocTemplate(filename, pagesize=letter)
-        elements = []
+        if self.config.get('pdf_fast') and self.config.get('viz_type', 'table') == 'table':
+            self.generate_pdf_canvas(filename)
+            return
+        # Каждая порция строк — отдельная таблица ровно на страницу, она рисуется на canvas сразу
+        # и отбрасывается: в памяти не больше одной страницы строк
+        page_width, page_height = letter
+        margin = inch
+        width, height = page_width - 2 * margin, page_height - 2 * margin
+        c = canvas.Canvas(filename, pagesize=letter)
+        top = page_height - margin
+        y = top
         if self.logo_path:
-            logo = ReportImage(self.logo_path, width=100, height=50)
-            elements.append(logo)
-        table_data = [self.headers] + [list(row) for row in self.data]
-        table = Table(table_data)
-        table.setStyle([
+            c.drawImage(self.logo_path, (page_width - 100) / 2, y - 50, width=100, height=50)
+            y -= 60
+        style = TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), self.config.get('font', 'Helvetica')),
+            ('FONTNAME', (0, 0), (-1, 0), pdf_font(self.config.get('font', 'Helvetica'))),
             ('FONTSIZE', (0, 0), (-1, 0), self.config.get('font_size', 12)),
             ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
             ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
             ('GRID', (0, 0), (-1, -1), 1, colors.black)
         ])
-        elements.append(table)
+        header_height = self.config.get('font_size', 12) + PDF_HEADER_PADDING
+        rows_per_table = max(int((height - header_height) // PDF_ROW_HEIGHT), 1)
+        first_rows = max(int((y - margin - header_height) // PDF_ROW_HEIGHT), 1)
+        for i, table in enumerate(self.pdf_chunks(self.pdf_column_widths(width), first_rows, rows_per_table, style)):
+            if i:
+                c.showPage()
+                y = top
+            _, table_height = table.wrapOn(c, width, y - margin)
+            table.drawOn(c, margin, y - table_height)
+            y -= table_height
         if self.config.get('viz_type') != 'table':
             img_buf = self.add_visualization(self.config.get('viz_type', 'bar'))
             if img_buf:
-                img = ReportImage(img_buf, width=400, height=200)
-                elements.append(img)
-        doc.build(elements)
-
-    def generate_excel(self, filename):
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.append(self.headers)
-        for row in self.data:
-            ws.append(list(row))
+                if y - 210 < margin:
+                    c.showPage()
+                    y = top
+                c.drawImage(ImageReader(img_buf), (page_width - 400) / 2, y - 210, width=400, height=200)
+        c.save()
+
+    def generate_pdf_canvas(self, filename):
+        """Быстрый путь для простых табличных отчётов: строки рисуются прямо на canvas без вёрстки platypus"""
+        page_width, page_height = letter
+        margin = 40
+        font = pdf_font(self.config.get('font', 'Helvetica'))
+        font_size = self.config.get('font_size', 12)
+        body_size = 9
+        col_widths = self.pdf_column_widths(page_width - 2 * margin)
+        xs = [margin + sum(col_widths[:i]) for i in range(len(col_widths))]
+        # Примерное число символов, помещающихся в столбец: ширину текста по ячейкам не измеряем
+        max_chars = [max(int(w / (body_size * 0.55)), 1) for w in col_widths]
+        c = canvas.Canvas(filename, pagesize=letter)
+
+        def draw_header(y):
+            c.setFillColor(colors.grey)
+            c.rect(margin, y - 4, page_width - 2 * margin, font_size + 8, stroke=0, fill=1)
+            c.setFillColor(colors.whitesmoke)
+            c.setFont(font, font_size)
+            for x, title in zip(xs, self.headers):
+                c.drawString(x + 2, y, str(title))
+            c.setFillColor(colors.black)
+            c.setFont('Helvetica', body_size)
+            return y - font_size - 8
+
+        y = page_height - margin
+        if self.logo_path:
+            c.drawImage(self.logo_path, margin, y - 50, width=100, height=50)
+            y -= 60
+        y = draw_header(y - font_size)
+        # Один текстовый объект на страницу вместо отдельного drawString на каждую ячейку
+        text = c.beginText()
+        for row in self.rows():
+            if y < margin:
+                c.drawText(text)
+                c.showPage()
+                y = draw_header(page_height - margin - font_size)
+                text = c.beginText()
+            for x, value, limit in zip(xs, row, max_chars):
+                text.setTextOrigin(x + 2, y)
+                text.textOut(str(value)[:limit])
+            y -= PDF_ROW_HEIGHT * 0.75
+        c.drawText(text)
+        c.save()
+
+    def generate_excel(self, filename, write_only=True):
+        img_buf = None
         if self.config.get('viz_type') != 'table':
             img_buf = self.add_visualization(self.config.get('viz_type', 'bar'))
-            if img_buf:
-                img = XLImage(img_buf)
-                ws.add_image(img, 'A10')
-        wb.save(filename)
+        write_excel(filename, self.headers, self.rows(), write_only=write_only, image=img_buf)
 
     def generate_html(self, filename):
-        template_str = """
-        <html>
-        <head>
-            <style>
-                table { border-collapse: collapse; width: 100%; font-family: {{font}}; font-size: {{font_size}}px; }
-                th, td { border: 1px solid black; padding: 8px; text-align: center; }
-                th { background-color: {{header_color}}; color: white; }
-                body { background-color: {{bg_color}}; }
-            </style>
-        </head>
-        <body>
-            {% if logo %}
-            <img src="{{logo}}">
-            {% endif %}
-            <h1>{{title}}</h1>
-            <table>
-                <tr>{% for header in headers %}<th>{{header}}</th>{% endfor %}</tr>
-                {% for row in data %}
-                <tr>{% for col in row %}<td>{{col}}</td>{% endfor %}</tr>
-                {% endfor %}
-            </table>
-            {% if chart %}
-            <img src="data:image/png;base64,{{chart}}">
-            {% endif %}
-        </body>
-        </html>
-        """
-        template = Template(template_str)
-        data = list(self.data)
+        # generate() отдаёт HTML по частям по мере обхода строк, документ целиком в памяти не собирается
+        with open(filename, 'w', encoding='utf-8') as f:
+            self.write_html(f)
+
+    def render_html(self):
+        """HTML отчёта строкой, без записи на диск"""
+        buf = StringIO()
+        self.write_html(buf)
+        return buf.getvalue()
+
+    def write_html(self, out):
+        template = report_template(self.config.get('template'))
         chart_base64 = ''
         if self.config.get('viz_type') != 'table':
             buf = self.add_visualization(self.config.get('viz_type', 'bar'))
             if buf:
                 chart_base64 = base64.b64encode(buf.read()).decode()
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(template.render(
-                logo=self.logo_path or '',
-                title=self.config.get('name', 'Отчёт'),
-                font=self.config.get('font', 'Helvetica'),
-                font_size=self.config.get('font_size', 12),
-                header_color=self.config.get('header_color', 'grey'),
-                bg_color=self.config.get('bg_color', '#f0f0f0'),
-                headers=self.headers,
-                data=data,
-                chart=chart_base64
-            ))
+        out.writelines(template.generate(
+            logo=self.logo_path or '',
+            title=self.config.get('name', 'Отчёт'),
+            font=self.config.get('font', 'Helvetica'),
+            font_size=self.config.get('font_size', 12),
+            header_color=self.config.get('header_color', 'grey'),
+            bg_color=self.config.get('bg_color', '#f0f0f0'),
+            headers=self.headers,
+            data=self.rows(),
+            chart=chart_base64
+        ))
+
+def export_job_result(report_id, config, report_format, filename=None, seconds=0, pid=None, error=None):
+    """Запись манифеста пакетного экспорта об одной задаче"""
+    return {'report_id': report_id, 'name': config.get('name', 'Отчёт'), 'format': report_format,
+            'file': filename if error is None else None,
+            'size': os.path.getsize(filename) if error is None else 0,
+            'seconds': round(seconds, 3), 'pid': pid, 'error': error}
+
+def export_report_job(report_id, config, report_format, filename, logo_path=None):
+    """Экспорт одного отчёта в процессе пула; у процесса своё соединение из собственного пула"""
+    started = time.perf_counter()
+    db = Database()
+    try:
+        ReportGenerator(db, config, report_format, logo_path).export(filename)
+        return export_job_result(report_id, config, report_format, filename, time.perf_counter() - started, os.getpid())
+    except Exception as e:
+        logging.error(f"Ошибка пакетного экспорта отчёта {report_id} в {report_format}: {e}")
+        return export_job_result(report_id, config, report_format, seconds=time.perf_counter() - started,
+                                 pid=os.getpid(), error=str(e))
+    finally:
+        db.close()
+
+class BatchExporter:
+    """Пакетный экспорт N отчётов в M форматов на пуле процессов: ReportLab и matplotlib загружают процессор
+    и держат GIL, поэтому потоки не дают ускорения. Итоги каждой задачи пишутся в manifest.json"""
+    extensions = {'pdf': 'pdf', 'excel': 'xlsx', 'html': 'html'}
+
+    def __init__(self, db, report_ids, formats, out_dir, workers=BATCH_EXPORT_WORKERS, progress=None,
+                 logo_path='school_logo.png'):
+        self.db = db
+        self.report_ids = list(report_ids)
+        self.formats = list(formats)
+        self.out_dir = out_dir
+        self.workers = workers
+        self.progress = progress  # progress(готово, всего)
+        self.logo_path = logo_path if logo_path and os.path.exists(logo_path) else None
+
+    def jobs(self):
+        for report_id in self.report_ids:
+            config = self.db.get_report_config(report_id)
+            if config is None:
+                continue
+            for report_format in self.formats:
+                filename = os.path.join(self.out_dir, f'report_{report_id}.{self.extensions[report_format]}')
+                yield report_id, config, report_format, filename, self.logo_path
+
+    def run(self):
+        """Выполняет все задачи и возвращает манифест. Манифест пишется всегда: задача, процесс которой
+        упал (BrokenProcessPool) или не был запущен, отмечается в нём как неудачная"""
+        os.makedirs(self.out_dir, exist_ok=True)
+        jobs = list(self.jobs())
+        started_at = datetime.datetime.now()
+        started = time.perf_counter()
+        results = {}
+        # spawn, а не fork: процесс интерфейса многопоточный, копировать его состояние в дочерние процессы нельзя
+        context = multiprocessing.get_context('spawn')
+        log_queue = context.Queue()
+        listener = QueueListener(log_queue, *logging.getLogger().handlers, respect_handler_level=True)
+        listener.start()
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                     initializer=worker_logging, initargs=(log_queue,)) as pool:
+                futures = {pool.submit(export_report_job, *job): i for i, job in enumerate(jobs)}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        report_id, config, report_format = jobs[i][:3]
+                        logging.error(f"Процесс пакетного экспорта отчёта {report_id} в {report_format} завершился аварийно: {e!r}")
+                        result = export_job_result(report_id, config, report_format, error=repr(e))
+                    results[i] = result
+                    logging.info(f"Пакетный экспорт: отчёт {result['report_id']} в {result['format']} "
+                                 f"за {result['seconds']} с{' с ошибкой: ' + result['error'] if result['error'] else ''}")
+                    if self.progress:
+                        self.progress(len(results), len(jobs))
+        except Exception as e:
+            logging.error(f"Ошибка пула пакетного экспорта: {e!r}")
+            for i, (report_id, config, report_format, _, _) in enumerate(jobs):
+                if i not in results:
+                    results[i] = export_job_result(report_id, config, report_format, error=repr(e))
+        finally:
+            listener.stop()
+            manifest = self.write_manifest(list(results.values()), started_at, time.perf_counter() - started)
+        return manifest
+
+    def write_manifest(self, results, started_at, seconds):
+        results.sort(key=lambda r: (r['report_id'], r['format']))
+        manifest = {
+            'started_at': started_at.isoformat(timespec='seconds'),
+            'seconds': round(seconds, 3),
+            'workers': self.workers,
+            'jobs': results,
+            'failed': sum(1 for r in results if r['error']),
+        }
+        with open(os.path.join(self.out_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return manifest
+
+class SmtpSession:
+    """Одно SMTP-соединение на пакет писем; при обрыве связи переподключается один раз"""
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, user=SMTP_USER, password=SMTP_PASSWORD, starttls=SMTP_STARTTLS):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.smtp = None
+        self.sent = 0
+
+    def connect(self):
+        self.smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.starttls:
+            self.smtp.starttls()
+        if self.user:
+            self.smtp.login(self.user, self.password)
+
+    def send(self, message, recipients):
+        if self.smtp is None:
+            self.connect()
+        try:
+            self.smtp.send_message(message, to_addrs=recipients)
+        except smtplib.SMTPServerDisconnected:
+            self.connect()
+            self.smtp.send_message(message, to_addrs=recipients)
+        self.sent += 1
+
+    def close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except smtplib.SMTPException:
+                pass
+            self.smtp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ReportScheduler:
+    """Отправка отчётов по расписанию из report_schedules. Задача APScheduler заводится на каждое
+    cron-выражение; за один запуск каждая пара (отчёт, формат) формируется один раз, а все письма
+    пакета уходят через одно SMTP-соединение"""
+    def __init__(self, db, out_dir=SCHEDULE_OUTPUT_DIR, smtp_factory=SmtpSession, sender=SMTP_SENDER):
+        self.db = db
+        self.out_dir = out_dir
+        self.smtp_factory = smtp_factory
+        self.sender = sender
+        self.scheduler = BackgroundScheduler()
+        self.crons = set()
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.scheduler.add_job(self.reload, 'interval', seconds=SCHEDULE_RELOAD_INTERVAL, id='reports:reload',
+                               next_run_time=datetime.datetime.now(), coalesce=True, max_instances=1)
+        self.scheduler.start()
+
+    def shutdown(self):
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+
+    def reload(self):
+        """Сверяет задачи планировщика с таблицей: изменения, сделанные в любом клиенте, подхватываются сами"""
+        try:
+            crons = {schedule[3] for schedule in self.db.get_schedules(enabled_only=True)}
+        finally:
+            self.db.close()
+        with self.lock:
+            for cron in crons - self.crons:
+                try:
+                    trigger = CronTrigger.from_crontab(cron)
+                except ValueError as e:
+                    logging.error(f"Некорректное расписание отчётов '{cron}': {e}")
+                    continue
+                self.scheduler.add_job(self.run_cron, trigger, args=[cron], id=f'reports:{cron}',
+                                       replace_existing=True, coalesce=True, max_instances=1)
+                self.crons.add(cron)
+            for cron in self.crons - crons:
+                self.scheduler.remove_job(f'reports:{cron}')
+                self.crons.discard(cron)
+
+    def run_cron(self, cron):
+        fire_time = datetime.datetime.now().replace(second=0, microsecond=0)
+        try:
+            schedules = [s for s in self.db.get_schedules(enabled_only=True) if s[3] == cron]
+            # Расписание может быть запущено в нескольких клиентах — отправляет тот, кто первым отметил запуск
+            schedules = [s for s in schedules if self.db.claim_schedule_run(s[0], fire_time)]
+            if schedules:
+                self.deliver(schedules)
+        except Exception as e:
+            logging.error(f"Ошибка отправки отчётов по расписанию '{cron}': {e}")
+        finally:
+            self.db.close()
+
+    def send_now(self, report_id, report_format, recipients):
+        """Пробная отправка отчёта без сохранения расписания, например для проверки настроек почты"""
+        return self.deliver([(None, report_id, report_format, None, ', '.join(recipients))])
+
+    def deliver(self, schedules):
+        """Формирует каждую пару (отчёт, формат) один раз и рассылает её всем подписчикам; возвращает число писем"""
+        recipients = OrderedDict()
+        for _, report_id, report_format, _, addresses in schedules:
+            targets = recipients.setdefault((report_id, report_format), [])
+            for address in addresses.split(','):
+                address = address.strip()
+                if address and address not in targets:
+                    targets.append(address)
+        run_dir = os.path.join(self.out_dir, datetime.datetime.now().strftime('%Y%m%d_%H%M%S'))
+        os.makedirs(run_dir, exist_ok=True)
+        rendered = []
+        for (report_id, report_format), addresses in recipients.items():
+            config = self.db.get_report_config(report_id)
+            if config is None or not addresses:
+                continue
+            filename = os.path.join(run_dir, f'report_{report_id}.{BatchExporter.extensions[report_format]}')
+            try:
+                ReportGenerator(self.db, config, report_format).export(filename)
+            except Exception as e:
+                logging.error(f"Ошибка формирования отчёта {report_id} в {report_format} по расписанию: {e}")
+                continue
+            rendered.append((report_id, config.get('name', 'Отчёт'), filename, addresses))
+        if not rendered:
+            return 0
+        with self.smtp_factory() as smtp:
+            for report_id, name, filename, addresses in rendered:
+                with open(filename, 'rb') as f:
+                    attachment = f.read()
+                for address in addresses:
+                    smtp.send(self.message(name, filename, attachment, address), [address])
+                self.db.log_report_action(report_id, None, f'Отчёт отправлен по расписанию: {len(addresses)} получателей')
+            sent = smtp.sent
+        logging.info(f'Отправка отчётов по расписанию: отчётов {len(rendered)}, писем {sent}')
+        return sent
+
+    def message(self, name, filename, attachment, address):
+        message = MIMEMultipart()
+        message['Subject'] = f'Отчёт: {name}'
+        message['From'] = self.sender
+        message['To'] = address
+        message.attach(MIMEText(f'Отчёт «{name}» сформирован {datetime.datetime.now():%d.%m.%Y %H:%M}.', 'plain', 'utf-8'))
+        part = MIMEApplication(attachment)
+        part.add_header('Content-Disposition', 'attachment', filename=os.path.basename(filename))
+        message.attach(part)
+        return message
 
 class ReportEditor(QDialog):
     """Редактор отчётов с поддержкой Undo/Redo и редактируемым предпросмотром"""
@@ -318,6 +1281,19 @@ class ReportEditor(QDialog):
         def undo(self):
             self.fields_list.addItem(self.field)
 
+    group_by_choices = {
+        'Без группировки': [],
+        'Категория': ['category'],
+        'Состояние': ['condition'],
+        'Год покупки': ['purchase_year'],
+        'Категория и состояние': ['category', 'condition'],
+    }
+    aggregate_choices = {
+        'Число предметов': {'func': 'COUNT', 'field': '*'},
+        'Сумма количества': {'func': 'SUM', 'field': 'quantity'},
+        'Средний срок службы': {'func': 'AVG', 'field': 'service_life'},
+    }
+
     def __init__(self, db, user_id, report_id=None, config=None):
         super().__init__()
         self.setWindowTitle('Редактор отчётов')
@@ -336,6 +1312,10 @@ class ReportEditor(QDialog):
             'preview_html': '<h1>Предпросмотр отчёта</h1>'
         }
         self.undo_stack = QUndoStack(self)
+        self.async_db = AsyncDatabase(db, self)
+        self.async_db.busy_changed.connect(lambda busy: self.setCursor(Qt.BusyCursor) if busy else self.unsetCursor())
+        self.preview_generation = 0
+        self.preview_data = None  # (ключ данных, строки) последнего предпросмотра
         self.setup_ui()
         self.preview.setHtml(self.config['preview_html'])
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
@@ -382,6 +1362,15 @@ class ReportEditor(QDialog):
         self.date_from.setDate(QDate.fromString(self.config['filters'].get('date_from', '2000-01-01'), 'yyyy-MM-dd'))
         self.date_to = QDateEdit()
         self.date_to.setDate(QDate.fromString(self.config['filters'].get('date_to', QDate.currentDate().toString('yyyy-MM-dd')), 'yyyy-MM-dd'))
+        self.group_by_input = QComboBox()
+        self.group_by_input.addItems(list(self.group_by_choices))
+        self.group_by_input.setCurrentText(next((label for label, group in self.group_by_choices.items()
+                                                 if group == self.config.get('group_by', [])), 'Без группировки'))
+        self.aggregate_input = QComboBox()
+        self.aggregate_input.addItems(list(self.aggregate_choices))
+        aggregates = self.config.get('aggregates') or [self.aggregate_choices['Число предметов']]
+        self.aggregate_input.setCurrentText(next((label for label, spec in self.aggregate_choices.items()
+                                                  if spec == aggregates[0]), 'Число предметов'))
         self.viz_type = QComboBox()
         self.viz_type.addItems(['Таблица', 'Столбчатая диаграмма', 'Круговая диаграмма', 'Линейный график'])
         self.viz_type.setCurrentText({
@@ -396,16 +1385,25 @@ class ReportEditor(QDialog):
         self.font_size.setValue(self.config.get('font_size', 12))
         self.header_color = QLineEdit(self.config.get('header_color', 'grey'))
         self.bg_color = QLineEdit(self.config.get('bg_color', '#f0f0f0'))
+        self.pdf_fast = QCheckBox('Быстрый PDF (только таблица)')
+        self.pdf_fast.setChecked(self.config.get('pdf_fast', False))
+        self.template_input = QComboBox()
+        self.template_input.addItems(list_report_templates())
+        self.template_input.setCurrentText(self.config.get('template', 'report.html'))
         properties_panel.addRow('Название отчёта', self.name_input)
         properties_panel.addRow('Категория', self.category_filter)
         properties_panel.addRow('Состояние', self.condition_filter)
         properties_panel.addRow('Дата с', self.date_from)
         properties_panel.addRow('Дата по', self.date_to)
+        properties_panel.addRow('Группировка', self.group_by_input)
+        properties_panel.addRow('Итог', self.aggregate_input)
         properties_panel.addRow('Тип визуализации', self.viz_type)
         properties_panel.addRow('Шрифт', self.font_input)
         properties_panel.addRow('Размер шрифта', self.font_size)
         properties_panel.addRow('Цвет заголовков', self.header_color)
         properties_panel.addRow('Цвет фона', self.bg_color)
+        properties_panel.addRow('Шаблон HTML', self.template_input)
+        properties_panel.addRow('', self.pdf_fast)
 
         # Панель предпросмотра с возможностью редактирования
         preview_panel = QVBoxLayout()
@@ -448,6 +1446,17 @@ class ReportEditor(QDialog):
         layout.addLayout(preview_panel)
         layout.addLayout(buttons_panel)
         self.setLayout(layout)
+
+        # Изменения оформления перерисовывают предпросмотр сами, после паузы во вводе и без нового запроса к базе
+        self.style_timer = QTimer(self)
+        self.style_timer.setSingleShot(True)
+        self.style_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.style_timer.timeout.connect(self.apply_style)
+        for signal in (self.name_input.textChanged, self.font_input.currentFontChanged, self.font_size.valueChanged,
+                       self.header_color.textChanged, self.bg_color.textChanged, self.viz_type.currentTextChanged,
+                       self.template_input.currentTextChanged):
+            # Без lambda valueChanged(int) вызвал бы start(int) и подменил интервал размером шрифта
+            signal.connect(lambda *_: self.style_timer.start())
         self.update_preview()
 
     def add_formatting_toolbar(self):
@@ -593,7 +1602,9 @@ class ReportEditor(QDialog):
             command = self.RemoveFieldCommand(self.selected_fields, current.text())
             self.undo_stack.push(command)
 
-    def insert_data(self):
+    def read_config(self):
+        """Собирает конфигурацию отчёта из всех полей редактора — одна для предпросмотра и сохранения"""
+        self.config['name'] = self.name_input.text()
         self.config['fields'] = [self.selected_fields.item(i).text().lower() for i in range(self.selected_fields.count())]
         self.config['filters'] = {
             'category': self.category_filter.currentText() if self.category_filter.currentText() != 'Все' else None,
@@ -601,20 +1612,52 @@ class ReportEditor(QDialog):
             'date_from': self.date_from.date().toString('yyyy-MM-dd'),
             'date_to': self.date_to.date().toString('yyyy-MM-dd')
         }
+        self.config['group_by'] = self.group_by_choices[self.group_by_input.currentText()]
+        self.config['aggregates'] = [self.aggregate_choices[self.aggregate_input.currentText()]] if self.config['group_by'] else []
+        self.config['viz_type'] = {'Таблица': 'table', 'Столбчатая диаграмма': 'bar', 'Круговая диаграмма': 'pie', 'Линейный график': 'line'}[self.viz_type.currentText()]
+        self.config['font'] = self.font_input.currentFont().family()
+        self.config['font_size'] = self.font_size.value()
+        self.config['header_color'] = self.header_color.text()
+        self.config['bg_color'] = self.bg_color.text()
+        self.config['pdf_fast'] = self.pdf_fast.isChecked()
+        self.config['template'] = self.template_input.currentText()
+
+    def insert_data(self):
+        self.read_config()
+        self.update_preview()
+
+    def apply_style(self):
         self.config['viz_type'] = {'Таблица': 'table', 'Столбчатая диаграмма': 'bar', 'Круговая диаграмма': 'pie', 'Линейный график': 'line'}[self.viz_type.currentText()]
         self.config['font'] = self.font_input.currentFont().family()
         self.config['font_size'] = self.font_size.value()
         self.config['header_color'] = self.header_color.text()
         self.config['bg_color'] = self.bg_color.text()
+        self.config['template'] = self.template_input.currentText()
         self.update_preview()
 
     def update_preview(self):
         self.config['fields'] = [self.selected_fields.item(i).text().lower() for i in range(self.selected_fields.count())]
         self.config['name'] = self.name_input.text()
-        report = ReportGenerator(self.db, self.config, 'html', 'school_logo.png')
-        report.generate_html('preview.html')
-        with open('preview.html', 'r', encoding='utf-8') as f:
-            generated_html = f.read()
+        self.preview_generation += 1
+        generation = self.preview_generation
+        self.async_db.run(self.render_preview, dict(self.config), self.preview_data,
+                          on_done=lambda result: self.show_preview(generation, *result),
+                          on_error=lambda e: QMessageBox.warning(self, 'Ошибка', f'Не удалось построить предпросмотр: {e}'))
+
+    def render_preview(self, config, cached):
+        # Выполняется в фоновом потоке. Если поля и фильтры не менялись, строки берутся из прошлого предпросмотра
+        report = ReportGenerator(self.db, config, 'html', 'school_logo.png')
+        key = report.data_key()
+        if cached and cached[0] == key:
+            report.data = cached[1]
+        else:
+            report.data = list(report.rows())
+        return (key, report.data), report.render_html()
+
+    def show_preview(self, generation, data, generated_html):
+        if generation != self.preview_generation:
+            return
+        self.preview_data = data
         self.preview.setHtml(generated_html)
         self.config['preview_html'] = generated_html  # Инициализируем сгенерированным HTML
 
@@ -627,29 +1670,13 @@ class ReportEditor(QDialog):
             QMessageBox.information(self, 'Успех', 'Отчёт отправлен на печать')
 
     def save_report(self):
-        self.config['name'] = self.name_input.text()
-        self.config['fields'] = [self.selected_fields.item(i).text().lower() for i in range(self.selected_fields.count())]
-        self.config['filters'] = {
-            'category': self.category_filter.currentText() if self.category_filter.currentText() != 'Все' else None,
-            'condition': self.condition_filter.currentText() if self.condition_filter.currentText() != 'Все' else None,
-            'date_from': self.date_from.date().toString('yyyy-MM-dd'),
-            'date_to': self.date_to.date().toString('yyyy-MM-dd')
-        }
-        self.config['viz_type'] = {'Таблица': 'table', 'Столбчатая диаграмма': 'bar', 'Круговая диаграмма': 'pie', 'Линейный график': 'line'}[self.viz_type.currentText()]
-        self.config['font'] = self.font_input.currentFont().family()
-        self.config['font_size'] = self.font_size.value()
-        self.config['header_color'] = self.header_color.text()
-        self.config['bg_color'] = self.bg_color.text()
+        self.read_config()
         self.config['preview_html'] = self.preview.toHtml()  # Сохраняем отредактированный HTML
-        cursor = self.db.conn.cursor()
-        if self.report_id:
-            cursor.execute("UPDATE report_templates SET config = ?, type = ? WHERE id = ?",
-                           (json.dumps(self.config), self.config['viz_type'], self.report_id))
-        else:
-            cursor.execute("INSERT INTO report_templates (user_id, config, type, created_at) VALUES (?, ?, ?, ?)",
-                           (self.user_id, json.dumps(self.config), self.config['viz_type'], datetime.datetime.now()))
-        self.db.conn.commit()
-        self.db.log_action(self.user_id, f"Сохранён отчёт {self.config['name']}")
+        self.async_db.run(self.db.save_report_template, self.report_id, self.user_id, dict(self.config), write=True,
+                          on_done=lambda _: self.report_saved(),
+                          on_error=lambda e: QMessageBox.warning(self, 'Ошибка', f'Не удалось сохранить отчёт: {e}'))
+
+    def report_saved(self):
         QMessageBox.information(self, 'Успех', 'Отчёт сохранён')
         self.accept()
 
@@ -659,7 +1686,7 @@ class ReportEditor(QDialog):
         dialog.setWindowTitle('Таблица инвентаря')
         layout = QVBoxLayout()
         table = QTableView()
-        model = InventoryTableModel(self.db)
+        model = InventoryTableModel(self.async_db)
         table.setModel(model)
         table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         layout.addWidget(table)
@@ -668,64 +1695,666 @@ class ReportEditor(QDialog):
         dialog.exec_()
 
 class InventoryTableModel(QAbstractTableModel):
-    """Модель таблицы с пагинацией для инвентаря"""
-    def __init__(self, db, page_size=100):
+    """Модель таблицы инвентаря с подгрузкой при прокрутке (keyset-пагинация по id)"""
+    headers = INVENTORY_HEADERS
+
+    def __init__(self, async_db, page_size=100):
         super().__init__()
-        self.db = db
-        self.page = 0
+        self.async_db = async_db
+        self.db = async_db.db
         self.page_size = page_size
-        self.data = self.load_page()
+        self.rows = []
+        self.last_id = 0
+        self.exhausted = True
+        self.browsing = True  # False, когда показан готовый набор строк, например результаты поиска
+        self.generation = 0
+        self.next_page = None  # (поколение, id после которого загружено, строки)
+        self.prefetching = False
+        self.fetch_requested = False
+        self.reload()
+
+    def load_page(self, after_id=0):
+        """Страница строк с id больше after_id; стоимость не зависит от номера страницы"""
+        query, params = self.db.backend.limit(f"SELECT {INVENTORY_COLUMNS} FROM inventory WHERE id > ? ORDER BY id",
+                                              self.page_size)
+        with self.db.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, [after_id] + params)
+            return cursor.fetchall()
+
+    def reload(self):
+        """Сбрасывает модель на первую страницу; строки приходят из фонового потока"""
+        self.generation += 1
+        generation = self.generation
+        self.next_page = None
+        self.async_db.run(self.load_page, 0, on_done=lambda rows: self.show_first_page(generation, rows))
+
+    def show_first_page(self, generation, rows):
+        if generation != self.generation:
+            return
+        self.beginResetModel()
+        self.rows = []
+        self.last_id = 0
+        self.browsing = True
+        self.add_rows(rows)
+        self.endResetModel()
+        self.start_prefetch()
+
+    def set_rows(self, rows):
+        """Показывает готовый набор строк без подгрузки страниц"""
+        self.beginResetModel()
+        self.generation += 1
+        self.rows = list(rows)
+        self.browsing = False
+        self.next_page = None
+        self.endResetModel()
+
+    def add_rows(self, rows):
+        self.rows.extend(rows)
+        if rows:
+            self.last_id = rows[-1][0]
+        self.exhausted = len(rows) < self.page_size
+
+    def start_prefetch(self):
+        """Загружает следующую страницу заранее, пока пользователь смотрит текущую"""
+        if self.exhausted or self.prefetching:
+            return
+        generation, after_id = self.generation, self.last_id
+        self.prefetching = True
+        self.async_db.run(self.load_page, after_id, busy=False,
+                          on_done=lambda rows: self.prefetched(generation, after_id, rows),
+                          on_error=lambda e: setattr(self, 'prefetching', False))
+
+    def prefetched(self, generation, after_id, rows):
+        self.prefetching = False
+        if (generation, after_id) != (self.generation, self.last_id):
+            self.start_prefetch()
+            return
+        self.next_page = (generation, after_id, rows)
+        if self.fetch_requested:
+            self.fetchMore()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return self.browsing and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        page, self.next_page = self.next_page, None
+        if not page or page[:2] != (self.generation, self.last_id):
+            # Страница ещё загружается — покажем её, как только придёт
+            self.fetch_requested = True
+            self.start_prefetch()
+            return
+        self.fetch_requested = False
+        rows = page[2]
+        if rows:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+            self.add_rows(rows)
+            self.endInsertRows()
+        else:
+            self.exhausted = True
+        self.start_prefetch()
 
-    def load_page(self):
-        offset = self.page * self.page_size
-        query = f"SELECT * FROM inventory ORDER BY id OFFSET {offset} ROWS FETCH NEXT {self.page_size} ROWS ONLY"
-        cursor = self.db.conn.cursor()
-        cursor.execute(query)
-        return cursor.fetchall()
+    def rowCount(self, parent=None):
+        return len(self.rows)
+
+    def columnCount(self, parent=None):
+        return len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole:
+            return str(self.rows[index.row()][index.column()])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return None
+
+class BookingTableModel(QAbstractTableModel):
+    """Модель таблицы бронирований: сортировка и фильтры выполняются в базе,
+    строки подгружаются страницами при прокрутке (keyset-пагинация по столбцу сортировки и id)"""
+    headers = ['ID', 'Предмет', 'Дата брони', 'Занятие']
+
+    def __init__(self, async_db, user_id=None, page_size=100):
+        super().__init__()
+        self.async_db = async_db
+        self.db = async_db.db
+        self.user_id = user_id
+        self.page_size = page_size
+        self.sort_column = 2
+        self.descending = False
+        self.filters = {'date_from': None, 'date_to': None, 'class_': None}
+        self.rows = []
+        self.exhausted = True
+        self.loading = False
+        self.generation = 0
+        self.reload()
+
+    def key(self, row):
+        return row[self.sort_column], row[0]
+
+    def load_page(self, after=None):
+        return self.db.get_bookings_page(self.user_id, self.sort_column, self.descending, after,
+                                         limit=self.page_size, **self.filters)
+
+    def reload(self):
+        self.generation += 1
+        generation = self.generation
+        self.loading = True
+        self.async_db.run(self.load_page, on_done=lambda rows: self.show_first_page(generation, rows),
+                          on_error=lambda e: setattr(self, 'loading', False))
+
+    def show_first_page(self, generation, rows):
+        if generation != self.generation:
+            return
+        self.loading = False
+        self.beginResetModel()
+        self.rows = list(rows)
+        self.exhausted = len(rows) < self.page_size
+        self.endResetModel()
+
+    def set_filter(self, date_from=None, date_to=None, class_=None):
+        self.filters = {'date_from': date_from, 'date_to': date_to, 'class_': class_ or None}
+        self.reload()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        descending = order == Qt.DescendingOrder
+        if (column, descending) != (self.sort_column, self.descending):
+            self.sort_column, self.descending = column, descending
+            self.reload()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not self.exhausted and not self.loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self.loading or not self.rows:
+            return
+        generation = self.generation
+        self.loading = True
+        self.async_db.run(self.load_page, self.key(self.rows[-1]), busy=False,
+                          on_done=lambda rows: self.add_page(generation, rows),
+                          on_error=lambda e: setattr(self, 'loading', False))
+
+    def add_page(self, generation, rows):
+        if generation != self.generation:
+            return
+        self.loading = False
+        self.exhausted = len(rows) < self.page_size
+        if rows:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+            self.rows.extend(rows)
+            self.endInsertRows()
+
+    def insert_booking(self, booking_id):
+        """Добавляет новую бронь на её место в загруженных строках, не перечитывая таблицу"""
+        generation = self.generation
+        self.async_db.run(self.db.get_booking, booking_id, busy=False,
+                          on_done=lambda row: self.insert_row(generation, row))
+
+    def insert_row(self, generation, row):
+        if generation != self.generation or row is None or not self.matches(row):
+            return
+        keys = [self.key(r) for r in self.rows]
+        if self.descending:
+            position = len(keys) - bisect.bisect_left(keys[::-1], self.key(row))
+        else:
+            position = bisect.bisect_right(keys, self.key(row))
+        if position == len(self.rows) and not self.exhausted:
+            return  # строка попадёт на одну из ещё не загруженных страниц
+        self.beginInsertRows(QModelIndex(), position, position)
+        self.rows.insert(position, row)
+        self.endInsertRows()
+
+    def matches(self, row):
+        date_from, date_to, class_ = self.filters['date_from'], self.filters['date_to'], self.filters['class_']
+        day = iso_day(row[2])
+        return ((not date_from or day >= iso_day(date_from)) and (not date_to or day <= iso_day(date_to))
+                and (not class_ or class_.lower() in (row[3] or '').lower()))
 
     def rowCount(self, parent=None):
-        return len(self.data)
+        return len(self.rows)
 
     def columnCount(self, parent=None):
-        return 7  # ID, Название, Категория, Количество, Состояние, Дата покупки, Срок службы
+        return len(self.headers)
 
     def data(self, index, role=Qt.DisplayRole):
         if role == Qt.DisplayRole:
-            return str(self.data[index.row()][index.column()])
+            return str(self.rows[index.row()][index.column()])
         return None
 
     def headerData(self, section, orientation, role=Qt.DisplayRole):
         if role == Qt.DisplayRole and orientation == Qt.Horizontal:
-            headers = ['ID', 'Название', 'Категория', 'Количество', 'Состояние', 'Дата покупки', 'Срок службы']
-            return headers[section]
+            return self.headers[section]
         return None
 
-    def next_page(self):
-        self.page += 1
-        self.data = self.load_page()
-        self.layoutChanged.emit()
+class LogTableModel(QAbstractTableModel):
+    """Модель журнала действий: новые записи сверху, подгрузка страниц при прокрутке
+    (keyset-пагинация по времени и id), фильтры в базе и периодическая догрузка новых записей"""
+    headers = ['ID', 'Пользователь', 'Действие', 'Время']
 
-    def prev_page(self):
-        if self.page > 0:
-            self.page -= 1
-            self.data = self.load_page()
-            self.layoutChanged.emit()
+    def __init__(self, async_db, page_size=100, tail_interval=LOG_TAIL_INTERVAL_MS):
+        super().__init__()
+        self.async_db = async_db
+        self.db = async_db.db
+        self.page_size = page_size
+        self.filters = {'user_id': None, 'action': None, 'date_from': None, 'date_to': None}
+        self.rows = []
+        self.last_id = 0  # наибольший id среди показанных записей, от него догружаются новые
+        self.exhausted = True
+        self.loading = False
+        self.tailing = False
+        self.generation = 0
+        # Таймер запускается, только пока журнал виден: скрытая вкладка не опрашивает базу
+        self.tail_timer = QTimer(self)
+        self.tail_timer.setInterval(tail_interval)
+        self.tail_timer.timeout.connect(self.tail)
+        self.reload()
+
+    def start_tail(self):
+        if not self.tail_timer.isActive():
+            self.tail()
+            self.tail_timer.start()
+
+    def stop_tail(self):
+        self.tail_timer.stop()
+
+    def load_page(self, after=None, newer_than=None):
+        return self.db.get_logs_page(after=after, newer_than=newer_than, limit=self.page_size, **self.filters)
+
+    def load_newer(self, last_id=None):
+        """Записи новее last_id (без него — первая страница) и id, от которого считать новые в следующий раз.
+        Последний id читается до запроса, поэтому записи, вставленные во время запроса, не пропадут"""
+        newest = self.db.get_last_log_id()
+        rows = self.load_page(newer_than=last_id)
+        return rows, max([newest] + [row[0] for row in rows])
+
+    def reload(self):
+        self.generation += 1
+        generation = self.generation
+        self.loading = True
+        self.async_db.run(self.load_newer, on_done=lambda result: self.show_first_page(generation, *result),
+                          on_error=lambda e: setattr(self, 'loading', False))
+
+    def show_first_page(self, generation, rows, last_id):
+        if generation != self.generation:
+            return
+        self.loading = False
+        self.beginResetModel()
+        self.rows = list(rows)
+        self.last_id = last_id
+        self.exhausted = len(rows) < self.page_size
+        self.endResetModel()
+
+    def set_filter(self, user_id=None, action=None, date_from=None, date_to=None):
+        self.filters = {'user_id': user_id, 'action': action or None, 'date_from': date_from, 'date_to': date_to}
+        self.reload()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not self.exhausted and not self.loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self.loading or not self.rows:
+            return
+        generation = self.generation
+        last = self.rows[-1]
+        self.loading = True
+        self.async_db.run(self.load_page, (last[3], last[0]), busy=False,
+                          on_done=lambda rows: self.add_page(generation, rows),
+                          on_error=lambda e: setattr(self, 'loading', False))
+
+    def add_page(self, generation, rows):
+        if generation != self.generation:
+            return
+        self.loading = False
+        self.exhausted = len(rows) < self.page_size
+        if rows:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+            self.rows.extend(rows)
+            self.endInsertRows()
+
+    def tail(self):
+        """Догружает записи, появившиеся после последней показанной, и вставляет их сверху"""
+        if self.loading or self.tailing:
+            return
+        generation = self.generation
+        self.tailing = True
+        self.async_db.run(self.load_newer, self.last_id, busy=False,
+                          on_done=lambda result: self.add_newer(generation, *result),
+                          on_error=lambda e: setattr(self, 'tailing', False))
+
+    def add_newer(self, generation, rows, last_id):
+        self.tailing = False
+        if generation != self.generation:
+            return
+        if len(rows) == self.page_size:
+            self.reload()  # новых записей не меньше страницы — проще показать первую страницу заново
+            return
+        self.last_id = last_id
+        if rows:
+            self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+            self.rows[:0] = rows
+            self.endInsertRows()
 
-class Database:
-    """Обработка операций с базой данных SQL Server"""
-    def __init__(self):
-        self.server = 'H9ISE'
-        self.database = 'inventoryyyyyyyy'
-        self.conn = None
-        self.connect_or_create()
-        self.create_tables()
-        self.add_default_users()
-        self.add_default_templates()
+    def rowCount(self, parent=None):
+        return len(self.rows)
 
-    def connect_or_create(self):
-        master_conn_str = f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={self.server};DATABASE=master;Trusted_Connection=yes;"
+    def columnCount(self, parent=None):
+        return len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole:
+            return str(self.rows[index.row()][index.column()])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return None
+
+class SearchController(QObject):
+    """Поиск по мере ввода: задержка ввода, отмена устаревших запросов и кэш результатов по префиксам"""
+    def __init__(self, async_db, line_edit, model, delay=SEARCH_DEBOUNCE_MS):
+        super().__init__(line_edit)
+        self.async_db = async_db
+        self.db = async_db.db
+        self.line_edit = line_edit
+        self.model = model
+        self.generation = 0
+        self.pending = None
+        self.cache = OrderedDict()  # запрос -> (время, строки)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.search_now)
+        line_edit.textChanged.connect(lambda _: self.timer.start())
+        line_edit.returnPressed.connect(self.search_now)
+
+    def search_now(self):
+        self.timer.stop()
+        self.generation += 1
+        if self.pending:
+            self.pending.cancel()
+            self.pending = None
+        query = self.line_edit.text().strip()
+        if not query:
+            self.model.reload()
+            return
+        rows = self.cached(query)
+        if rows is not None:
+            self.model.set_rows(rows)
+            return
+        generation = self.generation
+        self.pending = self.async_db.run(self.db.search_inventory, query,
+                                         on_done=lambda rows: self.show_results(generation, query, rows))
+
+    def show_results(self, generation, query, rows):
+        self.remember(query, rows)
+        if generation == self.generation:
+            self.pending = None
+            self.model.set_rows(rows)
+
+    def cached(self, query):
+        """Результат из кэша: точное совпадение или фильтрация полного результата более короткого запроса"""
+        now = time.monotonic()
+        for key in [k for k, (stored_at, _) in self.cache.items() if now - stored_at > SEARCH_CACHE_TTL]:
+            del self.cache[key]
+        if query in self.cache:
+            self.cache.move_to_end(query)
+            return self.cache[query][1]
+        # Для числовых запросов есть поиск по точному id, его результат не выводится из префикса
+        if query.isdigit():
+            return None
+        terms = InventorySearch.tokenize(query)
+        for prefix in range(len(query) - 1, 0, -1):
+            entry = self.cache.get(query[:prefix])
+            if entry and len(entry[1]) < SEARCH_LIMIT and not query[:prefix].strip().isdigit():
+                rows = [row for row in entry[1] if InventorySearch.matches(row, terms)]
+                self.remember(query, rows)
+                return rows
+        return None
+
+    def remember(self, query, rows):
+        self.cache[query] = (time.monotonic(), rows)
+        self.cache.move_to_end(query)
+        while len(self.cache) > SEARCH_CACHE_SIZE:
+            self.cache.popitem(last=False)
+
+    def invalidate(self):
+        self.cache.clear()
+
+class StorageBackend(ABC):
+    """Базовый интерфейс хранилища: подключение, схема таблиц и особенности SQL-диалекта"""
+    name = None
+    # (имя таблицы, DDL) в порядке создания с учётом внешних ключей
+    tables = ()
+    schema_version_ddl = None
+    # Счётчик изменений инвентаря, который увеличивают триггеры при любой записи
+    inventory_version_ddl = ()
+    report_schedules_ddl = None
+    booking_indexes_ddl = ()
+    logs_indexes_ddl = ()
+
+    @abstractmethod
+    def connect(self):
+        raise NotImplementedError
+
+    def ping(self, conn):
+        """Проверка, что соединение ещё живо"""
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+    @abstractmethod
+    def limit(self, query, limit):
+        """Ограничивает число строк упорядоченного запроса, возвращает SQL и параметры"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def year(self, column):
+        """SQL-выражение: год из столбца с датой"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def insert(self, cursor, query, params):
+        """Выполняет INSERT и возвращает id вставленной строки"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def create_search_index(self, cursor):
+        """Создаёт индексы для поиска по инвентарю"""
+        raise NotImplementedError
+
+    def post_migrate(self):
+        """Изменения схемы, которые нельзя выполнять в транзакции миграции; вызывается после всех миграций"""
+
+    @abstractmethod
+    def search(self, cursor, terms, limit):
+        """Строки инвентаря, содержащие слова с префиксами terms, по убыванию релевантности"""
+        raise NotImplementedError
+
+    def executemany(self, cursor, query, rows):
+        """Пакетное выполнение запроса для списка строк параметров"""
+        cursor.executemany(query, rows)
+
+    @abstractmethod
+    def lock_item(self, cursor, inventory_id):
+        """Открывает транзакцию, блокирующую бронирования предмета до commit, и возвращает его количество"""
+        raise NotImplementedError
+
+class SqlServerBackend(StorageBackend):
+    """Хранилище на SQL Server через ODBC Driver 17"""
+    name = 'sqlserver'
+    schema_version_ddl = """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='schema_version' AND xtype='U')
+        CREATE TABLE schema_version (
+            version INT PRIMARY KEY,
+            description NVARCHAR(255),
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    tables = (
+        ('users', """
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='users' AND xtype='U')
+            CREATE TABLE users (
+                id INT IDENTITY(1,1) PRIMARY KEY,
+                username NVARCHAR(50) UNIQUE,
+                password VARBINARY(MAX),
+                role NVARCHAR(20) CHECK (role IN ('Admin', 'Teacher', 'Student'))
+            )
+        """),
+        ('inventory', """
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='inventory' AND xtype='U')
+            CREATE TABLE inventory (
+                id INT IDENTITY(1,1) PRIMARY KEY,
+                name NVARCHAR(100),
+                category NVARCHAR(50),
+                quantity INT,
+                condition NVARCHAR(20),
+                purchase_date DATE,
+                service_life INT,
+                photo VARBINARY(MAX)
+            )
+        """),
+        ('bookings', """
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='bookings' AND xtype='U')
+            CREATE TABLE bookings (
+                id INT IDENTITY(1,1) PRIMARY KEY,
+                inventory_id INT,
+                user_id INT,
+                booking_date DATE,
+                class NVARCHAR(50),
+                FOREIGN KEY (inventory_id) REFERENCES inventory(id),
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        """),
+        ('logs', """
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='logs' AND xtype='U')
+            CREATE TABLE logs (
+                id INT IDENTITY(1,1) PRIMARY KEY,
+                user_id INT,
+                action NVARCHAR(255),
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        """),
+        ('report_templates', """
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='report_templates' AND xtype='U')
+            CREATE TABLE report_templates (
+                id INT IDENTITY(1,1) PRIMARY KEY,
+                user_id INT,
+                config NVARCHAR(MAX),
+                type NVARCHAR(50),
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        """),
+        ('report_history', """
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='report_history' AND xtype='U')
+            CREATE TABLE report_history (
+                id INT IDENTITY(1,1) PRIMARY KEY,
+                report_id INT,
+                user_id INT,
+                action NVARCHAR(255),
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (report_id) REFERENCES report_templates(id),
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        """),
+    )
+
+    report_schedules_ddl = """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='report_schedules' AND xtype='U')
+        CREATE TABLE report_schedules (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            report_id INT NOT NULL,
+            format NVARCHAR(10) NOT NULL,
+            cron NVARCHAR(100) NOT NULL,
+            recipients NVARCHAR(MAX),
+            enabled BIT DEFAULT 1,
+            last_run DATETIME,
+            created_by INT,
+            FOREIGN KEY (report_id) REFERENCES report_templates(id) ON DELETE CASCADE,
+            FOREIGN KEY (created_by) REFERENCES users(id),
+            CONSTRAINT ux_report_schedules UNIQUE (report_id, format, cron)
+        )
+    """
+
+    logs_indexes_ddl = (
+        """
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'ix_logs_timestamp')
+        CREATE INDEX ix_logs_timestamp ON logs(timestamp DESC, id DESC)
+        """,
+        """
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'ix_logs_user_timestamp')
+        CREATE INDEX ix_logs_user_timestamp ON logs(user_id, timestamp DESC, id DESC)
+        """,
+        """
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'ix_logs_action')
+        CREATE INDEX ix_logs_action ON logs(action)
+        """,
+    )
+
+    booking_indexes_ddl = (
+        """
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'ix_bookings_item_date')
+        CREATE INDEX ix_bookings_item_date ON bookings(inventory_id, booking_date)
+        """,
+        """
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'ix_bookings_user_date')
+        CREATE INDEX ix_bookings_user_date ON bookings(user_id, booking_date)
+        """,
+        """
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'ix_bookings_date')
+        CREATE INDEX ix_bookings_date ON bookings(booking_date) INCLUDE (inventory_id)
+        """,
+    )
+
+    inventory_version_ddl = (
+        """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='inventory_version' AND xtype='U')
+        CREATE TABLE inventory_version (
+            id INT PRIMARY KEY,
+            version BIGINT NOT NULL
+        )
+        """,
+        "IF NOT EXISTS (SELECT 1 FROM inventory_version WHERE id = 1) INSERT INTO inventory_version (id, version) VALUES (1, 0)",
+        """
+        IF OBJECT_ID('trg_inventory_version', 'TR') IS NULL
+        EXEC('CREATE TRIGGER trg_inventory_version ON inventory AFTER INSERT, UPDATE, DELETE AS
+              BEGIN
+                  SET NOCOUNT ON;
+                  UPDATE inventory_version SET version = version + 1 WHERE id = 1;
+              END')
+        """,
+    )
+
+    def __init__(self, server=SQLSERVER_HOST, database=SQLSERVER_DATABASE):
+        self.server = server
+        self.database = database
+        self.fulltext = None
+
+    def conn_str(self, database):
+        return f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={self.server};DATABASE={database};Trusted_Connection=yes;"
+
+    def connect(self):
+        if pyodbc is None:
+            raise RuntimeError('Для работы с SQL Server требуется пакет pyodbc')
+        try:
+            conn = pyodbc.connect(self.conn_str(self.database))
+        except pyodbc.Error:
+            # База ещё не создана: обращаемся к master только в этом случае
+            self.create_database()
+            try:
+                conn = pyodbc.connect(self.conn_str(self.database))
+            except pyodbc.Error as e:
+                logging.error(f"Ошибка подключения к базе данных: {e}")
+                raise
+        conn.autocommit = False
+        return conn
+
+    def create_database(self):
         try:
-            master_conn = pyodbc.connect(master_conn_str, autocommit=True)
+            master_conn = pyodbc.connect(self.conn_str('master'), autocommit=True)
             cursor = master_conn.cursor()
             cursor.execute(f"""
                 IF NOT EXISTS (SELECT name FROM sys.databases WHERE name = N'{self.database}')
@@ -733,303 +2362,1697 @@ class Database:
             """)
             cursor.close()
             master_conn.close()
-        except Exception as e:
+        except pyodbc.Error as e:
             logging.error(f"Ошибка создания базы данных: {e}")
             raise
 
-        conn_str = f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={self.server};DATABASE={self.database};Trusted_Connection=yes;"
-        try:
-            self.conn = pyodbc.connect(conn_str)
-            self.conn.autocommit = False
-        except Exception as e:
-            logging.error(f"Ошибка подключения к базе данных: {e}")
-            raise
+    def limit(self, query, limit):
+        return f"{query} OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY", [limit]
+
+    def year(self, column):
+        return f"YEAR({column})"
+
+    def insert(self, cursor, query, params):
+        # pyodbc выполняет запрос с параметрами через sp_prepexec, и отдельный SELECT SCOPE_IDENTITY()
+        # попадает в другую область видимости — поэтому он идёт в том же пакете, что и INSERT.
+        # OUTPUT INSERTED.id не подходит: на inventory есть триггеры
+        cursor.execute(f'{query}; SELECT SCOPE_IDENTITY()', params)
+        while cursor.description is None:  # первые результаты пакета — счётчики строк без данных
+            if not cursor.nextset():
+                raise pyodbc.Error('INSERT не вернул идентификатор строки')
+        return int(cursor.fetchone()[0])
+
+    def executemany(self, cursor, query, rows):
+        # Параметры всего пакета передаются драйверу массивом за один обмен с сервером
+        cursor.fast_executemany = True
+        cursor.executemany(query, rows)
+
+    def lock_item(self, cursor, inventory_id):
+        # UPDLOCK + HOLDLOCK держат строку предмета до конца транзакции: параллельные брони одного предмета идут по очереди
+        cursor.execute('SELECT quantity FROM inventory WITH (UPDLOCK, HOLDLOCK) WHERE id = ?', (inventory_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def create_search_index(self, cursor):
+        cursor.execute("""
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'ix_inventory_name')
+            CREATE INDEX ix_inventory_name ON inventory(name)
+        """)
+        cursor.execute("""
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'ix_inventory_category')
+            CREATE INDEX ix_inventory_category ON inventory(category)
+        """)
+        cursor.execute("""
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'ux_inventory_id')
+            CREATE UNIQUE INDEX ux_inventory_id ON inventory(id)
+        """)
 
-    def create_tables(self):
-        cursor = self.conn.cursor()
+    def post_migrate(self):
+        # Полнотекстовые каталог и индекс нельзя создавать внутри транзакции — для них отдельное
+        # соединение в режиме autocommit, чтобы не нарушать транзакции миграций
         try:
+            conn = self.connect()
+        except pyodbc.Error as e:
+            logging.warning(f"Не удалось проверить полнотекстовый индекс: {e}")
+            return
+        try:
+            conn.autocommit = True
+            cursor = conn.cursor()
+            cursor.execute("SELECT FULLTEXTSERVICEPROPERTY('IsFullTextInstalled')")
+            if not cursor.fetchone()[0]:
+                logging.warning("Полнотекстовый поиск SQL Server не установлен, используется поиск по LIKE")
+                return
             cursor.execute("""
-                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='users' AND xtype='U')
-                CREATE TABLE users (
-                    id INT IDENTITY(1,1) PRIMARY KEY,
-                    username NVARCHAR(50) UNIQUE,
-                    password VARBINARY(MAX),
-                    role NVARCHAR(20) CHECK (role IN ('Admin', 'Teacher', 'Student'))
-                )
+                IF NOT EXISTS (SELECT * FROM sys.fulltext_catalogs WHERE name = 'inventory_catalog')
+                CREATE FULLTEXT CATALOG inventory_catalog
             """)
-            self.conn.commit()
-            logging.info("Таблица users создана или уже существует")
-
             cursor.execute("""
-                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='inventory' AND xtype='U')
-                CREATE TABLE inventory (
-                    id INT IDENTITY(1,1) PRIMARY KEY,
-                    name NVARCHAR(100),
-                    category NVARCHAR(50),
-                    quantity INT,
-                    condition NVARCHAR(20),
-                    purchase_date DATE,
-                    service_life INT,
-                    photo VARBINARY(MAX)
-                )
+                IF NOT EXISTS (SELECT * FROM sys.fulltext_indexes WHERE object_id = OBJECT_ID('inventory'))
+                CREATE FULLTEXT INDEX ON inventory(name, category, condition)
+                KEY INDEX ux_inventory_id ON inventory_catalog WITH CHANGE_TRACKING AUTO
             """)
-            self.conn.commit()
-            logging.info("Таблица inventory создана или уже существует")
+            self.fulltext = None
+        except pyodbc.Error as e:
+            logging.warning(f"Не удалось создать полнотекстовый индекс, используется поиск по LIKE: {e}")
+        finally:
+            conn.close()
+
+    def has_fulltext(self, cursor):
+        if self.fulltext is None:
+            cursor.execute("SELECT OBJECTPROPERTY(OBJECT_ID('inventory'), 'TableHasActiveFulltextIndex')")
+            self.fulltext = bool(cursor.fetchone()[0])
+        return self.fulltext
+
+    def search(self, cursor, terms, limit):
+        columns = ', '.join(f'i.{column}' for column in INVENTORY_COLUMNS.split(', '))
+        if self.has_fulltext(cursor):
+            condition = ' AND '.join('"{}*"'.format(term.replace('"', '""')) for term in terms)
+            cursor.execute(f"""
+                SELECT TOP (?) {columns} FROM inventory i
+                JOIN CONTAINSTABLE(inventory, (name, category, condition), ?) ft ON i.id = ft.[KEY]
+                ORDER BY ft.RANK DESC, i.id
+            """, (limit, condition))
+            return cursor.fetchall()
+        # Без полнотекстового индекса — те же условия, что у FTS и InventorySearch.matches: каждое слово
+        # является началом слова в одном из полей. Пробел перед полем делает начало строки границей слова
+        where = ' AND '.join("((N' ' + i.name) LIKE ? OR (N' ' + i.category) LIKE ? OR (N' ' + i.condition) LIKE ?)"
+                             for _ in terms)
+        params = [limit]
+        for term in terms:
+            params += [f"%[^0-9A-Za-zА-Яа-яЁё_]{term.replace('_', '[_]')}%"] * 3
+        params.append(f"{terms[0].replace('_', '[_]')}%")
+        cursor.execute(f"""
+            SELECT TOP (?) {columns} FROM inventory i WHERE {where}
+            ORDER BY CASE WHEN i.name LIKE ? THEN 0 ELSE 1 END, i.name
+        """, params)
+        return cursor.fetchall()
 
-            cursor.execute("""
-                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='bookings' AND xtype='U')
-                CREATE TABLE bookings (
-                    id INT IDENTITY(1,1) PRIMARY KEY,
-                    inventory_id INT,
-                    user_id INT,
-                    booking_date DATE,
-                    class NVARCHAR(50),
-                    FOREIGN KEY (inventory_id) REFERENCES inventory(id),
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            """)
-            self.conn.commit()
-            logging.info("Таблица bookings создана или уже существует")
+class SqliteBackend(StorageBackend):
+    """Встроенное хранилище SQLite в режиме WAL для офлайн-работы филиалов и замеров производительности"""
+    name = 'sqlite'
+    schema_version_ddl = """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    tables = (
+        ('users', """
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE,
+                password BLOB,
+                role TEXT CHECK (role IN ('Admin', 'Teacher', 'Student'))
+            )
+        """),
+        ('inventory', """
+            CREATE TABLE IF NOT EXISTS inventory (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT,
+                category TEXT,
+                quantity INTEGER,
+                condition TEXT,
+                purchase_date DATE,
+                service_life INTEGER,
+                photo BLOB
+            )
+        """),
+        ('bookings', """
+            CREATE TABLE IF NOT EXISTS bookings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                inventory_id INTEGER REFERENCES inventory(id),
+                user_id INTEGER REFERENCES users(id),
+                booking_date DATE,
+                class TEXT
+            )
+        """),
+        ('logs', """
+            CREATE TABLE IF NOT EXISTS logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER REFERENCES users(id),
+                action TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """),
+        ('report_templates', """
+            CREATE TABLE IF NOT EXISTS report_templates (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER REFERENCES users(id),
+                config TEXT,
+                type TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """),
+        ('report_history', """
+            CREATE TABLE IF NOT EXISTS report_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                report_id INTEGER REFERENCES report_templates(id),
+                user_id INTEGER REFERENCES users(id),
+                action TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """),
+    )
+
+    report_schedules_ddl = """
+        CREATE TABLE IF NOT EXISTS report_schedules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            report_id INTEGER NOT NULL REFERENCES report_templates(id) ON DELETE CASCADE,
+            format TEXT NOT NULL,
+            cron TEXT NOT NULL,
+            recipients TEXT,
+            enabled INTEGER DEFAULT 1,
+            last_run DATETIME,
+            created_by INTEGER REFERENCES users(id),
+            UNIQUE (report_id, format, cron)
+        )
+    """
+
+    logs_indexes_ddl = (
+        'CREATE INDEX IF NOT EXISTS ix_logs_timestamp ON logs(timestamp, id)',
+        'CREATE INDEX IF NOT EXISTS ix_logs_user_timestamp ON logs(user_id, timestamp, id)',
+        # LIKE в SQLite регистронезависим и использует индекс только с NOCASE
+        'CREATE INDEX IF NOT EXISTS ix_logs_action ON logs(action COLLATE NOCASE)',
+    )
+
+    booking_indexes_ddl = (
+        'CREATE INDEX IF NOT EXISTS ix_bookings_item_date ON bookings(inventory_id, booking_date)',
+        'CREATE INDEX IF NOT EXISTS ix_bookings_user_date ON bookings(user_id, booking_date)',
+        'CREATE INDEX IF NOT EXISTS ix_bookings_date ON bookings(booking_date, inventory_id)',
+    )
+
+    inventory_version_ddl = (
+        """
+        CREATE TABLE IF NOT EXISTS inventory_version (
+            id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+        """,
+        "INSERT OR IGNORE INTO inventory_version (id, version) VALUES (1, 0)",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_inventory_version_insert AFTER INSERT ON inventory
+        BEGIN UPDATE inventory_version SET version = version + 1 WHERE id = 1; END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_inventory_version_update AFTER UPDATE ON inventory
+        BEGIN UPDATE inventory_version SET version = version + 1 WHERE id = 1; END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_inventory_version_delete AFTER DELETE ON inventory
+        BEGIN UPDATE inventory_version SET version = version + 1 WHERE id = 1; END
+        """,
+    )
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+
+    def connect(self):
+        # cached_statements — кэш подготовленных выражений: повторный запрос с тем же текстом не компилируется заново.
+        # Соединение переходит между потоками через пул, который гарантирует монопольное использование
+        conn = sqlite3.connect(self.path, cached_statements=256, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA foreign_keys=ON')
+        conn.execute('PRAGMA busy_timeout=5000')
+        return conn
+
+    def limit(self, query, limit):
+        return f"{query} LIMIT ?", [limit]
+
+    def year(self, column):
+        return f"CAST(strftime('%Y', {column}) AS INTEGER)"
+
+    def insert(self, cursor, query, params):
+        cursor.execute(query, params)
+        return cursor.lastrowid
+
+    def lock_item(self, cursor, inventory_id):
+        # Блокировки строк в SQLite нет — BEGIN IMMEDIATE сразу берёт блокировку записи на всю базу
+        # Чужую открытую транзакцию не фиксируем молча: бронь должна начинать свою собственную
+        if cursor.connection.in_transaction:
+            raise RuntimeError('Блокировка предмета требует соединения без открытой транзакции')
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('SELECT quantity FROM inventory WHERE id = ?', (inventory_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def create_search_index(self, cursor):
+        # FTS5 с внешним содержимым: индекс хранит только токены, строки берутся из inventory
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS inventory_fts USING fts5(
+                name, category, condition,
+                content='inventory', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_inventory_fts_insert AFTER INSERT ON inventory BEGIN
+                INSERT INTO inventory_fts(rowid, name, category, condition)
+                VALUES (new.id, new.name, new.category, new.condition);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_inventory_fts_delete AFTER DELETE ON inventory BEGIN
+                INSERT INTO inventory_fts(inventory_fts, rowid, name, category, condition)
+                VALUES ('delete', old.id, old.name, old.category, old.condition);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_inventory_fts_update AFTER UPDATE OF name, category, condition ON inventory BEGIN
+                INSERT INTO inventory_fts(inventory_fts, rowid, name, category, condition)
+                VALUES ('delete', old.id, old.name, old.category, old.condition);
+                INSERT INTO inventory_fts(rowid, name, category, condition)
+                VALUES (new.id, new.name, new.category, new.condition);
+            END
+        """)
+        cursor.execute("INSERT INTO inventory_fts(inventory_fts) VALUES ('rebuild')")
+        cursor.execute('CREATE INDEX IF NOT EXISTS ix_inventory_category ON inventory(category)')
+
+    def search(self, cursor, terms, limit):
+        columns = ', '.join(f'i.{column}' for column in INVENTORY_COLUMNS.split(', '))
+        match = ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+        # Совпадение в названии весит больше, чем в категории и состоянии
+        cursor.execute(f"""
+            SELECT {columns} FROM inventory_fts JOIN inventory i ON i.id = inventory_fts.rowid
+            WHERE inventory_fts MATCH ?
+            ORDER BY bm25(inventory_fts, 10.0, 5.0, 1.0), i.id
+            LIMIT ?
+        """, (match, limit))
+        return cursor.fetchall()
 
-            cursor.execute("""
-                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='logs' AND xtype='U')
-                CREATE TABLE logs (
-                    id INT IDENTITY(1,1) PRIMARY KEY,
-                    user_id INT,
-                    action NVARCHAR(255),
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            """)
-            self.conn.commit()
-            logging.info("Таблица logs создана или уже существует")
+def create_backend(name=None):
+    """Создание хранилища по имени из настроек"""
+    name = name or DB_BACKEND
+    if name == 'sqlite':
+        return SqliteBackend()
+    if name == 'sqlserver':
+        return SqlServerBackend()
+    raise ValueError(f'Неизвестное хранилище: {name}')
+
+class ConnectionPool:
+    """Общий для процесса пул соединений; выданное соединение закрепляется за потоком"""
+    def __init__(self, backend, size=POOL_SIZE, idle_timeout=POOL_IDLE_TIMEOUT,
+                 health_check_interval=POOL_HEALTH_CHECK_INTERVAL):
+        self.backend = backend
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.schema_ready = False
+        self.schema_lock = threading.Lock()
+        self._audit_log = None
+        self._idle = []  # (соединение, время возврата), последние возвращённые — в конце
+        self._opened = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    def acquire(self, timeout=POOL_CHECKOUT_TIMEOUT):
+        """Выдаёт соединение потоку; повторный вызов из того же потока возвращает то же соединение"""
+        local = self._local
+        if getattr(local, 'conn', None) is not None:
+            local.depth += 1
+            return local.conn
+        conn = self._checkout(timeout)
+        if not self.schema_ready:
+            try:
+                self.ensure_schema(conn)
+            except Exception:
+                self._checkin(conn)
+                raise
+        local.conn = conn
+        local.depth = 1
+        return conn
+
+    def audit_log(self):
+        """Фоновый журнал действий этого пула, запускается при первой записи"""
+        with self.schema_lock:
+            if self._audit_log is None:
+                self._audit_log = AuditLog(self)
+            return self._audit_log
+
+    def flush_audit_log(self):
+        """Дожидается записи журнала, не запуская его писатель, если в журнал ещё ничего не писали"""
+        with self.schema_lock:
+            audit_log = self._audit_log
+        return audit_log.flush() if audit_log is not None else True
+
+    def ensure_schema(self, conn):
+        """Проверяет версию схемы один раз на пул при первой выдаче соединения"""
+        with self.schema_lock:
+            if not self.schema_ready:
+                MigrationRunner(self.backend).run(conn)
+                self.backend.post_migrate()
+                self.schema_ready = True
+
+    def release(self):
+        """Возвращает соединение потока в пул после последнего парного release"""
+        local = self._local
+        if getattr(local, 'conn', None) is None:
+            return
+        local.depth -= 1
+        if local.depth > 0:
+            return
+        conn, local.conn = local.conn, None
+        self._checkin(conn)
 
-            cursor.execute("""
-                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='report_templates' AND xtype='U')
-                CREATE TABLE report_templates (
-                    id INT IDENTITY(1,1) PRIMARY KEY,
-                    user_id INT,
-                    config NVARCHAR(MAX),
-                    type NVARCHAR(50),
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            """)
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release()
+
+    def _checkout(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                self._evict_idle()
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                elif self._opened < self.size:
+                    self._opened += 1
+                    conn = None
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError('Нет свободных соединений в пуле')
+                    self._cond.wait(remaining)
+                    continue
+            if conn is None:
+                try:
+                    return self.backend.connect()
+                except Exception:
+                    with self._cond:
+                        self._opened -= 1
+                        self._cond.notify()
+                    raise
+            if time.monotonic() - returned_at < self.health_check_interval:
+                return conn
+            try:
+                self.backend.ping(conn)
+                return conn
+            except DB_ERRORS as e:
+                logging.warning(f"Соединение из пула не прошло проверку и будет закрыто: {e}")
+                self._discard(conn)
+
+    def _checkin(self, conn):
+        try:
+            # Незавершённая транзакция не должна достаться следующему потоку
+            conn.rollback()
+        except DB_ERRORS:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            conn, _ = self._idle.pop(0)
+            self._opened -= 1
+            try:
+                conn.close()
+            except DB_ERRORS:
+                pass
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except DB_ERRORS:
+            pass
+        with self._cond:
+            self._opened -= 1
+            self._cond.notify()
+
+    def close_all(self):
+        """Закрывает простаивающие соединения, например при выходе из приложения"""
+        if self._audit_log is not None:
+            self._audit_log.close()
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._opened -= len(idle)
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except DB_ERRORS:
+                pass
+
+class AuditLog:
+    """Журнал действий пользователей: записи копятся в очереди и пишутся фоновым потоком пачками
+    по AUDIT_BATCH_SIZE или раз в AUDIT_FLUSH_INTERVAL_MS через отдельное соединение,
+    поэтому ошибка журнала не откатывает чужую транзакцию и не задерживает интерфейс"""
+    columns = {
+        'logs': ('user_id', 'action', 'timestamp'),
+        'report_history': ('report_id', 'user_id', 'action', 'timestamp'),
+    }
+
+    def __init__(self, pool, batch_size=AUDIT_BATCH_SIZE, flush_interval=AUDIT_FLUSH_INTERVAL_MS / 1000,
+                 queue_size=AUDIT_QUEUE_SIZE):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.conn = None
+        self.written = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self.run, name='audit-log', daemon=True)
+        self.thread.start()
+
+    def write(self, table, row):
+        """Ставит запись в очередь. Если писатель не успевает и очередь полна, вызывающий поток ждёт"""
+        try:
+            self.queue.put((table, row), timeout=AUDIT_PUT_TIMEOUT)
+        except queue.Full:
+            self.dropped += 1
+            logging.error(f"Очередь журнала переполнена, запись в {table} пропущена: {row}")
+
+    def flush(self, timeout=AUDIT_PUT_TIMEOUT):
+        """Ждёт, пока будут записаны все записи, поставленные в очередь до вызова"""
+        if not self.thread.is_alive():
+            return False
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=AUDIT_PUT_TIMEOUT):
+        """Останавливает писателя, дописав очередь; выход из приложения ждёт не дольше timeout на каждый шаг"""
+        if not self.thread.is_alive():
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            logging.error(f"Журнал действий не остановлен: очередь переполнена, {self.queue.qsize()} записей не записано")
+            return
+        self.thread.join(timeout)
+
+    def run(self):
+        while True:
+            items = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(items) < self.batch_size and isinstance(items[-1], tuple):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            records = [item for item in items if isinstance(item, tuple)]
+            try:
+                if records:
+                    self.write_batch(records)
+            except Exception as e:
+                # Неожиданная ошибка не должна останавливать писателя — иначе журнал молча перестанет писаться
+                self.dropped += len(records)
+                logging.error(f"Сбой потока журнала действий, {len(records)} записей пропущено: {e}")
+            finally:
+                for item in items:
+                    if isinstance(item, threading.Event):
+                        item.set()
+            if None in items:
+                break
+        if self.conn is not None:
+            self.conn.close()
+
+    def write_batch(self, records, retries=AUDIT_RETRIES, delay=AUDIT_RETRY_DELAY):
+        """Пишет пачку, при ошибке базы переподключается и повторяет с растущей паузой"""
+        for attempt in range(1, retries + 1):
+            if self.insert_batch(records):
+                return True
+            if attempt < retries:
+                time.sleep(delay)
+                delay *= 2
+        self.dropped += len(records)
+        logging.error(f"Журнал действий: {len(records)} записей пропущено после {retries} попыток")
+        return False
+
+    def insert_batch(self, records):
+        try:
+            if self.conn is None:
+                self.conn = self.pool.backend.connect()
+                if not self.pool.schema_ready:
+                    self.pool.ensure_schema(self.conn)
+            cursor = self.conn.cursor()
+            for table, columns in self.columns.items():
+                rows = [row for name, row in records if name == table]
+                if not rows:
+                    continue
+                # Одна вставка на пачку: VALUES (...), (...), ...
+                values = ', '.join(['(' + ', '.join('?' * len(columns)) + ')'] * len(rows))
+                cursor.execute(f"INSERT INTO {table} ({', '.join(columns)}) VALUES {values}",
+                               [value for row in rows for value in row])
             self.conn.commit()
-            logging.info("Таблица report_templates создана или уже существует")
+            self.written += len(records)
+            return True
+        except DB_ERRORS as e:
+            logging.error(f"Ошибка записи журнала действий ({len(records)} записей): {e}")
+            # Соединение могло оборваться — следующая пачка откроет новое
+            if self.conn is not None:
+                try:
+                    self.conn.close()
+                except DB_ERRORS:
+                    pass
+                self.conn = None
+            return False
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Пул соединений процесса, создаётся при первом обращении.
+    Соединения не переживают fork: дочерний процесс открывает собственный пул"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ConnectionPool(create_backend())
+            _pool_pid = os.getpid()
+        return _pool
+
+DEFAULT_REPORT_TEMPLATES = [
+    {
+        'name': 'Полный инвентарь',
+        'fields': ['id', 'name', 'category', 'quantity', 'condition', 'purchase_date', 'service_life'],
+        'filters': {},
+        'viz_type': 'table',
+        'font': 'Helvetica',
+        'font_size': 12,
+        'header_color': 'grey',
+        'bg_color': '#f0f0f0',
+        'preview_html': '<h1>Полный инвентарь</h1>'
+    },
+    {
+        'name': 'Состояние по категориям',
+        'fields': ['category', 'condition', 'quantity'],
+        'filters': {},
+        'viz_type': 'pie',
+        'font': 'Times',
+        'font_size': 14,
+        'header_color': 'blue',
+        'bg_color': '#ffffff',
+        'preview_html': '<h1>Состояние по категориям</h1>'
+    },
+    {
+        'name': 'План закупок',
+        'fields': ['category', 'quantity'],
+        'filters': {'quantity': '< 10'},
+        'viz_type': 'bar',
+        'font': 'Courier',
+        'font_size': 12,
+        'header_color': 'green',
+        'bg_color': '#f0f0f0',
+        'preview_html': '<h1>План закупок</h1>'
+    }
+]
+
+def migrate_base_schema(cursor, backend):
+    for table, ddl in backend.tables:
+        cursor.execute(ddl)
+        logging.info(f"Таблица {table} создана или уже существует")
+
+def migrate_default_users(cursor, backend):
+    # Проверка наличия нужна для баз, созданных до появления версий схемы
+    for username, role in (('admin', 'Admin'), ('teacher', 'Teacher'), ('student', 'Student')):
+        cursor.execute('SELECT 1 FROM users WHERE username = ?', (username,))
+        if cursor.fetchone():
+            continue
+        hashed = bcrypt.hashpw(username.encode(), bcrypt.gensalt())
+        cursor.execute('INSERT INTO users (username, password, role) VALUES (?, ?, ?)', (username, hashed, role))
+
+def template_names(cursor):
+    """Названия существующих шаблонов: config хранится через json.dumps с экранированием, поэтому сравнивается разобранный JSON"""
+    cursor.execute('SELECT config FROM report_templates')
+    names = set()
+    for (config,) in cursor.fetchall():
+        try:
+            names.add(json.loads(config).get('name'))
+        except (TypeError, ValueError, AttributeError):
+            continue
+    return names
+
+def migrate_default_templates(cursor, backend):
+    existing = template_names(cursor)
+    for template in DEFAULT_REPORT_TEMPLATES:
+        if template['name'] in existing:
+            continue
+        cursor.execute('INSERT INTO report_templates (user_id, config, type, created_at) VALUES (?, ?, ?, ?)',
+                       (1, json.dumps(template), template['viz_type'], datetime.datetime.now()))
+
+def migrate_inventory_version(cursor, backend):
+    for statement in backend.inventory_version_ddl:
+        cursor.execute(statement)
+
+def migrate_search_index(cursor, backend):
+    backend.create_search_index(cursor)
+
+# Группировки для шаблонов по умолчанию, которым нужны только итоги
+DEFAULT_TEMPLATE_AGGREGATES = {
+    'Состояние по категориям': {
+        'group_by': ['category', 'condition'],
+        'aggregates': [{'func': 'SUM', 'field': 'quantity'}],
+    },
+    'План закупок': {
+        'group_by': ['category'],
+        'aggregates': [{'func': 'SUM', 'field': 'quantity'}],
+    },
+}
+
+def migrate_template_aggregates(cursor, backend):
+    # Обновляются только нетронутые шаблоны по умолчанию: пользовательский отчёт с тем же названием
+    # или изменённый шаблон остаются как есть
+    defaults = {template['name']: template for template in DEFAULT_REPORT_TEMPLATES}
+    cursor.execute('SELECT id, config FROM report_templates')
+    for report_id, config in cursor.fetchall():
+        try:
+            config = json.loads(config)
+        except (TypeError, ValueError):
+            continue
+        if not isinstance(config, dict) or config != defaults.get(config.get('name')):
+            continue
+        upgrade = DEFAULT_TEMPLATE_AGGREGATES.get(config['name'])
+        if not upgrade:
+            continue
+        config.update(upgrade)
+        cursor.execute('UPDATE report_templates SET config = ? WHERE id = ?', (json.dumps(config), report_id))
+
+def migrate_report_schedules(cursor, backend):
+    cursor.execute(backend.report_schedules_ddl)
+
+def migrate_booking_indexes(cursor, backend):
+    for statement in backend.booking_indexes_ddl:
+        cursor.execute(statement)
+
+def migrate_logs_indexes(cursor, backend):
+    for statement in backend.logs_indexes_ddl:
+        cursor.execute(statement)
+
+# Пронумерованные миграции схемы: (версия, описание, функция(cursor, backend)).
+# Новые миграции добавляются только в конец списка со следующим номером
+MIGRATIONS = [
+    (1, 'Базовая схема', migrate_base_schema),
+    (2, 'Пользователи по умолчанию', migrate_default_users),
+    (3, 'Шаблоны отчётов по умолчанию', migrate_default_templates),
+    (4, 'Счётчик версий инвентаря', migrate_inventory_version),
+    (5, 'Поисковые индексы инвентаря', migrate_search_index),
+    (6, 'Группировка в шаблонах отчётов по умолчанию', migrate_template_aggregates),
+    (7, 'Расписания отчётов', migrate_report_schedules),
+    (8, 'Индексы бронирований', migrate_booking_indexes),
+    (9, 'Индексы журнала действий', migrate_logs_indexes),
+]
+
+class MigrationRunner:
+    """Применяет миграции схемы по таблице schema_version, каждую ровно один раз"""
+    def __init__(self, backend, migrations=MIGRATIONS):
+        self.backend = backend
+        self.migrations = migrations
+
+    def current_version(self, conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT MAX(version) FROM schema_version')
+            return cursor.fetchone()[0] or 0
+        except DB_ERRORS:
+            # Таблицы версий ещё нет — база новая или создана до появления миграций
+            conn.rollback()
+            cursor.execute(self.backend.schema_version_ddl)
+            conn.commit()
+            return 0
+
+    def run(self, conn):
+        """Применяет недостающие миграции; при актуальной схеме стоит один запрос"""
+        version = self.current_version(conn)
+        for number, description, migrate in self.migrations:
+            if number <= version:
+                continue
+            cursor = conn.cursor()
+            try:
+                migrate(cursor, self.backend)
+                cursor.execute('INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+                               (number, description, datetime.datetime.now()))
+                conn.commit()
+                logging.info(f"Применена миграция {number}: {description}")
+            except DB_ERRORS as e:
+                conn.rollback()
+                # Миграцию мог одновременно применить другой клиент
+                if self.current_version(conn) >= number:
+                    continue
+                logging.error(f"Ошибка применения миграции {number}: {e}")
+                raise
+        return max(version, self.migrations[-1][0])
+
+class PhotoCache:
+    """LRU-кэш фотографий и миниатюр с ограничением суммарного размера в байтах"""
+    def __init__(self, budget=PHOTO_CACHE_BYTES):
+        self.budget = budget
+        self.size = 0
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def lookup(self, key):
+        """Возвращает (найдено, значение); отсутствие фото тоже кэшируется как None"""
+        with self.lock:
+            if key not in self.items:
+                return False, None
+            self.items.move_to_end(key)
+            return True, self.items[key]
+
+    def put(self, key, value):
+        size = len(value or b'')
+        if size > self.budget:
+            return
+        with self.lock:
+            if key in self.items:
+                self.size -= len(self.items.pop(key) or b'')
+            self.items[key] = value
+            self.size += size
+            while self.size > self.budget:
+                _, evicted = self.items.popitem(last=False)
+                self.size -= len(evicted or b'')
+
+    def invalidate(self, item_id):
+        """Удаляет фото и все миниатюры предмета"""
+        with self.lock:
+            for key in [k for k in self.items if k[0] == item_id]:
+                self.size -= len(self.items.pop(key) or b'')
+
+photo_cache = PhotoCache()
+
+class InventoryCache:
+    """Кэш списка инвентаря: TTL, проверка версии по inventory_version и обновление отдельных предметов"""
+    def __init__(self, ttl=INVENTORY_CACHE_TTL):
+        self.ttl = ttl
+        self.items = None  # id -> строка, в порядке id
+        self.rows = None
+        self.version = None
+        self.checked_at = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+
+    def read_version(self, conn):
+        cursor = conn.cursor()
+        cursor.execute('SELECT version FROM inventory_version WHERE id = 1')
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def is_current(self, conn):
+        """Кэш заполнен и совпадает с базой: в пределах TTL или с той же версией inventory_version"""
+        now = time.monotonic()
+        if self.items is not None and now - self.checked_at < self.ttl:
+            return True
+        if self.items is None:
+            return False
+        version = self.read_version(conn)
+        if version is not None and version == self.version:
+            self.checked_at = now
+            return True
+        return False
+
+    def refresh(self, conn):
+        """Проверяет актуальность кэша и при изменении версии перечитывает инвентарь"""
+        if self.is_current(conn):
+            self.hits += 1
+            return
+        version = self.read_version(conn)
+        now = time.monotonic()
+        self.misses += 1
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT {INVENTORY_COLUMNS} FROM inventory ORDER BY id')
+        self.items = {row[0]: row for row in cursor.fetchall()}
+        self.rows = None
+        self.version = version
+        self.checked_at = now
+
+    def get(self, conn):
+        with self.lock:
+            self.refresh(conn)
+            if self.rows is None:
+                self.rows = list(self.items.values())
+            return self.rows
+
+    def get_item(self, conn, item_id):
+        """Предмет из кэша, если он актуален; иначе один запрос по ключу — без перечитывания всего инвентаря"""
+        with self.lock:
+            if self.is_current(conn):
+                self.hits += 1
+                return self.items.get(item_id)
+        self.misses += 1
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT {INVENTORY_COLUMNS} FROM inventory WHERE id = ?', (item_id,))
+        return cursor.fetchone()
+
+    def apply_write(self, conn, item_id):
+        """Обновляет один предмет после собственной записи; чужие изменения сбрасывают кэш целиком"""
+        with self.lock:
+            if self.items is None:
+                return
+            version = self.read_version(conn)
+            if version is None or self.version is None or version != self.version + 1:
+                self.invalidate()
+                return
+            cursor = conn.cursor()
+            cursor.execute(f'SELECT {INVENTORY_COLUMNS} FROM inventory WHERE id = ?', (item_id,))
+            row = cursor.fetchone()
+            if row:
+                self.items[item_id] = row
+            else:
+                self.items.pop(item_id, None)
+            self.rows = None
+            self.version = version
+
+    def invalidate(self):
+        with self.lock:
+            self.items = None
+            self.rows = None
+            self.version = None
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+inventory_cache = InventoryCache()
+
+class BookingConflictError(Exception):
+    """Бронирование невозможно: на эту дату не осталось свободных единиц предмета"""
+    def __init__(self, inventory_id, booking_date, available=0):
+        self.inventory_id = inventory_id
+        self.booking_date = booking_date
+        self.available = available
+        super().__init__(f'Предмет {inventory_id} на {booking_date} полностью забронирован')
+
+def iso_day(value):
+    """День в виде 'ГГГГ-ММ-ДД' для дат бронирований и отметок времени журналов:
+    строки SQLite и date/datetime из SQL Server приводятся к одному виду"""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.strftime('%Y-%m-%d')
+    return str(value)[:10]
+
+def escape_like(text):
+    """Экранирует символы шаблона LIKE для условия с ESCAPE '\\' ('[' — шаблон только в SQL Server)"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_').replace('[', '\\[')
+
+class BookingIndex:
+    """Индекс бронирований в памяти: для каждого предмета отсортированный список дат,
+    число броней на дату или в диапазоне дат считается двоичным поиском"""
+    def __init__(self, ttl=BOOKING_INDEX_TTL):
+        self.ttl = ttl
+        self.items = {}  # inventory_id -> (время загрузки, отсортированные даты)
+        self.lock = threading.RLock()
+
+    def dates(self, conn, inventory_id):
+        with self.lock:
+            entry = self.items.get(inventory_id)
+            if entry and time.monotonic() - entry[0] < self.ttl:
+                return entry[1]
+        cursor = conn.cursor()
+        cursor.execute('SELECT booking_date FROM bookings WHERE inventory_id = ? ORDER BY booking_date', (inventory_id,))
+        dates = [iso_day(row[0]) for row in cursor.fetchall()]
+        with self.lock:
+            self.items[inventory_id] = (time.monotonic(), dates)
+        return dates
+
+    def count(self, conn, inventory_id, start, end=None):
+        """Число броней предмета с start по end включительно"""
+        dates = self.dates(conn, inventory_id)
+        start = iso_day(start)
+        end = iso_day(end) if end else start
+        return bisect.bisect_right(dates, end) - bisect.bisect_left(dates, start)
+
+    def add(self, inventory_id, booking_date):
+        """Учитывает собственную запись, не перечитывая даты предмета"""
+        with self.lock:
+            entry = self.items.get(inventory_id)
+            if entry:
+                bisect.insort(entry[1], iso_day(booking_date))
+
+    def invalidate(self, inventory_id=None):
+        with self.lock:
+            if inventory_id is None:
+                self.items.clear()
+            else:
+                self.items.pop(inventory_id, None)
+
+booking_index = BookingIndex()
+
+class InventorySearch:
+    """Поиск по инвентарю: точный id, префиксный поиск по индексу, ранжирование и ограничение выдачи"""
+    def __init__(self, db, limit=SEARCH_LIMIT):
+        self.db = db
+        self.limit = limit
+
+    @staticmethod
+    def tokenize(query):
+        return re.findall(r'\w+', query.lower())
+
+    @staticmethod
+    def matches(row, terms):
+        """Проверка строки инвентаря на те же условия, что и у индекса: каждое слово — префикс слова в полях"""
+        words = InventorySearch.tokenize(' '.join(str(row[i]) for i in (1, 2, 4)))
+        return all(any(word.startswith(term) for word in words) for term in terms)
+
+    def search(self, query, limit=None):
+        limit = limit or self.limit
+        query = query.strip()
+        results = []
+        # Числовой запрос — сначала предмет с таким id: из актуального кэша или одним запросом по ключу
+        if query.isdigit():
+            item = self.db.get_item(int(query))
+            if item:
+                results.append(item)
+        terms = self.tokenize(query)
+        if terms:
+            seen = {row[0] for row in results}
+            cursor = self.db.conn.cursor()
+            for row in self.db.backend.search(cursor, terms, limit):
+                if row[0] not in seen:
+                    results.append(row)
+        return results[:limit]
+
+class InventoryImporter:
+    """Потоковый импорт инвентаря из CSV/XLSX: проверка строк и пакетная вставка с отчётом об ошибках"""
+    # Заголовки файла: имена столбцов базы или подписи из таблицы инвентаря
+    fields = ['name', 'category', 'quantity', 'condition', 'purchase_date', 'service_life']
+    labels = dict(zip(InventoryTableModel.headers[1:], fields))
+    conditions = ['Новый', 'Хороший', 'Изношенный', 'Сломанный']
+    insert_sql = """
+        INSERT INTO inventory (name, category, quantity, condition, purchase_date, service_life)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+
+    def __init__(self, db, batch_size=IMPORT_BATCH_SIZE, progress=None):
+        self.db = db
+        self.batch_size = batch_size
+        self.progress = progress  # progress(обработано, всего)
+        self.errors = []  # (номер строки файла, сообщение, исходные значения)
+        self.imported = 0
+
+    def read_rows(self, filename):
+        """(номер строки, значения) без заголовка и общее число строк; файл читается построчно"""
+        if filename.lower().endswith('.xlsx'):
+            wb = openpyxl.load_workbook(filename, read_only=True)
+            ws = wb.active
+            total = max((ws.max_row or 1) - 1, 0)
+            rows = enumerate(ws.iter_rows(values_only=True), start=1)
+            return rows, total, wb.close
+        with open(filename, newline='', encoding='utf-8-sig') as f:
+            total = max(sum(1 for _ in f) - 1, 0)
+        f = open(filename, newline='', encoding='utf-8-sig')
+        return enumerate(csv.reader(f), start=1), total, f.close
+
+    def map_header(self, header):
+        """Индексы столбцов файла для каждого поля инвентаря"""
+        names = [str(h or '').strip() for h in header]
+        positions = {}
+        for i, name in enumerate(names):
+            field = self.labels.get(name, name.lower())
+            if field in self.fields:
+                positions[field] = i
+        missing = [field for field in self.fields if field not in positions]
+        if missing:
+            raise ValueError(f"В файле нет столбцов: {', '.join(missing)}")
+        return [positions[field] for field in self.fields]
+
+    def validate(self, values):
+        """Приводит значения строки к типам столбцов inventory; ValueError с описанием при ошибке"""
+        name, category, quantity, condition, purchase_date, service_life = [
+            '' if v is None else v for v in values]
+        name, category, condition = str(name).strip(), str(category).strip(), str(condition).strip()
+        if not name:
+            raise ValueError('пустое название')
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            raise ValueError(f'количество не число: {quantity!r}')
+        if quantity < 0:
+            raise ValueError('отрицательное количество')
+        if condition not in self.conditions:
+            raise ValueError(f'неизвестное состояние: {condition!r}')
+        if isinstance(purchase_date, datetime.datetime):
+            purchase_date = purchase_date.date()
+        if isinstance(purchase_date, datetime.date):
+            purchase_date = purchase_date.isoformat()
+        elif str(purchase_date).strip():
+            try:
+                purchase_date = datetime.date.fromisoformat(str(purchase_date).strip()).isoformat()
+            except ValueError:
+                raise ValueError(f'дата покупки не в формате ГГГГ-ММ-ДД: {purchase_date!r}')
+        else:
+            purchase_date = None
+        try:
+            service_life = int(service_life or 0)
+        except (TypeError, ValueError):
+            raise ValueError(f'срок службы не число: {service_life!r}')
+        return (name, category, quantity, condition, purchase_date, service_life)
+
+    def run(self, filename):
+        """Импортирует файл; возвращает число добавленных строк, ошибки копятся в self.errors"""
+        rows, total, close = self.read_rows(filename)
+        try:
+            positions = None
+            batch = []
+            processed = 0
+            for line, row in rows:
+                if positions is None:
+                    positions = self.map_header(row)
+                    continue
+                if not any(v not in (None, '') for v in row):
+                    continue
+                processed += 1
+                try:
+                    values = [row[i] if i < len(row) else None for i in positions]
+                    batch.append((line, self.validate(values)))
+                except ValueError as e:
+                    self.errors.append((line, str(e), list(row)))
+                if len(batch) >= self.batch_size:
+                    self.flush(batch)
+                    batch = []
+                    self.report(processed, total)
+            self.flush(batch)
+            self.report(processed, total)
+        finally:
+            close()
+            inventory_cache.invalidate()
+        logging.info(f'Импорт инвентаря из {filename}: добавлено {self.imported}, ошибок {len(self.errors)}')
+        return self.imported
+
+    def flush(self, batch):
+        """Вставляет пакет одной транзакцией; при ошибке пакет повторяется построчно, чтобы найти виновные строки"""
+        if not batch:
+            return
+        conn = self.db.conn
+        cursor = conn.cursor()
+        try:
+            self.db.backend.executemany(cursor, self.insert_sql, [values for _, values in batch])
+            conn.commit()
+            self.imported += len(batch)
+            return
+        except DB_ERRORS as e:
+            conn.rollback()
+            logging.error(f"Ошибка пакетной вставки инвентаря, повтор по строкам: {e}")
+        for line, values in batch:
+            try:
+                cursor.execute(self.insert_sql, values)
+                conn.commit()
+                self.imported += 1
+            except DB_ERRORS as e:
+                conn.rollback()
+                self.errors.append((line, str(e), list(values)))
+
+    def report(self, processed, total):
+        if self.progress:
+            self.progress(processed, total)
+
+    def write_errors(self, filename):
+        """Сохраняет отчёт об ошибках в CSV: строка файла, причина, исходные значения"""
+        with open(filename, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Строка', 'Ошибка', 'Значения'])
+            for line, message, values in self.errors:
+                writer.writerow([line, message] + ['' if v is None else v for v in values])
+
+class InventoryExporter:
+    """Потоковый экспорт инвентаря в CSV/XLSX порциями по id, без загрузки всей таблицы в память"""
+    def __init__(self, db, batch_size=EXPORT_BATCH_SIZE, progress=None):
+        self.db = db
+        self.batch_size = batch_size
+        self.progress = progress
 
-            cursor.execute("""
-                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='report_history' AND xtype='U')
-                CREATE TABLE report_history (
-                    id INT IDENTITY(1,1) PRIMARY KEY,
-                    report_id INT,
-                    user_id INT,
-                    action NVARCHAR(255),
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (report_id) REFERENCES report_templates(id),
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            """)
+    def batches(self):
+        query, params = self.db.backend.limit(f"SELECT {INVENTORY_COLUMNS} FROM inventory WHERE id > ? ORDER BY id",
+                                              self.batch_size)
+        cursor = self.db.conn.cursor()
+        last_id = 0
+        while True:
+            cursor.execute(query, [last_id] + params)
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+
+    def total(self):
+        cursor = self.db.conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM inventory')
+        return cursor.fetchone()[0]
+
+    def run(self, filename):
+        """Записывает инвентарь в файл; возвращает число строк"""
+        total = self.total()
+        headers = InventoryTableModel.headers
+        written = 0
+        if filename.lower().endswith('.xlsx'):
+            wb = openpyxl.Workbook(write_only=True)
+            ws = wb.create_sheet('Инвентарь')
+            ws.append(headers)
+            for rows in self.batches():
+                for row in rows:
+                    ws.append(list(row))
+                written += len(rows)
+                self.report(written, total)
+            wb.save(filename)
+        else:
+            with open(filename, 'w', newline='', encoding='utf-8-sig') as f:
+                writer = csv.writer(f)
+                writer.writerow(headers)
+                for rows in self.batches():
+                    writer.writerows(rows)
+                    written += len(rows)
+                    self.report(written, total)
+        logging.info(f'Экспорт инвентаря в {filename}: {written} строк')
+        return written
+
+    def report(self, written, total):
+        if self.progress:
+            self.progress(written, total)
+
+class LogArchiver:
+    """Перенос старых записей журналов в сжатые файлы JSONL по дням: ARCHIVE_DIR/<таблица>/<ГГГГ-ММ>/<ГГГГ-ММ-ДД>.jsonl.gz.
+    В рабочих таблицах остаются только последние LOG_RETENTION_DAYS дней, архив доступен через search"""
+    tables = {
+        'logs': ('id', 'user_id', 'action', 'timestamp'),
+        'report_history': ('id', 'report_id', 'user_id', 'action', 'timestamp'),
+    }
+
+    def __init__(self, db, archive_dir=ARCHIVE_DIR, retention_days=LOG_RETENTION_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+        self.db = db
+        self.archive_dir = archive_dir
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+
+    def archive(self, cutoff=None):
+        """Переносит в архив записи старше cutoff (по умолчанию — старше срока хранения) целыми днями;
+        возвращает {таблица: число перенесённых записей}"""
+        # Записи журнала ставятся в очередь — сначала дописываем всё, что уже произошло
+        self.db.flush_log()
+        # Граница — date, а не строка: DATETIME в SQL Server читает 'ГГГГ-ММ-ДД' по языку входа
+        cutoff = datetime.date.fromisoformat(iso_day(cutoff or datetime.date.today() - datetime.timedelta(days=self.retention_days)))
+        moved = {}
+        for table in self.tables:
+            moved[table] = 0
+            while True:
+                count = self.archive_batch(table, cutoff)
+                if not count:
+                    break
+                moved[table] += count
+        logging.info(f'Архивирование журналов до {cutoff}: ' + ', '.join(f'{t} — {n}' for t, n in moved.items()))
+        return moved
+
+    def archive_batch(self, table, cutoff):
+        columns = self.tables[table]
+        conn = self.db.conn
+        cursor = conn.cursor()
+        query, params = self.db.backend.limit(f"SELECT {', '.join(columns)} FROM {table} WHERE timestamp < ? ORDER BY id",
+                                              self.batch_size)
+        cursor.execute(query, [cutoff] + params)
+        rows = cursor.fetchall()
+        if not rows:
+            return 0
+        try:
+            # Строки удаляются до записи файла, но фиксируются после: если параллельно работает
+            # другой архиватор, он удалит меньше строк, чем выбрал, и откатится без записи в архив
+            deleted = 0
+            for start in range(0, len(rows), 500):
+                ids = [row[0] for row in rows[start:start + 500]]
+                cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join('?' * len(ids))})", ids)
+                deleted += cursor.rowcount
+            if deleted != len(rows):
+                conn.rollback()
+                logging.warning(f'Архивирование {table} уже выполняется в другом клиенте')
+                return 0
+            self.write(table, [self.record(columns, row) for row in rows])
+            conn.commit()
+        except (DB_ERRORS + (OSError,)) as e:
+            conn.rollback()
+            logging.error(f"Ошибка архивирования {table}: {e}")
+            raise
+        return len(rows)
+
+    def record(self, columns, row):
+        record = dict(zip(columns, row))
+        timestamp = record['timestamp']
+        if isinstance(timestamp, datetime.datetime):
+            record['timestamp'] = timestamp.isoformat(sep=' ')
+        return record
+
+    def partition(self, table, day):
+        return os.path.join(self.archive_dir, table, day[:7], f'{day}.jsonl.gz')
+
+    def write(self, table, records):
+        by_day = {}
+        for record in records:
+            by_day.setdefault(iso_day(record['timestamp']), []).append(record)
+        for day, day_records in by_day.items():
+            path = self.partition(table, day)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Дописывание создаёт в файле ещё один член gzip — gzip.open читает их подряд
+            with gzip.open(path, 'at', encoding='utf-8') as f:
+                for record in day_records:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def partitions(self, table, date_from=None, date_to=None):
+        """Файлы архива за период, от новых к старым; лишние дни отбрасываются по имени файла"""
+        date_from, date_to = iso_day(date_from) if date_from else None, iso_day(date_to) if date_to else None
+        root = os.path.join(self.archive_dir, table)
+        if not os.path.isdir(root):
+            return []
+        paths = []
+        for month in os.listdir(root):
+            if (date_from and month < date_from[:7]) or (date_to and month > date_to[:7]):
+                continue
+            for name in os.listdir(os.path.join(root, month)):
+                day = name[:10]
+                if (date_from and day < date_from) or (date_to and day > date_to):
+                    continue
+                paths.append((day, os.path.join(root, month, name)))
+        return [path for day, path in sorted(paths, reverse=True)]
+
+    def search(self, table='logs', user_id=None, action=None, date_from=None, date_to=None, report_id=None, limit=ARCHIVE_SEARCH_LIMIT):
+        """Записи архива от новых к старым с теми же фильтрами, что и у журнала: действие — по началу строки"""
+        action = action.casefold() if action else None
+        results = []
+        for path in self.partitions(table, date_from, date_to):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                records = {}
+                for line in f:
+                    record = json.loads(line)
+                    records[record['id']] = record  # повторный перенос после сбоя не даёт дублей
+            for record in sorted(records.values(), key=lambda r: (r['timestamp'], r['id']), reverse=True):
+                if user_id and record.get('user_id') != user_id:
+                    continue
+                if report_id and record.get('report_id') != report_id:
+                    continue
+                if action and not (record.get('action') or '').casefold().startswith(action):
+                    continue
+                results.append(record)
+                if limit and len(results) >= limit:
+                    return results
+        return results
+
+class Database:
+    """Операции с базой данных поверх пула соединений выбранного хранилища"""
+    def __init__(self, pool=None, backend=None):
+        self.pool = pool or (ConnectionPool(backend) if backend else get_pool())
+        self.backend = self.pool.backend
+        self._local = threading.local()
+
+    @property
+    def conn(self):
+        """Соединение текущего потока, взятое из пула"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self.pool.acquire()
+        return conn
+
+    def add_user(self, username, password, role):
+        hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute('INSERT INTO users (username, password, role) VALUES (?, ?, ?)', (username, hashed, role))
             self.conn.commit()
-            logging.info("Таблица report_history создана или уже существует")
-        except pyodbc.Error as e:
+        except DB_ERRORS as e:
             self.conn.rollback()
-            logging.error(f"Ошибка создания таблиц: {e}")
+            logging.error(f"Ошибка добавления пользователя {username}: {e}")
             raise
 
-    def add_default_users(self):
+    def authenticate(self, username, password):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT id, password, role FROM users WHERE username = ?', (username,))
+        user = cursor.fetchone()
+        if user and bcrypt.checkpw(password.encode(), user[1]):
+            return user[0], user[2]
+        return None, None
+
+    def log_action(self, user_id, action):
+        """Запись в журнал уходит в очередь AuditLog; время фиксируется в момент действия"""
+        self.pool.audit_log().write('logs', (user_id, action, datetime.datetime.now()))
+        logging.info(f'Пользователь {user_id} выполнил действие: {action}')
+
+    def log_report_action(self, report_id, user_id, action):
+        self.pool.audit_log().write('report_history', (report_id, user_id, action, datetime.datetime.now()))
+        logging.info(f'Действие с отчётом {report_id} пользователем {user_id}: {action}')
+
+    def flush_log(self):
+        """Дожидается записи журнала действий, например перед закрытием окна"""
+        return self.pool.flush_audit_log()
+
+    def get_inventory(self):
+        return inventory_cache.get(self.conn)
+
+    def get_item(self, id):
+        return inventory_cache.get_item(self.conn, id)
+
+    def add_inventory(self, name, category, quantity, condition, purchase_date, service_life, photo=None):
         cursor = self.conn.cursor()
         try:
-            hashed = bcrypt.hashpw('admin'.encode(), bcrypt.gensalt())
-            cursor.execute("""
-                IF NOT EXISTS (SELECT 1 FROM users WHERE username = 'admin')
-                INSERT INTO users (username, password, role) VALUES ('admin', ?, 'Admin')
-            """, (hashed,))
-            hashed = bcrypt.hashpw('teacher'.encode(), bcrypt.gensalt())
-            cursor.execute("""
-                IF NOT EXISTS (SELECT 1 FROM users WHERE username = 'teacher')
-                INSERT INTO users (username, password, role) VALUES ('teacher', ?, 'Teacher')
-            """, (hashed,))
-            hashed = bcrypt.hashpw('student'.encode(), bcrypt.gensalt())
-            cursor.execute("""
-                IF NOT EXISTS (SELECT 1 FROM users WHERE username = 'student')
-                INSERT INTO users (username, password, role) VALUES ('student', ?, 'Student')
-            """, (hashed,))
+            id = self.backend.insert(cursor, """
+                INSERT INTO inventory (name, category, quantity, condition, purchase_date, service_life, photo)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (name, category, quantity, condition, purchase_date, service_life, photo))
             self.conn.commit()
-            logging.info("Добавлены пользователи по умолчанию")
-        except pyodbc.Error as e:
+            inventory_cache.apply_write(self.conn, id)
+            return id
+        except DB_ERRORS as e:
             self.conn.rollback()
-            logging.error(f"Ошибка добавления пользователей: {e}")
+            logging.error(f"Ошибка добавления инвентаря {name}: {e}")
             raise
 
-    def add_default_templates(self):
+    def update_inventory(self, id, name, category, quantity, condition, purchase_date, service_life, photo=None):
+        """Обновление предмета; при photo=None сохранённое фото не меняется"""
         cursor = self.conn.cursor()
         try:
-            templates = [
-                {
-                    'name': 'Полный инвентарь',
-                    'fields': ['id', 'name', 'category', 'quantity', 'condition', 'purchase_date', 'service_life'],
-                    'filters': {},
-                    'viz_type': 'table',
-                    'font': 'Helvetica',
-                    'font_size': 12,
-                    'header_color': 'grey',
-                    'bg_color': '#f0f0f0',
-                    'preview_html': '<h1>Полный инвентарь</h1>'
-                },
-                {
-                    'name': 'Состояние по категориям',
-                    'fields': ['category', 'condition', 'quantity'],
-                    'filters': {},
-                    'viz_type': 'pie',
-                    'font': 'Times',
-                    'font_size': 14,
-                    'header_color': 'blue',
-                    'bg_color': '#ffffff',
-                    'preview_html': '<h1>Состояние по категориям</h1>'
-                },
-                {
-                    'name': 'План закупок',
-                    'fields': ['category', 'quantity'],
-                    'filters': {'quantity': '< 10'},
-                    'viz_type': 'bar',
-                    'font': 'Courier',
-                    'font_size': 12,
-                    'header_color': 'green',
-                    'bg_color': '#f0f0f0',
-                    'preview_html': '<h1>План закупок</h1>'
-                }
-            ]
-            for template in templates:
+            if photo is None:
                 cursor.execute("""
-                    IF NOT EXISTS (SELECT 1 FROM report_templates WHERE config LIKE ?)
-                    INSERT INTO report_templates (user_id, config, type, created_at) VALUES (?, ?, ?, ?)
-                """, (f'%{template["name"]}%', 1, json.dumps(template), template['viz_type'], datetime.datetime.now()))
+                    UPDATE inventory SET name=?, category=?, quantity=?, condition=?, purchase_date=?, service_life=?
+                    WHERE id=?
+                """, (name, category, quantity, condition, purchase_date, service_life, id))
+            else:
+                cursor.execute("""
+                    UPDATE inventory SET name=?, category=?, quantity=?, condition=?, purchase_date=?, service_life=?, photo=?
+                    WHERE id=?
+                """, (name, category, quantity, condition, purchase_date, service_life, photo, id))
             self.conn.commit()
-            logging.info("Добавлены шаблоны отчётов по умолчанию")
-        except pyodbc.Error as e:
+            inventory_cache.apply_write(self.conn, id)
+            photo_cache.invalidate(id)
+        except DB_ERRORS as e:
             self.conn.rollback()
-            logging.error(f"Ошибка добавления шаблонов отчётов: {e}")
+            logging.error(f"Ошибка обновления инвентаря {id}: {e}")
             raise
 
-    def add_user(self, username, password, role):
-        hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    def delete_inventory(self, id):
         cursor = self.conn.cursor()
         try:
-            cursor.execute('INSERT INTO users (username, password, role) VALUES (?, ?, ?)', (username, hashed, role))
+            cursor.execute('DELETE FROM inventory WHERE id=?', (id,))
             self.conn.commit()
-        except pyodbc.Error as e:
+            inventory_cache.apply_write(self.conn, id)
+            photo_cache.invalidate(id)
+        except DB_ERRORS as e:
             self.conn.rollback()
-            logging.error(f"Ошибка добавления пользователя {username}: {e}")
+            logging.error(f"Ошибка удаления инвентаря {id}: {e}")
             raise
 
-    def authenticate(self, username, password):
+    def get_photo(self, id):
+        """Фото предмета, загружаемое по требованию через кэш"""
+        hit, photo = photo_cache.lookup((id, None))
+        if hit:
+            return photo
         cursor = self.conn.cursor()
-        cursor.execute('SELECT id, password, role FROM users WHERE username = ?', (username,))
-        user = cursor.fetchone()
-        if user and bcrypt.checkpw(password.encode(), user[1]):
-            return user[0], user[2]
-        return None, None
+        cursor.execute('SELECT photo FROM inventory WHERE id = ?', (id,))
+        row = cursor.fetchone()
+        photo = bytes(row[0]) if row and row[0] is not None else None
+        photo_cache.put((id, None), photo)
+        return photo
+
+    def get_thumbnail(self, id, size=THUMBNAIL_SIZE):
+        """Миниатюра фото в формате PNG или None, если фото нет"""
+        hit, thumbnail = photo_cache.lookup((id, size))
+        if hit:
+            return thumbnail
+        photo = self.get_photo(id)
+        thumbnail = None
+        if photo:
+            try:
+                img = Image.open(BytesIO(photo))
+                img.thumbnail(size)
+                buf = BytesIO()
+                img.save(buf, format='PNG')
+                thumbnail = buf.getvalue()
+            except Exception as e:
+                logging.error(f"Ошибка создания миниатюры для инвентаря {id}: {e}")
+        photo_cache.put((id, size), thumbnail)
+        return thumbnail
 
-    def log_action(self, user_id, action):
+    def add_booking(self, inventory_id, user_id, booking_date, class_):
+        """Бронирует единицу предмета, если на эту дату она ещё свободна. Проверка и вставка идут
+        в одной транзакции под блокировкой предмета, поэтому одновременные брони не превысят количество"""
+        booking_date = iso_day(booking_date)
         cursor = self.conn.cursor()
         try:
-            cursor.execute('INSERT INTO logs (user_id, action) VALUES (?, ?)', (user_id, action))
+            quantity = self.backend.lock_item(cursor, inventory_id)
+            if quantity is None:
+                raise ValueError(f'Предмет {inventory_id} не найден')
+            cursor.execute('SELECT COUNT(*) FROM bookings WHERE inventory_id = ? AND booking_date = ?', (inventory_id, booking_date))
+            booked = cursor.fetchone()[0]
+            if booked >= (quantity or 0):
+                raise BookingConflictError(inventory_id, booking_date)
+            booking_id = self.backend.insert(cursor, 'INSERT INTO bookings (inventory_id, user_id, booking_date, class) VALUES (?, ?, ?, ?)',
+                                             (inventory_id, user_id, booking_date, class_))
             self.conn.commit()
-            logging.info(f'Пользователь {user_id} выполнил действие: {action}')
-        except pyodbc.Error as e:
+        except (BookingConflictError, ValueError):
+            self.conn.rollback()
+            booking_index.invalidate(inventory_id)
+            raise
+        except Exception as e:
+            # Любая ошибка после lock_item должна снять блокировку предмета и отменить вставку
             self.conn.rollback()
-            logging.error(f"Ошибка логирования действия для пользователя {user_id}: {e}")
+            logging.error(f"Ошибка добавления бронирования для инвентаря {inventory_id}: {e}")
+            raise
+        booking_index.add(inventory_id, booking_date)
+        return booking_id
+
+    def get_availability(self, inventory_id, booking_date):
+        """Число свободных единиц предмета на дату по индексу бронирований в памяти"""
+        item = self.get_item(inventory_id)
+        if item is None:
+            return 0
+        return max((item[3] or 0) - booking_index.count(self.conn, inventory_id, booking_date), 0)
+
+    def get_week_availability(self, start, days=7):
+        """Свободные единицы всех предметов на days дней начиная со start: {(inventory_id, 'ГГГГ-ММ-ДД'): количество}.
+        Брони за весь период считаются одним запросом с группировкой"""
+        start = datetime.date.fromisoformat(iso_day(start))
+        dates = [(start + datetime.timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT inventory_id, booking_date, COUNT(*) FROM bookings WHERE booking_date BETWEEN ? AND ? '
+                       'GROUP BY inventory_id, booking_date', (dates[0], dates[-1]))
+        booked = {(row[0], iso_day(row[1])): row[2] for row in cursor.fetchall()}
+        return {(item[0], day): max((item[3] or 0) - booked.get((item[0], day), 0), 0)
+                for item in self.get_inventory() for day in dates}
+
+    def get_bookings_page(self, user_id=None, sort_column=2, descending=False, after=None,
+                          date_from=None, date_to=None, class_=None, limit=100):
+        """Страница бронирований с названиями предметов (BOOKING_COLUMNS). after — ключ
+        (значение столбца сортировки, id) последней загруженной строки"""
+        column = BOOKING_SORT_COLUMNS[sort_column]
+        where, params = [], []
+        if user_id:
+            where.append('b.user_id = ?')
+            params.append(user_id)
+        if date_from:
+            where.append('b.booking_date >= ?')
+            params.append(iso_day(date_from))
+        if date_to:
+            where.append('b.booking_date <= ?')
+            params.append(iso_day(date_to))
+        if class_:
+            where.append("b.class LIKE ? ESCAPE '\\'")
+            params.append(f'%{escape_like(class_)}%')
+        op, direction = ('<', 'DESC') if descending else ('>', 'ASC')
+        if after:
+            where.append(f'({column} {op} ? OR ({column} = ? AND b.id {op} ?))')
+            params += [after[0], after[0], after[1]]
+        query = f'SELECT {BOOKING_COLUMNS} FROM bookings b LEFT JOIN inventory i ON i.id = b.inventory_id'
+        if where:
+            query += ' WHERE ' + ' AND '.join(where)
+        query, limit_params = self.backend.limit(f'{query} ORDER BY {column} {direction}, b.id {direction}', limit)
+        cursor = self.conn.cursor()
+        cursor.execute(query, params + limit_params)
+        return [tuple(row) for row in cursor.fetchall()]
 
-    def log_report_action(self, report_id, user_id, action):
+    def get_booking(self, booking_id):
         cursor = self.conn.cursor()
-        try:
-            cursor.execute('INSERT INTO report_history (report_id, user_id, action, timestamp) VALUES (?, ?, ?, ?)',
-                           (report_id, user_id, action, datetime.datetime.now()))
-            self.conn.commit()
-            logging.info(f'Действие с отчётом {report_id} пользователем {user_id}: {action}')
-        except pyodbc.Error as e:
-            self.conn.rollback()
-            logging.error(f"Ошибка логирования действия с отчётом {report_id}: {e}")
+        cursor.execute(f'SELECT {BOOKING_COLUMNS} FROM bookings b LEFT JOIN inventory i ON i.id = b.inventory_id WHERE b.id = ?',
+                       (booking_id,))
+        row = cursor.fetchone()
+        return tuple(row) if row else None
 
-    @lru_cache(maxsize=100)
-    def get_inventory(self):
+    def search_inventory(self, query, limit=SEARCH_LIMIT):
+        return InventorySearch(self, limit).search(query)
+
+    def import_inventory(self, filename, progress=None):
+        """Импорт из CSV/XLSX; возвращает (добавлено, ошибки). Отчёт об ошибках пишется рядом с файлом"""
+        importer = InventoryImporter(self, progress=progress)
+        importer.run(filename)
+        if importer.errors:
+            importer.write_errors(f'{os.path.splitext(filename)[0]}_errors.csv')
+        return importer.imported, importer.errors
+
+    def export_inventory(self, filename, progress=None):
+        return InventoryExporter(self, progress=progress).run(filename)
+
+    def get_users(self):
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM inventory')
+        cursor.execute('SELECT id, username, role FROM users')
         return cursor.fetchall()
 
-    def add_inventory(self, name, category, quantity, condition, purchase_date, service_life, photo=None):
+    def get_report_templates(self, user_id):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id, config, type, created_at FROM report_templates WHERE user_id = ? ORDER BY created_at DESC", (user_id,))
+        return cursor.fetchall()
+
+    def get_report_config(self, report_id):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT config FROM report_templates WHERE id = ?", (report_id,))
+        row = cursor.fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_report_template(self, report_id, user_id, config):
         cursor = self.conn.cursor()
         try:
-            cursor.execute("""
-                INSERT INTO inventory (name, category, quantity, condition, purchase_date, service_life, photo)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (name, category, quantity, condition, purchase_date, service_life, photo))
+            if report_id:
+                cursor.execute("UPDATE report_templates SET config = ?, type = ? WHERE id = ?",
+                               (json.dumps(config), config['viz_type'], report_id))
+            else:
+                cursor.execute("INSERT INTO report_templates (user_id, config, type, created_at) VALUES (?, ?, ?, ?)",
+                               (user_id, json.dumps(config), config['viz_type'], datetime.datetime.now()))
             self.conn.commit()
-            self.get_inventory.cache_clear()
-        except pyodbc.Error as e:
+        except DB_ERRORS as e:
             self.conn.rollback()
-            logging.error(f"Ошибка добавления инвентаря {name}: {e}")
+            logging.error(f"Ошибка сохранения отчёта {config.get('name')}: {e}")
             raise
+        self.log_action(user_id, f"Сохранён отчёт {config['name']}")
 
-    def update_inventory(self, id, name, category, quantity, condition, purchase_date, service_life, photo=None):
+    def delete_report_template(self, report_id):
         cursor = self.conn.cursor()
         try:
-            cursor.execute("""
-                UPDATE inventory SET name=?, category=?, quantity=?, condition=?, purchase_date=?, service_life=?, photo=?
-                WHERE id=?
-            """, (name, category, quantity, condition, purchase_date, service_life, photo, id))
+            cursor.execute("DELETE FROM report_templates WHERE id = ?", (report_id,))
             self.conn.commit()
-            self.get_inventory.cache_clear()
-        except pyodbc.Error as e:
+        except DB_ERRORS as e:
             self.conn.rollback()
-            logging.error(f"Ошибка обновления инвентаря {id}: {e}")
+            logging.error(f"Ошибка удаления отчёта {report_id}: {e}")
             raise
 
-    def delete_inventory(self, id):
+    def share_report_template(self, report_id, target_user_id):
         cursor = self.conn.cursor()
         try:
-            cursor.execute('DELETE FROM inventory WHERE id=?', (id,))
+            cursor.execute("SELECT config, type FROM report_templates WHERE id = ?", (report_id,))
+            config, report_type = cursor.fetchone()
+            cursor.execute("INSERT INTO report_templates (user_id, config, type, created_at) VALUES (?, ?, ?, ?)",
+                           (target_user_id, config, report_type, datetime.datetime.now()))
             self.conn.commit()
-            self.get_inventory.cache_clear()
-        except pyodbc.Error as e:
+        except DB_ERRORS as e:
             self.conn.rollback()
-            logging.error(f"Ошибка удаления инвентаря {id}: {e}")
+            logging.error(f"Ошибка передачи отчёта {report_id} пользователю {target_user_id}: {e}")
             raise
 
-    def add_booking(self, inventory_id, user_id, booking_date, class_):
+    def get_logs_page(self, user_id=None, action=None, date_from=None, date_to=None, after=None, newer_than=None, limit=100):
+        """Страница журнала от новых к старым: (id, пользователь, действие, время, user_id).
+        after — ключ (время, id) последней загруженной записи, newer_than — только записи с большим id.
+        Действие ищется по началу строки, чтобы запрос мог использовать индекс"""
+        where, params = [], []
+        if user_id:
+            where.append('l.user_id = ?')
+            params.append(user_id)
+        if action:
+            where.append("l.action LIKE ? ESCAPE '\\'")
+            params.append(escape_like(action) + '%')
+        if date_from:
+            # Границы передаются как date, а не строкой: DATETIME в SQL Server читает 'ГГГГ-ММ-ДД' по языку входа
+            where.append('l.timestamp >= ?')
+            params.append(datetime.date.fromisoformat(iso_day(date_from)))
+        if date_to:
+            where.append('l.timestamp < ?')
+            params.append(datetime.date.fromisoformat(iso_day(date_to)) + datetime.timedelta(days=1))
+        if after:
+            where.append('(l.timestamp < ? OR (l.timestamp = ? AND l.id < ?))')
+            params += [after[0], after[0], after[1]]
+        if newer_than is not None:
+            where.append('l.id > ?')
+            params.append(newer_than)
+        query = "SELECT l.id, COALESCE(u.username, ''), l.action, l.timestamp, l.user_id FROM logs l LEFT JOIN users u ON u.id = l.user_id"
+        if where:
+            query += ' WHERE ' + ' AND '.join(where)
+        query, limit_params = self.backend.limit(f'{query} ORDER BY l.timestamp DESC, l.id DESC', limit)
+        cursor = self.conn.cursor()
+        cursor.execute(query, params + limit_params)
+        return [tuple(row) for row in cursor.fetchall()]
+
+    def get_last_log_id(self):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT MAX(id) FROM logs')
+        return cursor.fetchone()[0] or 0
+
+    def add_schedule(self, report_id, report_format, cron, recipients, user_id):
+        """Добавляет расписание; для той же тройки (отчёт, формат, cron) дополняет список получателей"""
         cursor = self.conn.cursor()
         try:
-            cursor.execute('INSERT INTO bookings (inventory_id, user_id, booking_date, class) VALUES (?, ?, ?, ?)',
-                           (inventory_id, user_id, booking_date, class_))
+            cursor.execute('SELECT id, recipients FROM report_schedules WHERE report_id = ? AND format = ? AND cron = ?',
+                           (report_id, report_format, cron))
+            row = cursor.fetchone()
+            if row:
+                addresses = [a.strip() for a in (row[1] or '').split(',') if a.strip()]
+                addresses += [a for a in recipients if a not in addresses]
+                cursor.execute('UPDATE report_schedules SET recipients = ?, enabled = 1 WHERE id = ?', (', '.join(addresses), row[0]))
+            else:
+                cursor.execute('INSERT INTO report_schedules (report_id, format, cron, recipients, created_by) VALUES (?, ?, ?, ?, ?)',
+                               (report_id, report_format, cron, ', '.join(recipients), user_id))
             self.conn.commit()
-        except pyodbc.Error as e:
+        except DB_ERRORS as e:
             self.conn.rollback()
-            logging.error(f"Ошибка добавления бронирования для инвентаря {inventory_id}: {e}")
+            logging.error(f"Ошибка сохранения расписания отчёта {report_id}: {e}")
             raise
 
-    def get_bookings(self, user_id=None):
+    def get_schedules(self, enabled_only=False):
+        """(id, report_id, format, cron, recipients)"""
         cursor = self.conn.cursor()
-        if user_id:
-            cursor.execute('SELECT * FROM bookings WHERE user_id = ?', (user_id,))
-        else:
-            cursor.execute('SELECT * FROM bookings')
+        query = 'SELECT id, report_id, format, cron, recipients FROM report_schedules'
+        if enabled_only:
+            query += ' WHERE enabled = 1'
+        cursor.execute(query + ' ORDER BY id')
         return cursor.fetchall()
 
-    def search_inventory(self, query):
+    def delete_schedule(self, schedule_id):
         cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT * FROM inventory WHERE name LIKE ? OR category LIKE ? OR condition LIKE ?
-        """, (f'%{query}%', f'%{query}%', f'%{query}%'))
-        return cursor.fetchall()
+        try:
+            cursor.execute('DELETE FROM report_schedules WHERE id = ?', (schedule_id,))
+            self.conn.commit()
+        except DB_ERRORS as e:
+            self.conn.rollback()
+            logging.error(f"Ошибка удаления расписания {schedule_id}: {e}")
+            raise
 
-    def get_users(self):
+    def claim_schedule_run(self, schedule_id, fire_time):
+        """Отмечает запуск расписания; False, если этот запуск уже выполнил другой клиент"""
         cursor = self.conn.cursor()
-        cursor.execute('SELECT id, username, role FROM users')
-        return cursor.fetchall()
+        try:
+            cursor.execute('UPDATE report_schedules SET last_run = ? WHERE id = ? AND (last_run IS NULL OR last_run < ?)',
+                           (fire_time, schedule_id, fire_time))
+            claimed = cursor.rowcount == 1
+            self.conn.commit()
+            return claimed
+        except DB_ERRORS as e:
+            self.conn.rollback()
+            logging.error(f"Ошибка отметки запуска расписания {schedule_id}: {e}")
+            raise
 
     def close(self):
-        self.conn.close()
+        """Возвращает соединение текущего потока в пул"""
+        if getattr(self._local, 'conn', None) is not None:
+            self._local.conn = None
+            self.pool.release()
 
 class LoginDialog(QDialog):
     """Окно входа в систему"""
@@ -1040,26 +4063,38 @@ class LoginDialog(QDialog):
         self.username = QLineEdit()
         self.password = QLineEdit()
         self.password.setEchoMode(QLineEdit.Password)
-        login_btn = QPushButton('Войти')
-        login_btn.clicked.connect(self.login)
+        self.login_btn = QPushButton('Войти')
+        self.login_btn.clicked.connect(self.login)
         layout.addWidget(QLabel('Имя пользователя:'))
         layout.addWidget(self.username)
         layout.addWidget(QLabel('Пароль:'))
         layout.addWidget(self.password)
-        layout.addWidget(login_btn)
+        layout.addWidget(self.login_btn)
         self.setLayout(layout)
         self.db = Database()
+        self.async_db = AsyncDatabase(self.db, self)
         self.user_id = None
         self.role = None
 
     def login(self):
-        self.user_id, self.role = self.db.authenticate(self.username.text(), self.password.text())
+        # Проверка пароля bcrypt и запрос к базе выполняются в фоне
+        self.login_btn.setEnabled(False)
+        self.async_db.run(self.db.authenticate, self.username.text(), self.password.text(),
+                          on_done=self.login_finished, on_error=self.login_failed)
+
+    def login_finished(self, result):
+        self.login_btn.setEnabled(True)
+        self.user_id, self.role = result
         if self.user_id:
             self.db.log_action(self.user_id, 'Вход выполнен')
             self.accept()
         else:
             QMessageBox.warning(self, 'Ошибка', 'Неверные учетные данные')
 
+    def login_failed(self, error):
+        self.login_btn.setEnabled(True)
+        QMessageBox.warning(self, 'Ошибка', f'Не удалось подключиться к базе данных: {error}')
+
 class BaseMainWindow(QMainWindow):
     """Базовое окно для интерфейсов"""
     def __init__(self, user_id, role):
@@ -1069,7 +4104,15 @@ class BaseMainWindow(QMainWindow):
         self.user_id = user_id
         self.role = role
         self.db = Database()
-        self.db.log_action(self.user_id, 'Открыто главное окно')
+        self.async_db = AsyncDatabase(self.db, self)
+        self.busy_bar = QProgressBar()
+        self.busy_bar.setRange(0, 0)
+        self.busy_bar.setMaximumWidth(150)
+        self.busy_bar.hide()
+        self.statusBar().addPermanentWidget(self.busy_bar)
+        self.async_db.busy_changed.connect(self.set_busy)
+        self.async_db.progress.connect(self.show_progress)
+        self.log_action('Открыто главное окно')
         self.inactivity_timer = QTimer(self)
         self.inactivity_timer.timeout.connect(self.logout)
         self.inactivity_timer.start(15 * 60 * 1000)
@@ -1080,6 +4123,25 @@ class BaseMainWindow(QMainWindow):
 
         self.setup_ui()
 
+    def set_busy(self, busy):
+        if not busy:
+            self.busy_bar.setRange(0, 0)
+        self.busy_bar.setVisible(busy)
+
+    def show_progress(self, done, total):
+        self.busy_bar.setRange(0, total)
+        self.busy_bar.setValue(min(done, total))
+
+    def log_action(self, action):
+        self.db.log_action(self.user_id, action)
+
+    def log_report_action(self, report_id, action):
+        self.db.log_report_action(report_id, self.user_id, action)
+
+    def show_error(self, text):
+        """Обработчик ошибки фоновой операции для AsyncDatabase.run"""
+        return lambda error: QMessageBox.warning(self, 'Ошибка', f'{text}: {error}')
+
     def eventFilter(self, obj, event):
         if event.type() in [QEvent.KeyPress, QEvent.MouseButtonPress, QEvent.MouseMove]:
             self.inactivity_timer.stop()
@@ -1087,7 +4149,7 @@ class BaseMainWindow(QMainWindow):
         return super().eventFilter(obj, event)
 
     def logout(self):
-        self.db.log_action(self.user_id, 'Выход из-за неактивности')
+        self.log_action('Выход из-за неактивности')
         self.close()
 
     def set_theme(self):
@@ -1152,13 +4214,150 @@ class BaseMainWindow(QMainWindow):
         dialog.exec_()
 
     def check_reminders(self):
-        items = self.db.get_inventory()
+        self.async_db.run(self.db.get_inventory, on_done=self.show_reminders, busy=False)
+
+    def show_reminders(self, items):
         current_year = datetime.date.today().year
         reminders = [item[1] for item in items if item[5] and datetime.date.fromisoformat(str(item[5])).year + item[6] <= current_year]
         if reminders:
             self.tray.showMessage('Напоминание', f'Необходима замена предметов: {", ".join(reminders)}', QSystemTrayIcon.Information)
 
+    def inventory_changed(self, action):
+        """Обновляет таблицу и поиск после изменения инвентаря"""
+        self.log_action(action)
+        self.search_controller.invalidate()
+        self.model.reload()
+
+    def open_report(self, on_config):
+        """Загружает конфигурацию выбранного отчёта в фоне и передаёт её в on_config(report_id, config)"""
+        row = self.reports_table.currentIndex().row()
+        if row < 0:
+            QMessageBox.warning(self, 'Ошибка', 'Выберите отчёт')
+            return
+        report_id = self.reports_model.rows[row][0]
+        self.async_db.run(self.db.get_report_config, report_id,
+                          on_done=lambda config: on_config(report_id, config),
+                          on_error=self.show_error('Не удалось загрузить отчёт'))
+
+    def show_report(self, index):
+        report_id = self.reports_model.rows[index.row()][0]
+        self.async_db.run(self.db.get_report_config, report_id,
+                          on_done=lambda config: self.preview.setHtml((config or {}).get('preview_html', '<h1>Отчёт</h1>')))
+
+    def edit_report(self):
+        self.open_report(self.open_editor)
+
+    def open_editor(self, report_id, config):
+        editor = ReportEditor(self.db, self.user_id, report_id, config)
+        if editor.exec_():
+            self.reports_model.refresh()
+            self.log_report_action(report_id, f'Отредактирован отчёт {config["name"]}')
+            self.show_report(self.reports_table.currentIndex())
+
+    def export_report(self):
+        self.open_report(self.open_export_dialog)
+
+    def open_export_dialog(self, report_id, config):
+        dialog = QDialog(self)
+        dialog.setWindowTitle('Экспорт отчёта')
+        layout = QFormLayout()
+        format_selector = QComboBox()
+        format_selector.addItems(['PDF', 'Excel', 'HTML'])
+        layout.addRow('Формат', format_selector)
+        export_btn = QPushButton('Экспортировать')
+        def run_export(report_format, filename):
+            report = ReportGenerator(self.db, config, report_format, 'school_logo.png')
+            report.export(filename)
+            return filename
+        def exported(filename, format_name):
+            QMessageBox.information(self, 'Успех', f'Отчёт экспортирован: {filename}')
+            self.log_report_action(report_id, f'Экспортирован отчёт в {format_name}')
+        def do_export():
+            format_name = format_selector.currentText()
+            filename = f'report_{report_id}.{format_name.lower()}'
+            self.async_db.run(run_export, format_name.lower(), filename,
+                              on_done=lambda filename: exported(filename, format_name),
+                              on_error=self.show_error('Не удалось экспортировать отчёт'))
+            dialog.close()
+        export_btn.clicked.connect(do_export)
+        layout.addRow(export_btn)
+        dialog.setLayout(layout)
+        dialog.exec_()
+
+    def batch_export(self):
+        dialog = QDialog(self)
+        dialog.setWindowTitle('Пакетный экспорт отчётов')
+        layout = QFormLayout()
+        reports_list = QListWidget()
+        for report in self.reports_model.rows:
+            item = QListWidgetItem(report[1])
+            item.setData(Qt.UserRole, report[0])
+            item.setCheckState(Qt.Checked)
+            reports_list.addItem(item)
+        layout.addRow('Отчёты', reports_list)
+        format_boxes = {'pdf': QCheckBox('PDF'), 'excel': QCheckBox('Excel'), 'html': QCheckBox('HTML')}
+        formats_layout = QHBoxLayout()
+        for box in format_boxes.values():
+            box.setChecked(True)
+            formats_layout.addWidget(box)
+        layout.addRow('Форматы', formats_layout)
+        out_dir = QLineEdit(os.path.abspath('reports_export'))
+        layout.addRow('Папка', out_dir)
+        export_btn = QPushButton('Экспортировать')
+        def exported(manifest):
+            done = len(manifest['jobs']) - manifest['failed']
+            QMessageBox.information(self, 'Пакетный экспорт',
+                                    f"Готово файлов: {done}, с ошибками: {manifest['failed']}, время: {manifest['seconds']} с.\n"
+                                    f"Манифест: {os.path.join(out_dir.text(), 'manifest.json')}")
+            self.log_action(f'Пакетный экспорт отчётов: {done} файлов')
+        def do_export():
+            report_ids = [reports_list.item(i).data(Qt.UserRole) for i in range(reports_list.count())
+                          if reports_list.item(i).checkState() == Qt.Checked]
+            formats = [name for name, box in format_boxes.items() if box.isChecked()]
+            if not report_ids or not formats:
+                QMessageBox.warning(self, 'Ошибка', 'Выберите отчёты и форматы')
+                return
+            exporter = BatchExporter(self.db, report_ids, formats, out_dir.text(), progress=self.async_db.report_progress)
+            self.async_db.run(exporter.run, on_done=exported, on_error=self.show_error('Не удалось выполнить пакетный экспорт'))
+            dialog.close()
+        export_btn.clicked.connect(do_export)
+        layout.addRow(export_btn)
+        dialog.setLayout(layout)
+        dialog.exec_()
+
+    def add_bookings_view(self, layout):
+        """Таблица бронирований пользователя с фильтрами по периоду и занятию"""
+        filters = QHBoxLayout()
+        period = QCheckBox('Период')
+        date_from = QDateEdit(QDate.currentDate().addMonths(-1))
+        date_to = QDateEdit(QDate.currentDate().addMonths(1))
+        for edit in (date_from, date_to):
+            edit.setCalendarPopup(True)
+            edit.setEnabled(False)
+        period.toggled.connect(date_from.setEnabled)
+        period.toggled.connect(date_to.setEnabled)
+        class_filter = QLineEdit()
+        class_filter.setPlaceholderText('Занятие')
+        apply_btn = QPushButton('Показать')
+        def apply_filter():
+            dates = (date_from.date().toString('yyyy-MM-dd'), date_to.date().toString('yyyy-MM-dd')) if period.isChecked() else (None, None)
+            self.bookings_model.set_filter(*dates, class_filter.text().strip())
+        apply_btn.clicked.connect(apply_filter)
+        class_filter.returnPressed.connect(apply_filter)
+        for widget in (period, date_from, date_to, class_filter, apply_btn):
+            filters.addWidget(widget)
+        layout.addLayout(filters)
+
+        self.bookings_table = QTableView()
+        self.bookings_model = BookingTableModel(self.async_db, self.user_id)
+        self.bookings_table.setModel(self.bookings_model)
+        self.bookings_table.horizontalHeader().setSortIndicator(self.bookings_model.sort_column, Qt.AscendingOrder)
+        self.bookings_table.setSortingEnabled(True)
+        self.bookings_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.bookings_table)
+
     def closeEvent(self, event):
+        self.db.flush_log()
         self.db.close()
         super().closeEvent(event)
 
@@ -1176,22 +4375,15 @@ class AdminWindow(BaseMainWindow):
         tab = QWidget()
         layout = QVBoxLayout()
         self.inventory_table = QTableView()
-        self.model = InventoryTableModel(self.db)
+        self.model = InventoryTableModel(self.async_db)
         self.inventory_table.setModel(self.model)
         self.inventory_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         layout.addWidget(self.inventory_table)
 
-        nav_layout = QHBoxLayout()
-        prev_btn = QPushButton('Предыдущая страница')
-        prev_btn.clicked.connect(self.model.prev_page)
-        next_btn = QPushButton('Следующая страница')
-        next_btn.clicked.connect(self.model.next_page)
-        nav_layout.addWidget(prev_btn)
-        nav_layout.addWidget(next_btn)
-        layout.addLayout(nav_layout)
-
         search_layout = QHBoxLayout()
         self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText('Название, категория, состояние или ID')
+        self.search_controller = SearchController(self.async_db, self.search_input, self.model)
         search_btn = QPushButton('Поиск')
         search_btn.clicked.connect(self.search_inventory)
         search_layout.addWidget(QLabel('Поиск:'))
@@ -1211,6 +4403,12 @@ class AdminWindow(BaseMainWindow):
         qr_btn = QPushButton('Сгенерировать QR-код')
         qr_btn.clicked.connect(self.generate_qr)
         layout.addWidget(qr_btn)
+        import_btn = QPushButton('Импорт из CSV/Excel')
+        import_btn.clicked.connect(self.import_inventory)
+        layout.addWidget(import_btn)
+        export_btn = QPushButton('Экспорт в CSV/Excel')
+        export_btn.clicked.connect(self.export_inventory)
+        layout.addWidget(export_btn)
 
         tab.setLayout(layout)
         self.dock_layout.addWidget(QPushButton('Инвентарь', clicked=lambda: self.tabs.setCurrentWidget(tab)))
@@ -1241,11 +4439,10 @@ class AdminWindow(BaseMainWindow):
                     logging.error(f"Ошибка чтения фото: {e}")
                     QMessageBox.warning(self, 'Ошибка', 'Не удалось загрузить фото')
                     return
-            self.db.add_inventory(name.text(), category.text(), quantity.value(), condition.currentText(),
-                                  purchase_date.date().toString('yyyy-MM-dd'), service_life.value(), photo)
-            self.db.log_action(self.user_id, f'Добавлен предмет {name.text()}')
-            self.model.data = self.model.load_page()
-            self.model.layoutChanged.emit()
+            self.async_db.run(self.db.add_inventory, name.text(), category.text(), quantity.value(), condition.currentText(),
+                              purchase_date.date().toString('yyyy-MM-dd'), service_life.value(), photo, write=True,
+                              on_done=lambda _: self.inventory_changed(f'Добавлен предмет {name.text()}'),
+                              on_error=self.show_error('Не удалось добавить предмет'))
             dialog.close()
         add_btn.clicked.connect(add_item)
         layout.addRow('Название', name)
@@ -1264,8 +4461,17 @@ class AdminWindow(BaseMainWindow):
         if row < 0:
             QMessageBox.warning(self, 'Ошибка', 'Выберите предмет')
             return
-        id = int(self.model.data[row][0])
-        item = next(i for i in self.db.get_inventory() if i[0] == id)
+        id = int(self.model.rows[row][0])
+        self.async_db.run(lambda: (self.db.get_item(id), self.db.get_thumbnail(id)),
+                          on_done=lambda result: self.open_update_dialog(id, *result),
+                          on_error=self.show_error('Не удалось загрузить предмет'))
+
+    def open_update_dialog(self, id, item, thumbnail):
+        if item is None:
+            QMessageBox.warning(self, 'Ошибка', 'Предмет не найден')
+            self.search_controller.invalidate()
+            self.model.reload()
+            return
         dialog = QDialog(self)
         dialog.setWindowTitle('Обновить предмет')
         layout = QFormLayout()
@@ -1282,9 +4488,14 @@ class AdminWindow(BaseMainWindow):
         photo_path = [None]
         photo_btn = QPushButton('Загрузить новое фото')
         photo_btn.clicked.connect(lambda: photo_path.__setitem__(0, QFileDialog.getOpenFileName(self, 'Выбрать фото')[0]))
+        photo_preview = QLabel('Нет фото')
+        if thumbnail:
+            pixmap = QPixmap()
+            pixmap.loadFromData(thumbnail)
+            photo_preview.setPixmap(pixmap)
         update_btn = QPushButton('Обновить')
         def update_item():
-            photo = item[7]
+            photo = None
             if photo_path[0]:
                 try:
                     with open(photo_path[0], 'rb') as f:
@@ -1293,11 +4504,10 @@ class AdminWindow(BaseMainWindow):
                     logging.error(f"Ошибка чтения фото: {e}")
                     QMessageBox.warning(self, 'Ошибка', 'Не удалось загрузить фото')
                     return
-            self.db.update_inventory(id, name.text(), category.text(), quantity.value(), condition.currentText(),
-                                     purchase_date.date().toString('yyyy-MM-dd'), service_life.value(), photo)
-            self.db.log_action(self.user_id, f'Обновлён предмет {id}')
-            self.model.data = self.model.load_page()
-            self.model.layoutChanged.emit()
+            self.async_db.run(self.db.update_inventory, id, name.text(), category.text(), quantity.value(), condition.currentText(),
+                              purchase_date.date().toString('yyyy-MM-dd'), service_life.value(), photo, write=True,
+                              on_done=lambda _: self.inventory_changed(f'Обновлён предмет {id}'),
+                              on_error=self.show_error('Не удалось обновить предмет'))
             dialog.close()
         update_btn.clicked.connect(update_item)
         layout.addRow('Название', name)
@@ -1306,7 +4516,8 @@ class AdminWindow(BaseMainWindow):
         layout.addRow('Состояние', condition)
         layout.addRow('Дата покупки', purchase_date)
         layout.addRow('Срок службы (годы)', service_life)
-        layout.addRow('Фото', photo_btn)
+        layout.addRow('Фото', photo_preview)
+        layout.addRow('', photo_btn)
         layout.addRow(update_btn)
         dialog.setLayout(layout)
         dialog.exec_()
@@ -1316,36 +4527,58 @@ class AdminWindow(BaseMainWindow):
         if row < 0:
             QMessageBox.warning(self, 'Ошибка', 'Выберите предмет')
             return
-        id = int(self.model.data[row][0])
-        self.db.delete_inventory(id)
-        self.db.log_action(self.user_id, f'Удалён предмет {id}')
-        self.model.data = self.model.load_page()
-        self.model.layoutChanged.emit()
+        id = int(self.model.rows[row][0])
+        self.async_db.run(self.db.delete_inventory, id, write=True,
+                          on_done=lambda _: self.inventory_changed(f'Удалён предмет {id}'),
+                          on_error=self.show_error('Не удалось удалить предмет'))
 
     def generate_qr(self):
         row = self.inventory_table.currentIndex().row()
         if row < 0:
             QMessageBox.warning(self, 'Ошибка', 'Выберите предмет')
             return
-        id = self.model.data[row][0]
+        id = self.model.rows[row][0]
         qr = qrcode.QRCode()
-        qr.add_data(f'ID инвентаря: {id} - Название: {self.model.data[row][1]}')
+        qr.add_data(f'ID инвентаря: {id} - Название: {self.model.rows[row][1]}')
         qr.make(fit=True)
         img = qr.make_image(fill='black', back_color='white')
         img.save(f'qr_{id}.png')
         QMessageBox.information(self, 'QR-код сгенерирован', f'QR-код сохранён как qr_{id}.png')
 
     def search_inventory(self):
-        query = self.search_input.text()
-        items = self.db.search_inventory(query)
-        self.model.data = items
-        self.model.layoutChanged.emit()
+        self.search_controller.search_now()
+
+    def import_inventory(self):
+        filename = QFileDialog.getOpenFileName(self, 'Импорт инвентаря', '', 'CSV (*.csv);;Excel (*.xlsx)')[0]
+        if not filename:
+            return
+        self.async_db.run(self.db.import_inventory, filename, self.async_db.report_progress, write=True,
+                          on_done=lambda result: self.inventory_imported(filename, *result),
+                          on_error=self.show_error('Не удалось импортировать инвентарь'))
+
+    def inventory_imported(self, filename, imported, errors):
+        self.inventory_changed(f'Импортировано предметов: {imported} из {os.path.basename(filename)}')
+        if errors:
+            QMessageBox.warning(self, 'Импорт', f'Добавлено предметов: {imported}. Строк с ошибками: {len(errors)}, '
+                                f'подробности в {os.path.splitext(filename)[0]}_errors.csv')
+        else:
+            QMessageBox.information(self, 'Импорт', f'Добавлено предметов: {imported}')
+
+    def export_inventory(self):
+        filename = QFileDialog.getSaveFileName(self, 'Экспорт инвентаря', 'inventory.csv', 'CSV (*.csv);;Excel (*.xlsx)')[0]
+        if not filename:
+            return
+        def exported(count):
+            QMessageBox.information(self, 'Экспорт', f'Экспортировано предметов: {count}')
+            self.log_action(f'Экспортирован инвентарь в {os.path.basename(filename)}')
+        self.async_db.run(self.db.export_inventory, filename, self.async_db.report_progress,
+                          on_done=exported, on_error=self.show_error('Не удалось экспортировать инвентарь'))
 
     def add_users_tab(self):
         tab = QWidget()
         layout = QVBoxLayout()
         self.users_table = QTableView()
-        self.users_model = UserTableModel(self.db)
+        self.users_model = UserTableModel(self.async_db)
         self.users_table.setModel(self.users_model)
         self.users_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         layout.addWidget(self.users_table)
@@ -1356,14 +4589,14 @@ class AdminWindow(BaseMainWindow):
         role = QComboBox()
         role.addItems(['Администратор', 'Учитель', 'Ученик'])
         add_btn = QPushButton('Добавить пользователя')
+        def user_added():
+            self.log_action(f'Добавлен пользователь {username.text()}')
+            self.users_model.refresh()
+            QMessageBox.information(self, 'Успех', 'Пользователь добавлен')
         def add_user():
-            try:
-                self.db.add_user(username.text(), password.text(), role.currentText())
-                self.db.log_action(self.user_id, f'Добавлен пользователь {username.text()}')
-                self.users_model.refresh()
-                QMessageBox.information(self, 'Успех', 'Пользователь добавлен')
-            except Exception as e:
-                QMessageBox.warning(self, 'Ошибка', f'Не удалось добавить пользователя: {str(e)}')
+            self.async_db.run(self.db.add_user, username.text(), password.text(), role.currentText(), write=True,
+                              on_done=lambda _: user_added(),
+                              on_error=self.show_error('Не удалось добавить пользователя'))
         add_btn.clicked.connect(add_user)
         form_layout.addRow('Имя пользователя', username)
         form_layout.addRow('Пароль', password)
@@ -1378,7 +4611,7 @@ class AdminWindow(BaseMainWindow):
         tab = QWidget()
         layout = QVBoxLayout()
         self.reports_table = QTableView()
-        self.reports_model = ReportTableModel(self.db, self.user_id)
+        self.reports_model = ReportTableModel(self.async_db, self.user_id)
         self.reports_table.setModel(self.reports_model)
         self.reports_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.reports_table.clicked.connect(self.show_report)
@@ -1394,13 +4627,19 @@ class AdminWindow(BaseMainWindow):
         delete_btn.clicked.connect(self.delete_report)
         export_btn = QPushButton('Экспорт')
         export_btn.clicked.connect(self.export_report)
+        batch_export_btn = QPushButton('Пакетный экспорт')
+        batch_export_btn.clicked.connect(self.batch_export)
         share_btn = QPushButton('Поделиться')
         share_btn.clicked.connect(self.share_report)
+        schedule_btn = QPushButton('Расписание')
+        schedule_btn.clicked.connect(self.schedule_report)
         toolbar.addWidget(create_btn)
         toolbar.addWidget(edit_btn)
         toolbar.addWidget(delete_btn)
         toolbar.addWidget(export_btn)
+        toolbar.addWidget(batch_export_btn)
         toolbar.addWidget(share_btn)
+        toolbar.addWidget(schedule_btn)
         layout.addLayout(toolbar)
 
         self.preview = QTextEdit()
@@ -1415,69 +4654,74 @@ class AdminWindow(BaseMainWindow):
         editor = ReportEditor(self.db, self.user_id)
         if editor.exec_():
             self.reports_model.refresh()
-            self.db.log_report_action(None, self.user_id, 'Создан новый отчёт')
-
-    def show_report(self, index):
-        row = index.row()
-        report_id = self.reports_model.data[row][0]
-        cursor = self.db.conn.cursor()
-        cursor.execute("SELECT config FROM report_templates WHERE id = ?", (report_id,))
-        config = json.loads(cursor.fetchone()[0])
-        self.preview.setHtml(config.get('preview_html', '<h1>Отчёт</h1>'))
+            self.log_report_action(None, 'Создан новый отчёт')
 
-    def edit_report(self):
+    def delete_report(self):
         row = self.reports_table.currentIndex().row()
         if row < 0:
             QMessageBox.warning(self, 'Ошибка', 'Выберите отчёт')
             return
-        report_id = self.reports_model.data[row][0]
-        cursor = self.db.conn.cursor()
-        cursor.execute("SELECT config FROM report_templates WHERE id = ?", (report_id,))
-        config = json.loads(cursor.fetchone()[0])
-        editor = ReportEditor(self.db, self.user_id, report_id, config)
-        if editor.exec_():
+        report_id = self.reports_model.rows[row][0]
+        def report_deleted():
             self.reports_model.refresh()
-            self.db.log_report_action(report_id, self.user_id, f'Отредактирован отчёт {config["name"]}')
-            self.show_report(self.reports_table.currentIndex())
+            self.log_report_action(report_id, 'Удалён отчёт')
+            self.preview.setHtml('<h1>Выберите отчёт для предпросмотра</h1>')
+        self.async_db.run(self.db.delete_report_template, report_id, write=True,
+                          on_done=lambda _: report_deleted(),
+                          on_error=self.show_error('Не удалось удалить отчёт'))
 
-    def delete_report(self):
-        row = self.reports_table.currentIndex().row()
-        if row < 0:
-            QMessageBox.warning(self, 'Ошибка', 'Выберите отчёт')
-            return
-        report_id = self.reports_model.data[row][0]
-        cursor = self.db.conn.cursor()
-        cursor.execute("DELETE FROM report_templates WHERE id = ?", (report_id,))
-        self.db.conn.commit()
-        self.reports_model.refresh()
-        self.db.log_report_action(report_id, self.user_id, 'Удалён отчёт')
-        self.preview.setHtml('<h1>Выберите отчёт для предпросмотра</h1>')
+    def schedule_report(self):
+        self.open_report(self.open_schedule_dialog)
 
-    def export_report(self):
-        row = self.reports_table.currentIndex().row()
-        if row < 0:
-            QMessageBox.warning(self, 'Ошибка', 'Выберите отчёт')
-            return
-        report_id = self.reports_model.data[row][0]
-        cursor = self.db.conn.cursor()
-        cursor.execute("SELECT config FROM report_templates WHERE id = ?", (report_id,))
-        config = json.loads(cursor.fetchone()[0])
+    def open_schedule_dialog(self, report_id, config):
         dialog = QDialog(self)
-        dialog.setWindowTitle('Экспорт отчёта')
+        dialog.setWindowTitle('Расписание отчёта')
         layout = QFormLayout()
         format_selector = QComboBox()
         format_selector.addItems(['PDF', 'Excel', 'HTML'])
         layout.addRow('Формат', format_selector)
-        export_btn = QPushButton('Экспортировать')
-        def do_export():
-            report = ReportGenerator(self.db, config, format_selector.currentText().lower(), 'school_logo.png')
-            filename = f'report_{report_id}.{format_selector.currentText().lower()}'
-            report.export(filename)
-            QMessageBox.information(self, 'Успех', f'Отчёт экспортирован: {filename}')
-            self.db.log_report_action(report_id, self.user_id, f'Экспортирован отчёт в {format_selector.currentText()}')
+        cron_input = QLineEdit('0 7 * * 1')
+        cron_input.setToolTip('Минуты, часы, день месяца, месяц, день недели — например, 0 7 * * 1 (понедельник, 7:00)')
+        layout.addRow('Расписание (cron)', cron_input)
+        recipients_input = QLineEdit()
+        recipients_input.setPlaceholderText('адреса через запятую')
+        layout.addRow('Получатели', recipients_input)
+        save_btn = QPushButton('Сохранить')
+        test_btn = QPushButton('Отправить сейчас')
+        def scheduled(cron):
+            QMessageBox.information(self, 'Успех', 'Расписание сохранено')
+            self.log_report_action(report_id, f'Добавлено расписание отправки {cron}')
+        def read_recipients():
+            recipients = [a.strip() for a in recipients_input.text().split(',') if a.strip()]
+            if not recipients or not all('@' in a for a in recipients):
+                QMessageBox.warning(self, 'Ошибка', 'Укажите адреса получателей')
+                return None
+            return recipients
+        def sent(count):
+            QMessageBox.information(self, 'Успех', f'Отправлено писем: {count}')
+            self.log_report_action(report_id, f'Пробная отправка отчёта: {count} писем')
+        def send_test():
+            recipients = read_recipients()
+            if recipients:
+                self.async_db.run(ReportScheduler(self.db).send_now, report_id, format_selector.currentText().lower(), recipients,
+                                  on_done=sent, on_error=self.show_error('Не удалось отправить отчёт'))
+        test_btn.clicked.connect(send_test)
+        def save():
+            cron = ' '.join(cron_input.text().split())
+            try:
+                CronTrigger.from_crontab(cron)
+            except ValueError as e:
+                QMessageBox.warning(self, 'Ошибка', f'Некорректное расписание: {e}')
+                return
+            recipients = read_recipients()
+            if not recipients:
+                return
+            self.async_db.run(self.db.add_schedule, report_id, format_selector.currentText().lower(), cron, recipients,
+                              self.user_id, write=True, on_done=lambda _: scheduled(cron),
+                              on_error=self.show_error('Не удалось сохранить расписание'))
             dialog.close()
-        export_btn.clicked.connect(do_export)
-        layout.addRow(export_btn)
+        save_btn.clicked.connect(save)
+        layout.addRow(test_btn, save_btn)
         dialog.setLayout(layout)
         dialog.exec_()
 
@@ -1486,26 +4730,27 @@ class AdminWindow(BaseMainWindow):
         if row < 0:
             QMessageBox.warning(self, 'Ошибка', 'Выберите отчёт')
             return
-        report_id = self.reports_model.data[row][0]
+        report_id = self.reports_model.rows[row][0]
+        self.async_db.run(self.db.get_users, on_done=lambda users: self.open_share_dialog(report_id, users),
+                          on_error=self.show_error('Не удалось загрузить пользователей'))
+
+    def open_share_dialog(self, report_id, users):
+        users = [u for u in users if u[0] != self.user_id]
         dialog = QDialog(self)
         dialog.setWindowTitle('Поделиться отчётом')
         layout = QFormLayout()
         user_selector = QComboBox()
-        cursor = self.db.conn.cursor()
-        cursor.execute("SELECT id, username FROM users WHERE id != ?", (self.user_id,))
-        users = cursor.fetchall()
         user_selector.addItems([u[1] for u in users])
         layout.addRow('Пользователь', user_selector)
         share_btn = QPushButton('Поделиться')
+        def shared(target_user_id):
+            QMessageBox.information(self, 'Успех', 'Отчёт поделён')
+            self.log_report_action(report_id, f'Отчёт поделён с пользователем {target_user_id}')
         def do_share():
             target_user_id = users[user_selector.currentIndex()][0]
-            cursor.execute("SELECT config, type FROM report_templates WHERE id = ?", (report_id,))
-            config, report_type = cursor.fetchone()
-            cursor.execute("INSERT INTO report_templates (user_id, config, type, created_at) VALUES (?, ?, ?, ?)",
-                           (target_user_id, config, report_type, datetime.datetime.now()))
-            self.db.conn.commit()
-            QMessageBox.information(self, 'Успех', 'Отчёт поделён')
-            self.db.log_report_action(report_id, self.user_id, f'Отчёт поделён с пользователем {target_user_id}')
+            self.async_db.run(self.db.share_report_template, report_id, target_user_id, write=True,
+                              on_done=lambda _: shared(target_user_id),
+                              on_error=self.show_error('Не удалось поделиться отчётом'))
             dialog.close()
         share_btn.clicked.connect(do_share)
         layout.addRow(share_btn)
@@ -1515,15 +4760,66 @@ class AdminWindow(BaseMainWindow):
     def add_logs_tab(self):
         tab = QWidget()
         layout = QVBoxLayout()
-        logs_text = QTextEdit()
-        cursor = self.db.conn.cursor()
-        cursor.execute('SELECT * FROM logs ORDER BY timestamp DESC')
-        logs = cursor.fetchall()
-        logs_text.setText('\n'.join(f'ID: {log[0]}, Пользователь: {log[1]}, Действие: {log[2]}, Время: {log[3]}' for log in logs))
-        layout.addWidget(logs_text)
+        filters = QHBoxLayout()
+        user_filter = QComboBox()
+        user_filter.addItem('Все пользователи', None)
+        self.async_db.run(self.db.get_users, busy=False,
+                          on_done=lambda users: [user_filter.addItem(user[1], user[0]) for user in users])
+        action_filter = QLineEdit()
+        action_filter.setPlaceholderText('Действие начинается с...')
+        period = QCheckBox('Период')
+        date_from = QDateEdit(QDate.currentDate().addDays(-7))
+        date_to = QDateEdit(QDate.currentDate())
+        for edit in (date_from, date_to):
+            edit.setCalendarPopup(True)
+            edit.setEnabled(False)
+        period.toggled.connect(date_from.setEnabled)
+        period.toggled.connect(date_to.setEnabled)
+        apply_btn = QPushButton('Показать')
+        def apply_filter():
+            dates = (date_from.date().toString('yyyy-MM-dd'), date_to.date().toString('yyyy-MM-dd')) if period.isChecked() else (None, None)
+            self.logs_model.set_filter(user_filter.currentData(), action_filter.text().strip(), *dates)
+        apply_btn.clicked.connect(apply_filter)
+        action_filter.returnPressed.connect(apply_filter)
+        archive_btn = QPushButton('Архив')
+        def search_archive():
+            dates = (date_from.date().toString('yyyy-MM-dd'), date_to.date().toString('yyyy-MM-dd')) if period.isChecked() else (None, None)
+            archiver = LogArchiver(self.db)
+            self.async_db.run(archiver.search, 'logs', user_filter.currentData(), action_filter.text().strip(), *dates,
+                              on_done=self.show_archived_logs, on_error=self.show_error('Не удалось прочитать архив журнала'))
+        archive_btn.clicked.connect(search_archive)
+        for widget in (user_filter, action_filter, period, date_from, date_to, apply_btn, archive_btn):
+            filters.addWidget(widget)
+        layout.addLayout(filters)
+
+        logs_table = QTableView()
+        self.logs_model = LogTableModel(self.async_db)
+        logs_table.setModel(self.logs_model)
+        logs_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        logs_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        layout.addWidget(logs_table)
         tab.setLayout(layout)
         self.dock_layout.addWidget(QPushButton('Логи', clicked=lambda: self.tabs.setCurrentWidget(tab)))
         self.tabs.addTab(tab, 'Логи')
+        self.tabs.currentChanged.connect(
+            lambda index: self.logs_model.start_tail() if self.tabs.widget(index) is tab else self.logs_model.stop_tail())
+
+    def show_archived_logs(self, records):
+        dialog = QDialog(self)
+        dialog.setWindowTitle(f'Архив журнала: {len(records)} записей')
+        layout = QVBoxLayout()
+        model = QStandardItemModel(len(records), 4, dialog)
+        model.setHorizontalHeaderLabels(['ID', 'ID пользователя', 'Действие', 'Время'])
+        for row, record in enumerate(records):
+            for column, key in enumerate(('id', 'user_id', 'action', 'timestamp')):
+                model.setItem(row, column, QStandardItem(str(record.get(key))))
+        table = QTableView()
+        table.setModel(model)
+        table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        layout.addWidget(table)
+        dialog.setLayout(layout)
+        dialog.resize(800, 600)
+        dialog.exec_()
 
 class TeacherWindow(BaseMainWindow):
     def setup_ui(self):
@@ -1539,13 +4835,15 @@ class TeacherWindow(BaseMainWindow):
         tab = QWidget()
         layout = QVBoxLayout()
         self.inventory_table = QTableView()
-        self.model = InventoryTableModel(self.db)
+        self.model = InventoryTableModel(self.async_db)
         self.inventory_table.setModel(self.model)
         self.inventory_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         layout.addWidget(self.inventory_table)
 
         search_layout = QHBoxLayout()
         self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText('Название, категория, состояние или ID')
+        self.search_controller = SearchController(self.async_db, self.search_input, self.model)
         search_btn = QPushButton('Поиск')
         search_btn.clicked.connect(self.search_inventory)
         search_layout.addWidget(QLabel('Поиск:'))
@@ -1558,18 +4856,12 @@ class TeacherWindow(BaseMainWindow):
         self.tabs.addTab(tab, 'Инвентарь')
 
     def search_inventory(self):
-        query = self.search_input.text()
-        items = self.db.search_inventory(query)
-        self.model.data = items
-        self.model.layoutChanged.emit()
+        self.search_controller.search_now()
 
     def add_bookings_tab(self):
         tab = QWidget()
         layout = QVBoxLayout()
-        self.bookings_table = QTableView()
-        self.load_bookings()
-        self.bookings_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        layout.addWidget(self.bookings_table)
+        self.add_bookings_view(layout)
 
         add_btn = QPushButton('Добавить бронирование')
         add_btn.clicked.connect(self.add_booking_dialog)
@@ -1578,33 +4870,39 @@ class TeacherWindow(BaseMainWindow):
         self.dock_layout.addWidget(QPushButton('Бронирования', clicked=lambda: self.tabs.setCurrentWidget(tab)))
         self.tabs.addTab(tab, 'Бронирования')
 
-    def load_bookings(self):
-        bookings = self.db.get_bookings(self.user_id)
-        model = QAbstractTableModel()
-        model.data = bookings
-        model.rowCount = lambda parent=None: len(bookings)
-        model.columnCount = lambda parent=None: 5
-        model.data = lambda index, role=Qt.DisplayRole: str(bookings[index.row()][index.column()]) if role == Qt.DisplayRole else None
-        model.headerData = lambda section, orientation, role=Qt.DisplayRole: ['ID', 'ID инвентаря', 'ID пользователя', 'Дата брони', 'Занятие'][section] if role == Qt.DisplayRole and orientation == Qt.Horizontal else None
-        self.bookings_table.setModel(model)
-
     def add_booking_dialog(self):
         dialog = QDialog(self)
         dialog.setWindowTitle('Добавить бронирование')
         layout = QFormLayout()
         inventory_id = QSpinBox()
+        inventory_id.setMaximum(10 ** 9)
         booking_date = QDateEdit(QDate.currentDate())
         class_ = QLineEdit()
+        available = QLabel()
         add_btn = QPushButton('Забронировать')
+        def show_available(count):
+            available.setText(f'Свободно: {count}')
+            add_btn.setEnabled(count > 0)
+        def update_available():
+            self.async_db.run(self.db.get_availability, inventory_id.value(), booking_date.date().toString('yyyy-MM-dd'),
+                              busy=False, on_done=show_available)
+        inventory_id.valueChanged.connect(update_available)
+        booking_date.dateChanged.connect(update_available)
+        update_available()
+        def booking_added(item_id, booking_id):
+            self.log_action(f'Забронирован предмет {item_id}')
+            self.bookings_model.insert_booking(booking_id)
         def add_booking():
-            self.db.add_booking(inventory_id.value(), self.user_id, booking_date.date().toString('yyyy-MM-dd'), class_.text())
-            self.db.log_action(self.user_id, f'Забронирован предмет {inventory_id.value()}')
-            self.load_bookings()
+            item_id = inventory_id.value()
+            self.async_db.run(self.db.add_booking, item_id, self.user_id, booking_date.date().toString('yyyy-MM-dd'), class_.text(),
+                              write=True, on_done=lambda booking_id: booking_added(item_id, booking_id),
+                              on_error=self.show_error('Не удалось забронировать предмет'))
             dialog.close()
         add_btn.clicked.connect(add_booking)
         layout.addRow('ID инвентаря', inventory_id)
         layout.addRow('Дата бронирования', booking_date)
         layout.addRow('Занятие', class_)
+        layout.addRow(available)
         layout.addRow(add_btn)
         dialog.setLayout(layout)
         dialog.exec_()
@@ -1613,7 +4911,7 @@ class TeacherWindow(BaseMainWindow):
         tab = QWidget()
         layout = QVBoxLayout()
         self.reports_table = QTableView()
-        self.reports_model = ReportTableModel(self.db, self.user_id)
+        self.reports_model = ReportTableModel(self.async_db, self.user_id)
         self.reports_table.setModel(self.reports_model)
         self.reports_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.reports_table.clicked.connect(self.show_report)
@@ -1623,7 +4921,10 @@ class TeacherWindow(BaseMainWindow):
         toolbar = QHBoxLayout()
         export_btn = QPushButton('Экспорт')
         export_btn.clicked.connect(self.export_report)
+        batch_export_btn = QPushButton('Пакетный экспорт')
+        batch_export_btn.clicked.connect(self.batch_export)
         toolbar.addWidget(export_btn)
+        toolbar.addWidget(batch_export_btn)
         layout.addLayout(toolbar)
 
         self.preview = QTextEdit()
@@ -1634,57 +4935,6 @@ class TeacherWindow(BaseMainWindow):
         self.dock_layout.addWidget(QPushButton('Отчёты', clicked=lambda: self.tabs.setCurrentWidget(tab)))
         self.tabs.addTab(tab, 'Отчёты')
 
-    def show_report(self, index):
-        row = index.row()
-        report_id = self.reports_model.data[row][0]
-        cursor = self.db.conn.cursor()
-        cursor.execute("SELECT config FROM report_templates WHERE id = ?", (report_id,))
-        config = json.loads(cursor.fetchone()[0])
-        self.preview.setHtml(config.get('preview_html', '<h1>Отчёт</h1>'))
-
-    def edit_report(self):
-        row = self.reports_table.currentIndex().row()
-        if row < 0:
-            QMessageBox.warning(self, 'Ошибка', 'Выберите отчёт')
-            return
-        report_id = self.reports_model.data[row][0]
-        cursor = self.db.conn.cursor()
-        cursor.execute("SELECT config FROM report_templates WHERE id = ?", (report_id,))
-        config = json.loads(cursor.fetchone()[0])
-        editor = ReportEditor(self.db, self.user_id, report_id, config)
-        if editor.exec_():
-            self.reports_model.refresh()
-            self.db.log_report_action(report_id, self.user_id, f'Отредактирован отчёт {config["name"]}')
-            self.show_report(self.reports_table.currentIndex())
-
-    def export_report(self):
-        row = self.reports_table.currentIndex().row()
-        if row < 0:
-            QMessageBox.warning(self, 'Ошибка', 'Выберите отчёт')
-            return
-        report_id = self.reports_model.data[row][0]
-        cursor = self.db.conn.cursor()
-        cursor.execute("SELECT config FROM report_templates WHERE id = ?", (report_id,))
-        config = json.loads(cursor.fetchone()[0])
-        dialog = QDialog(self)
-        dialog.setWindowTitle('Экспорт отчёта')
-        layout = QFormLayout()
-        format_selector = QComboBox()
-        format_selector.addItems(['PDF', 'Excel', 'HTML'])
-        layout.addRow('Формат', format_selector)
-        export_btn = QPushButton('Экспортировать')
-        def do_export():
-            report = ReportGenerator(self.db, config, format_selector.currentText().lower(), 'school_logo.png')
-            filename = f'report_{report_id}.{format_selector.currentText().lower()}'
-            report.export(filename)
-            QMessageBox.information(self, 'Успех', f'Отчёт экспортирован: {filename}')
-            self.db.log_report_action(report_id, self.user_id, f'Экспортирован отчёт в {format_selector.currentText()}')
-            dialog.close()
-        export_btn.clicked.connect(do_export)
-        layout.addRow(export_btn)
-        dialog.setLayout(layout)
-        dialog.exec_()
-
 class StudentWindow(BaseMainWindow):
     def setup_ui(self):
         super().setup_ui()
@@ -1697,13 +4947,15 @@ class StudentWindow(BaseMainWindow):
         tab = QWidget()
         layout = QVBoxLayout()
         self.inventory_table = QTableView()
-        self.model = InventoryTableModel(self.db)
+        self.model = InventoryTableModel(self.async_db)
         self.inventory_table.setModel(self.model)
         self.inventory_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         layout.addWidget(self.inventory_table)
 
         search_layout = QHBoxLayout()
         self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText('Название, категория, состояние или ID')
+        self.search_controller = SearchController(self.async_db, self.search_input, self.model)
         search_btn = QPushButton('Поиск')
         search_btn.clicked.connect(self.search_inventory)
         search_layout.addWidget(QLabel('Поиск:'))
@@ -1720,10 +4972,7 @@ class StudentWindow(BaseMainWindow):
         self.tabs.addTab(tab, 'Инвентарь')
 
     def search_inventory(self):
-        query = self.search_input.text()
-        items = self.db.search_inventory(query)
-        self.model.data = items
-        self.model.layoutChanged.emit()
+        self.search_controller.search_now()
 
     def scan_qr(self):
         dialog = QDialog(self)
@@ -1737,9 +4986,8 @@ class StudentWindow(BaseMainWindow):
             data = qr_input.text()
             if 'ID инвентаря' in data:
                 id = int(data.split(':')[1].split('-')[0].strip())
-                items = self.db.search_inventory(str(id))
-                self.model.data = items
-                self.model.layoutChanged.emit()
+                self.async_db.run(self.db.get_item, id,
+                                  on_done=lambda item: self.model.set_rows([item] if item else []))
                 dialog.close()
         scan_btn.clicked.connect(search_qr)
         layout.addWidget(scan_btn)
@@ -1749,27 +4997,36 @@ class StudentWindow(BaseMainWindow):
     def add_bookings_tab(self):
         tab = QWidget()
         layout = QVBoxLayout()
-        self.bookings_table = QTableView()
-        self.load_bookings()
-        self.bookings_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        layout.addWidget(self.bookings_table)
+        self.add_bookings_view(layout)
         tab.setLayout(layout)
         self.dock_layout.addWidget(QPushButton('Мои бронирования', clicked=lambda: self.tabs.setCurrentWidget(tab)))
         self.tabs.addTab(tab, 'Мои бронирования')
 
-    def load_bookings(self):
-        bookings = self.db.get_bookings(self.user_id)
-        model = QAbstractTableModel()
-        model.data = bookings
-        model.rowCount = lambda parent=None: len(bookings)
-        model.columnCount = lambda parent=None: 5
-        model.data = lambda index, role=Qt.DisplayRole: str(bookings[index.row()][index.column()]) if role == Qt.DisplayRole else None
-        model.headerData = lambda section, orientation, role=Qt.DisplayRole: ['ID', 'ID инвентаря', 'ID пользователя', 'Дата брони', 'Занятие'][section] if role == Qt.DisplayRole and orientation == Qt.Horizontal else None
-        self.bookings_table.setModel(model)
-
 if __name__ == '__main__':
+    setup_logging()
+    if '--benchmark-excel-run' in sys.argv:
+        i = sys.argv.index('--benchmark-excel-run')
+        benchmark_excel_run(int(sys.argv[i + 1]), sys.argv[i + 2])
+        sys.exit(0)
+    if '--archive-logs' in sys.argv:
+        # Запускается по расписанию (cron или планировщик заданий Windows) на одном сервере, не из клиентов
+        db = Database()
+        try:
+            LogArchiver(db).archive()
+        except Exception as e:
+            logging.error(f"Ошибка архивирования журналов: {e}")
+            sys.exit(1)
+        finally:
+            db.close()
+            get_pool().close_all()
+        sys.exit(0)
+    if '--benchmark-excel' in sys.argv:
+        sizes = [int(n) for n in sys.argv[sys.argv.index('--benchmark-excel') + 1:] if n.isdigit()]
+        benchmark_excel(sizes or (10000, 100000, 1000000))
+        sys.exit(0)
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(lambda: get_pool().close_all())
     app.setStyleSheet("""
         QWidget {
             background-color: #f8f9fa;
@@ -1816,6 +5073,10 @@ if __name__ == '__main__':
             window = TeacherWindow(login.user_id, login.role)
         else:
             window = StudentWindow(login.user_id, login.role)
+        if SCHEDULER_ENABLED and login.role == 'Admin':
+            report_scheduler = ReportScheduler(Database())
+            report_scheduler.start()
+            app.aboutToQuit.connect(report_scheduler.shutdown)
         window.show()
         sys.exit(app.exec_())
     else:
@@ -0,0 +1,24 @@
+import os
+import sys
+import tempfile
+
+# Модуль приложения при импорте создаёт ключ шифрования и файлы в текущей папке — тесты работают во временной
+os.environ.setdefault('INVENTORY_DB_BACKEND', 'sqlite')
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+os.chdir(tempfile.mkdtemp(prefix='inventory-tests-'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def db(tmp_path):
+    """База SQLite во временной папке теста; соединения пула закрываются после теста"""
+    import Restore_Sports as app
+    # Кэши инвентаря и бронирований общие на процесс — данные прошлой временной базы не должны в них остаться
+    app.inventory_cache.invalidate()
+    app.booking_index.invalidate()
+    database = app.Database(backend=app.SqliteBackend(str(tmp_path / 'inventory.db')))
+    yield database
+    database.close()
+    database.pool.close_all()
@@ -0,0 +1,68 @@
+import sqlite3
+
+import pytest
+
+import Restore_Sports as app
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = app.ConnectionPool(app.SqliteBackend(str(tmp_path / 'inventory.db')))
+    yield pool
+    pool.close_all()
+
+
+def count_logs(pool):
+    conn = pool.backend.connect()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM logs WHERE action = 'retry'").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_flush_does_not_start_writer(pool):
+    assert pool.flush_audit_log()
+    assert pool._audit_log is None
+
+
+def test_failed_batch_is_retried(pool, monkeypatch):
+    connect = pool.backend.connect
+    failures = iter([True])
+
+    def flaky_connect():
+        if next(failures, False):
+            raise sqlite3.OperationalError('database is locked')
+        return connect()
+
+    audit_log = app.AuditLog(pool, flush_interval=0.01)
+    monkeypatch.setattr(pool.backend, 'connect', flaky_connect)
+    audit_log.write('logs', (1, 'retry', '2026-01-05 07:00:00'))
+    assert audit_log.flush()
+    audit_log.close()
+    assert (audit_log.written, audit_log.dropped) == (1, 0)
+    assert count_logs(pool) == 1
+
+
+def test_writer_survives_unexpected_error(pool, monkeypatch):
+    audit_log = app.AuditLog(pool, flush_interval=0.01)
+    monkeypatch.setattr(audit_log, 'write_batch', lambda records: 1 / 0)
+    audit_log.write('logs', (1, 'retry', '2026-01-05 07:00:00'))
+    assert audit_log.flush()
+    assert audit_log.thread.is_alive()
+    assert audit_log.dropped == 1
+    audit_log.close()
+
+
+def test_close_does_not_block_on_full_queue(pool, monkeypatch):
+    audit_log = app.AuditLog(pool, flush_interval=0, queue_size=1)
+    writing, stuck = app.threading.Event(), app.threading.Event()
+    monkeypatch.setattr(audit_log, 'write_batch', lambda records: (writing.set(), stuck.wait()))
+    audit_log.write('logs', (1, 'retry', '2026-01-05 07:00:00'))
+    assert writing.wait(1)
+    audit_log.write('logs', (1, 'retry', '2026-01-05 07:00:01'))  # писатель занят, очередь полна
+    assert audit_log.queue.full()
+
+    started = app.time.monotonic()
+    audit_log.close(timeout=0.2)
+    assert app.time.monotonic() - started < 1
+    stuck.set()
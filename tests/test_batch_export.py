@@ -0,0 +1,62 @@
+import json
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import Restore_Sports as app
+
+
+class FakeDatabase:
+    def get_report_config(self, report_id):
+        return {'name': f'Отчёт {report_id}'}
+
+
+class CrashingPool:
+    """Пул, в котором процесс задачи по первому отчёту падает, а остальные задачи завершаются успешно"""
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, report_id, config, report_format, filename, logo_path):
+        future = Future()
+        if report_id == 1:
+            future.set_exception(BrokenProcessPool('worker died'))
+        else:
+            with open(filename, 'w') as f:
+                f.write('ok')
+            future.set_result(app.export_job_result(report_id, config, report_format, filename, 0.1, 1))
+        return future
+
+
+def test_batch_export_records_crashed_worker_and_writes_manifest(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'ProcessPoolExecutor', CrashingPool)
+    progress = []
+    exporter = app.BatchExporter(FakeDatabase(), [1, 2], ['html', 'excel'], str(tmp_path), workers=2,
+                                 progress=lambda done, total: progress.append((done, total)))
+
+    manifest = exporter.run()
+
+    assert manifest['failed'] == 2
+    assert len(manifest['jobs']) == 4
+    failed = [job for job in manifest['jobs'] if job['error']]
+    assert {job['report_id'] for job in failed} == {1}
+    assert 'worker died' in failed[0]['error']
+    assert progress[-1] == (4, 4)
+    written = json.loads((tmp_path / 'manifest.json').read_text(encoding='utf-8'))
+    assert written['failed'] == 2
+
+
+def test_batch_export_writes_manifest_when_pool_fails(tmp_path, monkeypatch):
+    class BrokenPool(CrashingPool):
+        def submit(self, *args):
+            raise BrokenProcessPool('pool is broken')
+
+    monkeypatch.setattr(app, 'ProcessPoolExecutor', BrokenPool)
+    manifest = app.BatchExporter(FakeDatabase(), [1, 2], ['pdf'], str(tmp_path)).run()
+
+    assert manifest['failed'] == 2
+    assert (tmp_path / 'manifest.json').exists()
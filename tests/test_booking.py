@@ -0,0 +1,65 @@
+import datetime
+
+import pytest
+
+import Restore_Sports as app
+
+
+def test_sqlite_lock_item_refuses_open_transaction(db):
+    cursor = db.conn.cursor()
+    cursor.execute("INSERT INTO inventory (name, category, quantity, condition) VALUES ('Мяч', 'Игры', 1, 'Новый')")
+    assert db.conn.in_transaction
+
+    with pytest.raises(RuntimeError):
+        db.backend.lock_item(cursor, cursor.lastrowid)
+    # Незафиксированная вставка осталась в транзакции вызывающего кода
+    assert db.conn.in_transaction
+    db.conn.rollback()
+    cursor.execute("SELECT COUNT(*) FROM inventory WHERE name = 'Мяч'")
+    assert cursor.fetchone()[0] == 0
+
+
+def add_item(db, quantity):
+    cursor = db.conn.cursor()
+    cursor.execute("INSERT INTO inventory (name, category, quantity, condition) VALUES ('Мяч', 'Игры', ?, 'Новый')", (quantity,))
+    db.conn.commit()
+    return cursor.lastrowid
+
+
+def test_class_filter_matches_wildcards_literally(db):
+    item_id = add_item(db, 6)
+    for class_ in ('5_А', '5Б', '100% явка', '1000 явка', '[7]', '7'):
+        db.add_booking(item_id, 1, '2026-01-13', class_)
+
+    assert [row[3] for row in db.get_bookings_page(class_='_')] == ['5_А']
+    assert [row[3] for row in db.get_bookings_page(class_='0%')] == ['100% явка']
+    assert [row[3] for row in db.get_bookings_page(class_='[7')] == ['[7]']
+
+
+def test_booking_over_capacity_raises_conflict(db):
+    item_id = add_item(db, 2)
+    db.add_booking(item_id, 1, '2026-01-13', '5А')
+    db.add_booking(item_id, 2, datetime.date(2026, 1, 13), '5Б')
+
+    with pytest.raises(app.BookingConflictError) as error:
+        db.add_booking(item_id, 3, '2026-01-13', '6А')
+    assert (error.value.inventory_id, error.value.booking_date) == (item_id, '2026-01-13')
+    assert not db.conn.in_transaction  # блокировка предмета снята
+    assert len(db.get_bookings_page()) == 2
+    db.add_booking(item_id, 3, '2026-01-14', '6А')
+
+
+def test_availability_counts_bookings_per_day(db):
+    ball, net = add_item(db, 3), add_item(db, 1)
+    db.add_booking(ball, 1, '2026-01-13', '5А')
+    db.add_booking(ball, 1, '2026-01-13', '5Б')
+    db.add_booking(ball, 1, '2026-01-15', '5А')
+    db.add_booking(net, 1, '2026-01-14', '5А')
+
+    assert db.get_availability(ball, '2026-01-13') == 1
+    assert db.get_availability(ball, '2026-01-14') == 3
+    assert db.get_availability(net, datetime.date(2026, 1, 14)) == 0
+    week = db.get_week_availability('2026-01-12', days=4)
+    assert len(week) == 8
+    assert [week[(ball, day)] for day in ('2026-01-12', '2026-01-13', '2026-01-14', '2026-01-15')] == [3, 1, 3, 2]
+    assert [week[(net, day)] for day in ('2026-01-12', '2026-01-13', '2026-01-14', '2026-01-15')] == [1, 1, 0, 1]
@@ -0,0 +1,43 @@
+import datetime
+
+import openpyxl
+import pytest
+
+import Restore_Sports as app
+
+HEADERS = app.INVENTORY_COLUMNS.split(', ')
+
+
+def inventory_rows(count):
+    return [(i, f'Предмет {i}', 'Мячи', i * 10, 'Хороший', f'2020-01-{i:02d}', i) for i in range(1, count + 1)]
+
+
+@pytest.mark.parametrize('write_only', [True, False])
+def test_write_excel_round_trip(tmp_path, write_only):
+    rows = inventory_rows(25)
+    filename = tmp_path / 'report.xlsx'
+    app.write_excel(str(filename), HEADERS, iter(rows), write_only=write_only)
+
+    sheet = openpyxl.load_workbook(filename).active
+    read = list(sheet.iter_rows(values_only=True))
+    assert list(read[0]) == HEADERS
+    assert len(read) == len(rows) + 1
+    for expected, actual in zip(rows, read[1:]):
+        assert actual[0] == expected[0]
+        assert actual[1:3] == expected[1:3]
+        assert actual[3] == expected[3]
+        assert actual[4] == expected[4]
+        purchase_date = actual[5].date() if isinstance(actual[5], datetime.datetime) else actual[5]
+        assert str(purchase_date) == expected[5]
+        assert actual[6] == expected[6]
+
+
+def test_write_excel_keeps_number_formats(tmp_path):
+    filename = tmp_path / 'report.xlsx'
+    app.write_excel(str(filename), HEADERS, iter(inventory_rows(3)))
+
+    sheet = openpyxl.load_workbook(filename).active
+    for column, header in enumerate(HEADERS, start=1):
+        number_format = app.EXCEL_COLUMN_FORMATS.get(header, (None, None, None))[1]
+        if number_format:
+            assert sheet.cell(row=2, column=column).number_format == number_format
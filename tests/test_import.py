@@ -0,0 +1,45 @@
+import csv
+
+import Restore_Sports as app
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Название', 'Категория', 'Количество', 'Состояние', 'Дата покупки', 'Срок службы'])
+        writer.writerows(rows)
+
+
+def test_import_inserts_in_batches_and_retries_failed_batch_by_row(db, tmp_path, monkeypatch):
+    # Триггер отклоняет одну строку в базе — её пакет целиком откатывается и повторяется построчно
+    db.conn.execute("CREATE TRIGGER reject_item BEFORE INSERT ON inventory WHEN new.name = 'Брак' "
+                    "BEGIN SELECT RAISE(ABORT, 'отклонено'); END")
+    db.conn.commit()
+    filename = tmp_path / 'items.csv'
+    write_csv(filename, [
+        ['Мяч', 'Игры', '5', 'Новый', '2025-09-01', '3'],
+        ['Сетка', 'Игры', 'много', 'Новый', '', ''],
+        ['Обруч', 'Гимнастика', '4', 'Хороший', '', '2'],
+        ['Брак', 'Игры', '1', 'Новый', '', ''],
+        ['Скакалка', 'Гимнастика', '10', 'Новый', '', ''],
+        ['Мат', 'Гимнастика', '2', 'Изношенный', '2020-01-15', '5'],
+    ])
+    batches = []
+    executemany = db.backend.executemany
+    monkeypatch.setattr(db.backend, 'executemany',
+                        lambda cursor, sql, rows: batches.append(len(rows)) or executemany(cursor, sql, rows))
+    progress = []
+
+    importer = app.InventoryImporter(db, batch_size=2, progress=lambda done, total: progress.append((done, total)))
+    assert importer.run(str(filename)) == 4
+    importer.write_errors(str(tmp_path / 'items_errors.csv'))
+
+    assert batches == [2, 2, 1]
+    assert progress[-1] == (6, 6)
+    names = [row[0] for row in db.conn.execute('SELECT name FROM inventory ORDER BY id')]
+    assert names == ['Мяч', 'Обруч', 'Скакалка', 'Мат']
+    with open(tmp_path / 'items_errors.csv', newline='', encoding='utf-8-sig') as f:
+        report = list(csv.reader(f))
+    assert report[0] == ['Строка', 'Ошибка', 'Значения']
+    assert [(row[0], row[2]) for row in report[1:]] == [('3', 'Сетка'), ('5', 'Брак')]
+    assert 'отклонено' in report[2][1]
@@ -0,0 +1,45 @@
+import Restore_Sports as app
+
+
+def add_item(db, name):
+    cursor = db.conn.cursor()
+    cursor.execute("INSERT INTO inventory (name, category, quantity, condition) VALUES (?, 'Игры', 1, 'Новый')", (name,))
+    db.conn.commit()
+    return cursor.lastrowid
+
+
+def test_item_lookup_on_cold_cache_does_not_load_inventory(db):
+    item_id = add_item(db, 'Мяч')
+    cache = app.InventoryCache(ttl=0)
+
+    assert cache.get_item(db.conn, item_id)[1] == 'Мяч'
+    assert cache.items is None
+    assert cache.get_item(db.conn, item_id + 1) is None
+
+
+def test_item_lookup_after_foreign_write_reads_by_key(db):
+    item_id = add_item(db, 'Мяч')
+    cache = app.InventoryCache(ttl=0)
+    cache.get(db.conn)
+    add_item(db, 'Сетка')  # запись другого клиента увеличивает inventory_version
+
+    assert cache.get_item(db.conn, item_id)[1] == 'Мяч'
+    assert len(cache.items) == 1  # кэш не перечитан ради одного предмета
+    assert cache.stats()['misses'] == 2
+
+
+def test_version_bump_reloads_inventory_and_own_write_updates_one_item(db):
+    first = add_item(db, 'Мяч')
+    cache = app.InventoryCache(ttl=0)
+    assert [row[1] for row in cache.get(db.conn)] == ['Мяч']
+    assert cache.get(db.conn) is cache.get(db.conn)  # версия не менялась — тот же список
+
+    add_item(db, 'Сетка')  # чужая запись: версия увеличилась
+    assert [row[1] for row in cache.get(db.conn)] == ['Мяч', 'Сетка']
+
+    db.conn.cursor().execute("UPDATE inventory SET name = 'Мяч футбольный' WHERE id = ?", (first,))
+    db.conn.commit()
+    cache.apply_write(db.conn, first)  # своя запись: версия ровно на один больше
+    assert cache.items is not None
+    assert [row[1] for row in cache.get(db.conn)] == ['Мяч футбольный', 'Сетка']
+    assert cache.stats() == {'hits': 3, 'misses': 2}
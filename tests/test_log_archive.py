@@ -0,0 +1,25 @@
+import datetime
+
+import Restore_Sports as app
+
+
+def add_log(db, user_id, action, timestamp):
+    db.conn.cursor().execute('INSERT INTO logs (user_id, action, timestamp) VALUES (?, ?, ?)', (user_id, action, timestamp))
+    db.conn.commit()
+
+
+def test_archive_moves_old_days_and_search_reads_them_back(db, tmp_path):
+    add_log(db, 1, 'Вход', '2026-01-13 08:00:00')
+    add_log(db, 2, 'Выдача мяча', '2026-01-13 09:30:00')
+    add_log(db, 1, 'Выход', '2026-01-14 17:00:00')
+    add_log(db, 1, 'Вход', '2026-01-15 08:00:00')
+    archiver = app.LogArchiver(db, archive_dir=str(tmp_path / 'archive'), batch_size=2)
+
+    assert archiver.archive(datetime.date(2026, 1, 15)) == {'logs': 3, 'report_history': 0}
+
+    assert [row[2] for row in db.get_logs_page()] == ['Вход']
+    assert sorted(path.name for path in (tmp_path / 'archive' / 'logs' / '2026-01').iterdir()) == \
+        ['2026-01-13.jsonl.gz', '2026-01-14.jsonl.gz']
+    assert [r['action'] for r in archiver.search('logs')] == ['Выход', 'Выдача мяча', 'Вход']
+    assert [r['action'] for r in archiver.search('logs', user_id=1, date_to='2026-01-13')] == ['Вход']
+    assert [r['action'] for r in archiver.search('logs', action='вы')] == ['Выход', 'Выдача мяча']
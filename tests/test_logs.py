@@ -0,0 +1,28 @@
+import datetime
+
+import pytest
+
+
+@pytest.mark.parametrize('action, expected', [
+    ('100%', ['100% выдано']),
+    ('a_b', ['a_b сброшен']),
+    ('C:\\', ['C:\\отчёты']),
+    ('[1]', ['[1] сдан']),
+])
+def test_action_filter_matches_wildcards_literally(db, action, expected):
+    cursor = db.conn.cursor()
+    for text in ('100% выдано', '1000 выдано', 'a_b сброшен', 'axb сброшен', 'C:\\отчёты', 'C:отчёты', '[1] сдан', '1 сдан'):
+        cursor.execute('INSERT INTO logs (user_id, action, timestamp) VALUES (1, ?, ?)', (text, '2026-01-05 07:00:00'))
+    db.conn.commit()
+
+    assert [row[2] for row in db.get_logs_page(action=action)] == expected
+
+
+def test_date_filter_includes_whole_days(db):
+    cursor = db.conn.cursor()
+    for timestamp in ('2026-01-12 23:59:59', '2026-01-13 00:00:00', '2026-01-14 18:30:00.250000', '2026-01-15 00:00:00'):
+        cursor.execute("INSERT INTO logs (user_id, action, timestamp) VALUES (1, 'вход', ?)", (timestamp,))
+    db.conn.commit()
+
+    rows = db.get_logs_page(date_from='2026-01-13', date_to=datetime.date(2026, 1, 14))
+    assert [str(row[3])[:10] for row in rows] == ['2026-01-14', '2026-01-13']
@@ -0,0 +1,33 @@
+import Restore_Sports as app
+
+
+def test_migrations_apply_once_and_warm_start_checks_version_once(tmp_path):
+    backend = app.SqliteBackend(str(tmp_path / 'inventory.db'))
+    conn = backend.connect()
+    try:
+        latest = app.MIGRATIONS[-1][0]
+        assert app.MigrationRunner(backend).run(conn) == latest
+        versions = [row[0] for row in conn.execute('SELECT version FROM schema_version ORDER BY version')]
+        assert versions == [number for number, _, _ in app.MIGRATIONS]
+
+        statements = []
+        conn.set_trace_callback(statements.append)
+        assert app.MigrationRunner(backend).run(conn) == latest
+        assert statements == ['SELECT MAX(version) FROM schema_version']
+        assert conn.execute('SELECT COUNT(*) FROM schema_version').fetchone()[0] == len(app.MIGRATIONS)
+    finally:
+        conn.close()
+
+
+def test_pool_checks_schema_once(tmp_path, monkeypatch):
+    runs = []
+    run = app.MigrationRunner.run
+    monkeypatch.setattr(app.MigrationRunner, 'run', lambda self, conn: runs.append(conn) or run(self, conn))
+    pool = app.ConnectionPool(app.SqliteBackend(str(tmp_path / 'inventory.db')))
+    try:
+        for _ in range(3):
+            with pool.connection():
+                pass
+        assert len(runs) == 1
+    finally:
+        pool.close_all()
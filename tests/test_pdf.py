@@ -0,0 +1,49 @@
+import re
+import types
+
+import pytest
+
+import Restore_Sports as app
+
+
+def generator(font, rows, viz_type='table', pdf_fast=False):
+    db = types.SimpleNamespace(backend=app.SqliteBackend())
+    config = {'fields': ['id', 'name', 'quantity'], 'filters': {}, 'viz_type': viz_type,
+              'font': font, 'font_size': 12, 'pdf_fast': pdf_fast}
+    return app.ReportGenerator(db, config, 'pdf', data=rows)
+
+
+def page_count(filename):
+    return len(re.findall(rb'/Type /Page(?!s)', filename.read_bytes()))
+
+
+@pytest.mark.parametrize('font, expected', [
+    ('Helvetica', 'Helvetica'),
+    ('Times', 'Times-Roman'),
+    ('Arial', 'Helvetica'),
+    ('Courier New', 'Courier'),
+    ('Несуществующий шрифт', 'Helvetica'),
+])
+def test_pdf_font_maps_to_registered_font(font, expected):
+    assert app.pdf_font(font) == expected
+
+
+@pytest.mark.parametrize('pdf_fast', [False, True])
+def test_generate_pdf_with_font_from_font_combo(tmp_path, pdf_fast):
+    filename = tmp_path / 'report.pdf'
+    generator('Times', [(i, f'item {i}', i % 7) for i in range(1, 301)], pdf_fast=pdf_fast).generate_pdf(str(filename))
+    assert page_count(filename) > 1
+
+
+def test_generate_pdf_pages_follow_row_count(tmp_path):
+    short, long = tmp_path / 'short.pdf', tmp_path / 'long.pdf'
+    generator('Helvetica', [(1, 'item', 1)]).generate_pdf(str(short))
+    generator('Helvetica', [(i, f'item {i}', i) for i in range(1, 501)]).generate_pdf(str(long))
+    assert page_count(short) == 1
+    assert page_count(long) > 10
+
+
+def test_generate_pdf_with_chart(tmp_path):
+    filename = tmp_path / 'report.pdf'
+    generator('Helvetica', [(i, f'item {i}', i) for i in range(1, 11)], viz_type='bar').generate_pdf(str(filename))
+    assert b'/Subtype /Image' in filename.read_bytes()
@@ -0,0 +1,36 @@
+import pytest
+
+import Restore_Sports as app
+
+
+@pytest.fixture(scope='module')
+def qapp():
+    return app.QApplication.instance() or app.QApplication([])
+
+
+@pytest.fixture
+def editor(qapp, db):
+    editor = app.ReportEditor(db, 1)
+    yield editor
+    editor.style_timer.stop()
+    editor.deleteLater()
+
+
+def test_font_size_does_not_change_debounce_interval(editor):
+    interval = editor.style_timer.interval()
+    editor.font_size.setValue(editor.font_size.value() + 2)
+    assert editor.style_timer.isActive()
+    assert editor.style_timer.interval() == interval
+
+
+def test_saved_config_reads_every_editor_field(editor):
+    editor.group_by_input.setCurrentText('Категория')
+    editor.aggregate_input.setCurrentText('Сумма количества')
+    editor.pdf_fast.setChecked(True)
+
+    editor.read_config()
+
+    assert editor.config['group_by'] == ['category']
+    assert editor.config['aggregates'] == [{'func': 'SUM', 'field': 'quantity'}]
+    assert editor.config['pdf_fast'] is True
+    assert editor.config['template'] == editor.template_input.currentText()
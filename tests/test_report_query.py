@@ -0,0 +1,36 @@
+import pytest
+
+import Restore_Sports as app
+
+
+@pytest.fixture
+def builder():
+    return app.ReportQueryBuilder()
+
+
+@pytest.mark.parametrize('config', [
+    {'fields': ['name', 'password']},
+    {'fields': ['name; DROP TABLE inventory']},
+    {'filters': {'password': 'x'}},
+    {'filters': {'quantity': {'op': 'OR 1=1 --', 'value': 1}}},
+    {'filters': {'quantity': {'op': 'LIKE', 'value': '1%'}}},
+    {'filters': {'quantity': 'много'}},
+    {'group_by': ['name'], 'aggregates': [{'func': 'COUNT', 'field': '*'}]},
+    {'group_by': ['category'], 'aggregates': [{'func': 'DELETE', 'field': 'quantity'}]},
+])
+def test_rejects_fields_and_operators_outside_whitelist(builder, config):
+    with pytest.raises(ValueError):
+        builder.compile(config, app.SqliteBackend())
+
+
+def test_cache_key_depends_on_shape_not_filter_values(builder):
+    backend = app.SqliteBackend()
+    first = builder.compile({'fields': ['name', 'quantity'], 'filters': {'category': 'Игры', 'quantity': '>= 2'}}, backend)
+    second = builder.compile({'fields': ['Название', 'quantity'], 'filters': {'category': 'Гимнастика', 'quantity': '>= 7'}}, backend)
+    assert first[0] == second[0]
+    assert (first[1], second[1]) == (['Игры', 2], ['Гимнастика', 7])
+    assert (builder.hits, builder.misses) == (1, 1)
+
+    builder.compile({'fields': ['name', 'quantity'], 'filters': {'category': 'Игры', 'quantity': '< 2'}}, backend)
+    builder.compile({'fields': ['name', 'quantity'], 'filters': {'category': ['Игры', 'Гимнастика']}}, backend)
+    assert (builder.hits, builder.misses) == (1, 3)
@@ -0,0 +1,71 @@
+import datetime
+import email
+import socket
+
+import pytest
+
+import Restore_Sports as app
+
+controller_module = pytest.importorskip('aiosmtpd.controller')
+
+
+class Mailbox:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, email.message_from_bytes(envelope.content)))
+        return '250 OK'
+
+
+@pytest.fixture
+def smtp_server():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    mailbox = Mailbox()
+    controller = controller_module.Controller(mailbox, hostname='127.0.0.1', port=port)
+    controller.start()
+    yield mailbox, port
+    controller.stop()
+
+
+def test_deliver_renders_once_and_mails_every_recipient(db, smtp_server, tmp_path):
+    mailbox, port = smtp_server
+    report_id = db.get_report_templates(1)[0][0]
+    db.add_schedule(report_id, 'html', '0 7 * * 1', ['a@school.local'], 1)
+    db.add_schedule(report_id, 'html', '0 7 * * 1', ['b@school.local', 'a@school.local'], 1)
+    scheduler = app.ReportScheduler(db, out_dir=str(tmp_path / 'out'),
+                                    smtp_factory=lambda: app.SmtpSession('127.0.0.1', port))
+
+    sent = scheduler.deliver(db.get_schedules(enabled_only=True))
+
+    assert sent == 2
+    assert sorted(rcpt for rcpt, _ in mailbox.messages) == [['a@school.local'], ['b@school.local']]
+    _, message = mailbox.messages[0]
+    attachments = [part for part in message.walk() if part.get_filename()]
+    assert [part.get_filename() for part in attachments] == [f'report_{report_id}.html']
+    assert attachments[0].get_payload(decode=True)
+    assert len(list((tmp_path / 'out').rglob('*.html'))) == 1
+
+
+def test_send_now_does_not_need_a_saved_schedule(db, smtp_server, tmp_path):
+    mailbox, port = smtp_server
+    report_id = db.get_report_templates(1)[0][0]
+    scheduler = app.ReportScheduler(db, out_dir=str(tmp_path / 'out'),
+                                    smtp_factory=lambda: app.SmtpSession('127.0.0.1', port))
+
+    assert scheduler.send_now(report_id, 'excel', ['admin@school.local']) == 1
+    assert mailbox.messages[0][0] == ['admin@school.local']
+    assert db.get_schedules() == []
+
+
+def test_schedule_run_is_claimed_once(db):
+    report_id = db.get_report_templates(1)[0][0]
+    db.add_schedule(report_id, 'pdf', '*/5 * * * *', ['a@school.local'], 1)
+    schedule_id = db.get_schedules()[0][0]
+    fire_time = datetime.datetime(2026, 1, 5, 7, 0)
+
+    assert db.claim_schedule_run(schedule_id, fire_time)
+    assert not db.claim_schedule_run(schedule_id, fire_time)
+    assert db.claim_schedule_run(schedule_id, fire_time + datetime.timedelta(minutes=5))